@@ -0,0 +1,114 @@
+"""
+Production serving: gunicorn with the models loaded once and shared by forked workers
+
+The master process imports the app (preload_app) and warms up the RAG handler
+before any worker exists, so the embedding model, the TinyLlama weights and an
+in-process or memory-mapped vector index are loaded once and shared
+copy-on-write by every worker. With LLM_WORKERS each worker starts its own
+inference pool after the fork. The GGUF file is memory-mapped by ctransformers
+and the INDEX_PATH artifact by numpy, so those pages are shared through the
+page cache as well.
+
+Run from the repository root:
+    gunicorn -c gunicorn.conf.py flask_server:app
+
+Settings (environment variables):
+    GUNICORN_BIND      address to listen on (default 0.0.0.0:5000)
+    GUNICORN_WORKERS   worker processes (default: CPU count, at most 4)
+    GUNICORN_THREADS   request threads per worker (default 4)
+    GUNICORN_PRELOAD   set to 0 to load the models in every worker instead
+    TORCH_THREADS      torch intra-op threads per worker (default 1)
+    PROMETHEUS_MULTIPROC_DIR  where workers share their metrics (default: a
+                       directory per server in the system temp directory)
+"""
+import gc
+import os
+import sys
+import tempfile
+
+pythonpath = 'src'
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Each worker runs one TinyLlama generation at a time (RAGHandler serializes
+# the in-process model), so workers bound concurrent generations and should not
+# exceed the cores available for inference. Threads serve the cheap requests
+# (story listing, direct answers, cached answers) and SSE streams meanwhile.
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(os.cpu_count() or 1, 4))))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+# Generation may take up to LLM timeout (60s) plus queueing
+timeout = 120
+graceful_timeout = 30
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+# Every worker writes its metrics here so that /metrics, answered by any one
+# worker, reports the whole server (see src/metrics.py)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), f"urdubuddy-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    import metrics
+    metrics.clear_multiprocess_dir()
+
+
+def when_ready(server):
+    """Runs in the master before the first worker is forked"""
+    if not preload_app:
+        return
+    from flask_server import rag_handler
+    # Embed on this thread only. Torch's intra-op threads (OpenMP) do not
+    # survive the fork, and a worker that inherits a started OpenMP pool can
+    # hang in its first parallel region. With one thread no pool is started;
+    # post_fork sets each worker's own thread count.
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    try:
+        rag_handler.warm_up(before_fork=True)
+    except Exception as e:
+        # Workers still start and load what they need on first use
+        print(f"Warm-up failed: {e}")
+    # Counted once here; the workers start from zero (post_fork)
+    import metrics
+    metrics.registry.write_snapshot(include_gauges=False)
+    # Keep the objects created so far out of the garbage collector's reach,
+    # so that collections in the workers do not write to (and copy) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # One worker per core should not spawn one torch thread per core each
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(int(os.getenv('TORCH_THREADS', '1')))
+    import metrics
+    if preload_app:
+        # The master's warm-up is already in its own snapshot
+        metrics.registry.reset()
+        from flask_server import rag_handler
+        rag_handler.after_fork()
+    metrics.registry.start_flushing()
+
+
+def worker_exit(server, worker):
+    # Runs in the worker: keep its final counts
+    import metrics
+    metrics.registry.write_snapshot()
+
+
+def child_exit(server, worker):
+    # Runs in the master: the worker's gauges no longer describe anything
+    import metrics
+    metrics.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from flask_server import rag_handler, start_warm_up
+    # Without preloading everything is loaded here; with it, whatever
+    # after_fork reset (the inference pool, the Chroma connection).
+    # In the background, so the worker answers its heartbeat while loading.
+    if not rag_handler.ready:
+        start_warm_up()
@@ -0,0 +1,258 @@
+"""
+Replay a question workload against the Q&A code paths and report latency
+
+Targets:
+    handler    rag_handler.answer_question, called directly
+    ask        POST /api/ask through Flask's test client
+    story_ask  POST /api/stories/<id>/ask
+    chat       POST /api/stories/<id>/chat
+
+The workload comes from qa_workload.py (built from ``data/`` or loaded with
+``--workload``). Unless ``--real-llm`` is given the LLM is replaced by
+StubLLM, which answers deterministically from the prompt's context after an
+optional fixed delay, so runs measure the pipeline rather than TinyLlama and
+are repeatable. The embedding model and vector store are the ones configured
+by the usual environment variables (VECTOR_BACKEND, INDEX_PATH, ...).
+
+Every target is replayed ``--passes`` times at each ``--concurrency`` level.
+The answer cache is cleared before each run, so the first pass is cold and
+later passes show the cache at work. Tier hit rates are read from the
+rag_answers_total counter. With ``--baseline`` the report is compared with an
+earlier one and the script exits with status 1 if a latency percentile or
+the throughput got worse by more than ``--max-regression``.
+
+Usage (from the repository root):
+    python src/benchmarks/qa_benchmark.py --concurrency 1 8 --passes 2 --json qa.json
+    python src/benchmarks/qa_benchmark.py --workload workload.json --baseline qa.json
+"""
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+import numpy as np
+import metrics
+from benchmarks.qa_workload import build_workload, load_workload
+
+TARGETS = ('handler', 'ask', 'story_ask', 'chat')
+PERCENTILES = (50, 95, 99)
+_TIERS = ('direct', 'completion', 'cache', 'rag', 'failure')
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for the GGUF model
+
+    Answers with the first ``answer_words`` words of the prompt's context, so
+    responses pass validation, after sleeping ``latency`` seconds. Counts one
+    token per character, which overestimates the real tokenizer on Urdu text.
+    """
+
+    def __init__(self, latency: float = 0.0, answer_words: int = 20):
+        self.latency = latency
+        self.answer_words = answer_words
+
+    def _answer(self, prompt: str) -> List[str]:
+        context = prompt.split('<|context|>', 1)[-1].split('<|assistant|>', 1)[0]
+        return context.split()[:self.answer_words] or ['کہانی', 'میں', 'ذکر', 'نہیں۔']
+
+    def tokenize(self, text: str) -> List[int]:
+        return [ord(c) for c in text]
+
+    def __call__(self, prompt: str, stream: bool = False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        words = self._answer(prompt)
+        if stream:
+            return iter([word + ' ' for word in words])
+        return ' '.join(words)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _tier_counts() -> Dict[str, float]:
+    counter = metrics.registry.get('rag_answers_total')
+    if counter is None:
+        return {}
+    return {values[0]: value for values, value in counter.values().items()}
+
+
+def _make_caller(target: str) -> Callable[[Dict[str, Any]], bool]:
+    """A function that asks one workload question on the target and returns whether it succeeded"""
+    if target == 'handler':
+        from rag.rag_handler import rag_handler
+
+        def call(item):
+            return bool(rag_handler.answer_question(item['question'], item['story_id'])['success'])
+        return call
+
+    from flask_server import app
+    clients = threading.local()
+
+    def post(path: str, body: Dict[str, Any]) -> bool:
+        if not hasattr(clients, 'client'):
+            clients.client = app.test_client()
+        response = clients.client.post(path, json=body)
+        return response.status_code == 200 and bool((response.get_json() or {}).get('success'))
+
+    if target == 'ask':
+        return lambda item: post('/api/ask', {'question': item['question'], 'story_id': item['story_id']})
+    if target == 'story_ask':
+        return lambda item: post(f"/api/stories/{item['story_id']}/ask", {'question': item['question']})
+    if target == 'chat':
+        return lambda item: post(f"/api/stories/{item['story_id']}/chat", {'message': item['question']})
+    raise ValueError(f"Unknown target: {target}")
+
+
+def _timed(call: Callable[[Dict[str, Any]], bool], item: Dict[str, Any]) -> Tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        success = call(item)
+    except Exception as e:
+        print(f"Error asking {item['question']!r}: {e}")
+        success = False
+    return time.perf_counter() - start, success
+
+
+def _summarize(latencies: List[float], successes: List[bool], wall_seconds: float) -> Dict[str, Any]:
+    summary = {
+        'requests': len(latencies),
+        'success_rate': sum(successes) / len(successes) if successes else 0.0,
+        'throughput_rps': len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+        'mean_ms': float(np.mean(latencies)) * 1000 if latencies else 0.0
+    }
+    for q in PERCENTILES:
+        summary[f"p{q}_ms"] = percentile(latencies, q) * 1000
+    return summary
+
+
+def run_target(target: str, workload: List[Dict[str, Any]], concurrency: int, passes: int) -> Dict[str, Any]:
+    """Replay the workload ``passes`` times on one target, ``concurrency`` requests at a time"""
+    from rag.rag_handler import rag_handler
+    call = _make_caller(target)
+    rag_handler.answer_cache.clear()
+
+    runs = []
+    for _ in range(passes):
+        tiers_before = _tier_counts()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda item: _timed(call, item), workload))
+        wall_seconds = time.perf_counter() - start
+        tiers_after = _tier_counts()
+
+        latencies = [latency for latency, _ in results]
+        successes = [success for _, success in results]
+        answered = sum(tiers_after.get(tier, 0) - tiers_before.get(tier, 0) for tier in _TIERS)
+        by_category = {}
+        for item, (latency, success) in zip(workload, results):
+            entry = by_category.setdefault(item['category'], ([], []))
+            entry[0].append(latency)
+            entry[1].append(success)
+
+        run = _summarize(latencies, successes, wall_seconds)
+        run['wall_seconds'] = wall_seconds
+        run['tier_hit_rates'] = {
+            tier: (tiers_after.get(tier, 0) - tiers_before.get(tier, 0)) / answered if answered else 0.0
+            for tier in _TIERS
+        }
+        run['categories'] = {
+            category: _summarize(values[0], values[1], wall_seconds) for category, values in sorted(by_category.items())
+        }
+        # Throughput per category is not meaningful inside a mixed run
+        for summary in run['categories'].values():
+            summary.pop('throughput_rps')
+        runs.append(run)
+    return {'target': target, 'concurrency': concurrency, 'passes': runs}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Describe every percentile or throughput that got worse than the baseline by more than max_regression"""
+    baseline_runs = {(run['target'], run['concurrency']): run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in report['runs']:
+        reference = baseline_runs.get((run['target'], run['concurrency']))
+        if reference is None:
+            continue
+        for index, (current, previous) in enumerate(zip(run['passes'], reference['passes'])):
+            name = f"{run['target']} c={run['concurrency']} pass {index + 1}"
+            for q in PERCENTILES:
+                key = f"p{q}_ms"
+                if previous[key] > 0 and current[key] > previous[key] * (1 + max_regression):
+                    regressions.append(f"{name}: {key} {previous[key]:.2f} -> {current[key]:.2f}")
+            if current['throughput_rps'] < previous['throughput_rps'] * (1 - max_regression):
+                regressions.append(f"{name}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of the Q&A endpoints on a replayed question workload")
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--workload', help="JSON workload written by qa_workload.py (default: build one from --data-dir)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--passes', type=int, default=2, help="Replays per target; the first one starts with an empty answer cache")
+    parser.add_argument('--real-llm', action='store_true', help="Generate with the configured model instead of StubLLM")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds StubLLM takes per generation")
+    parser.add_argument('--json', help="Write the report to this file")
+    parser.add_argument('--baseline', help="Earlier report to compare with")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed relative slowdown against --baseline")
+    args = parser.parse_args()
+
+    workload = load_workload(args.workload) if args.workload else build_workload(args.data_dir, args.seed)
+
+    from rag.rag_handler import rag_handler
+    if not args.real_llm:
+        rag_handler.llm_workers = 0
+        rag_handler._llm = StubLLM(latency=args.llm_latency)
+        rag_handler.load_state['llm'] = 'loaded'
+    start = time.perf_counter()
+    rag_handler.warm_up()
+    warm_up_seconds = time.perf_counter() - start
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'llm': 'real' if args.real_llm else f"stub ({args.llm_latency}s)",
+        'vector_backend': rag_handler.vector_backend,
+        'questions': len(workload),
+        'warm_up_seconds': warm_up_seconds,
+        'runs': []
+    }
+    for target in args.targets:
+        for concurrency in args.concurrency:
+            run = run_target(target, workload, concurrency, args.passes)
+            report['runs'].append(run)
+            for index, result in enumerate(run['passes']):
+                tiers = '  '.join(f"{tier} {rate:.0%}" for tier, rate in result['tier_hit_rates'].items())
+                print(f"{target:<10} c={concurrency:<3} pass {index + 1}  "
+                      f"p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                      f"{result['throughput_rps']:8.1f} req/s  ok {result['success_rate']:.0%}  {tiers}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Build a question workload from the stories in ``data/``
+
+Every story contributes questions in five categories:
+
+    direct          the exact metadata questions of RAGHandler.exact_questions
+    character       who a character is and what they did
+    difficult_word  the meaning of the story's difficult words
+    prefix          the first few words of story sentences (sentence completion)
+    free_form       open questions about the story's events and theme
+
+The workload is deterministic for a given seed and corpus. Save it with
+``--output`` to replay exactly the same questions against later versions.
+
+Usage (from the repository root):
+    python src/benchmarks/qa_workload.py --output workload.json
+"""
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+from story_store import StoryStore
+from rag.indexer import story_sentences
+
+CATEGORIES = ('direct', 'character', 'difficult_word', 'prefix', 'free_form')
+
+# Same patterns as RAGHandler.exact_questions; kept here so that building a
+# workload does not import the handler and its models
+EXACT_QUESTIONS = {
+    'title': ['کہانی کا عنوان کیا ہے؟', 'کہانی کا نام کیا ہے؟'],
+    'lesson': ['کہانی سے کیا سبق ملتا ہے؟', 'کہانی کا سبق کیا ہے؟'],
+    'characters': ['کہانی کے کردار کون کون ہیں؟', 'کہانی میں کون کون ہیں؟'],
+    'moral': ['کہانی کا پیغام کیا ہے؟', 'کہانی کا مقصد کیا ہے؟'],
+    'summary': ['کہانی کا خلاصہ کیا ہے؟', 'کہانی کا مختصر بیان کیا ہے؟'],
+    'difficult_words': ['کہانی کے مشکل الفاظ کون سے ہیں؟', 'مشکل لفظوں کا مطلب کیا ہے؟']
+}
+
+_CHARACTER_TEMPLATES = ['{name} کون ہے؟', '{name} نے کیا کیا؟', 'کہانی میں {name} کا کیا کردار ہے؟']
+_WORD_TEMPLATES = ['{word} کا مطلب کیا ہے؟', 'کہانی میں {word} کا کیا مطلب ہے؟']
+_FREE_FORM_QUESTIONS = [
+    'کہانی میں کیا ہوا؟',
+    'کہانی کے آخر میں کیا ہوا؟',
+    'کہانی کی شروعات کیسے ہوئی؟',
+    'بچوں نے کیا سیکھا؟'
+]
+
+
+def load_stories(data_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    store = StoryStore(data_dir)
+    store.refresh(force=True)
+    return sorted((record.story_id, record.data) for record in store.records())
+
+
+def _question(category: str, story_id: str, question: str, source: Optional[str] = None) -> Dict[str, Any]:
+    item = {'category': category, 'story_id': story_id, 'question': question}
+    if source is not None:
+        # The story sentence the question was taken from
+        item['source'] = source
+    return item
+
+
+def story_questions(story_id: str, data: Dict[str, Any], rng: random.Random,
+                    prefixes_per_story: int = 4, prefix_words: Tuple[int, int] = (3, 6)) -> List[Dict[str, Any]]:
+    """The questions of one story, in category order"""
+    questions = []
+    for patterns in EXACT_QUESTIONS.values():
+        questions.append(_question('direct', story_id, rng.choice(patterns)))
+
+    for character in data.get('characters', []):
+        if character.get('name'):
+            template = rng.choice(_CHARACTER_TEMPLATES)
+            questions.append(_question('character', story_id, template.format(name=character['name'])))
+
+    for word in data.get('difficult_words', []):
+        if word.get('word'):
+            template = rng.choice(_WORD_TEMPLATES)
+            questions.append(_question('difficult_word', story_id, template.format(word=word['word'])))
+
+    sentences = [sentence for _, sentence, _ in story_sentences(story_id, data)]
+    long_sentences = [sentence for sentence in sentences if len(sentence.split()) > prefix_words[1]]
+    for sentence in rng.sample(long_sentences, min(prefixes_per_story, len(long_sentences))):
+        words = sentence.split()[:rng.randint(*prefix_words)]
+        questions.append(_question('prefix', story_id, ' '.join(words), source=sentence))
+
+    for question in _FREE_FORM_QUESTIONS:
+        questions.append(_question('free_form', story_id, question))
+    if data.get('theme'):
+        questions.append(_question('free_form', story_id, f"کہانی میں {data['theme']} کے بارے میں کیا بتایا گیا ہے؟"))
+    return questions
+
+
+def build_workload(data_dir: str, seed: int = 0, prefixes_per_story: int = 4,
+                   categories: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Questions over every story, shuffled deterministically"""
+    rng = random.Random(seed)
+    workload = []
+    for story_id, data in load_stories(data_dir):
+        workload.extend(story_questions(story_id, data, rng, prefixes_per_story))
+    if categories:
+        workload = [item for item in workload if item['category'] in categories]
+    rng.shuffle(workload)
+    return workload
+
+
+def load_workload(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a question workload from the stories")
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefixes-per-story', type=int, default=4)
+    parser.add_argument('--categories', nargs='+', choices=CATEGORIES)
+    parser.add_argument('--output', help="Write the workload to this file instead of stdout")
+    args = parser.parse_args()
+
+    workload = build_workload(args.data_dir, args.seed, args.prefixes_per_story, args.categories)
+    text = json.dumps(workload, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        counts = {category: sum(item['category'] == category for item in workload) for category in CATEGORIES}
+        print(f"{len(workload)} questions: {counts}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Compare float16 and int8 vector storage against float32
+
+Embeds every sentence of the stories in ``data/`` into one NumpyVectorStore
+per storage type, runs a question set against each and reports recall@k of
+the quantized stores relative to the float32 results, together with the
+memory used by the vectors and the median query time. Queries are run both
+within their story (as the chat endpoints do) and over the whole corpus.
+
+The question set is built from the story metadata (lesson, moral, summary,
+theme, character descriptions and difficult-word examples); ``--questions``
+adds a JSON list of {"story_id": ..., "question": ...} objects.
+
+Usage (from the repository root):
+    python src/benchmarks/quantization_eval.py --k 1 3 5 --json quantization.json
+"""
+from typing import Dict, List, Any, Tuple
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+import numpy as np
+from story_store import StoryStore
+from rag.indexer import story_sentences, EMBEDDING_MODEL_NAME
+from rag.vector_store import NumpyVectorStore, VECTOR_DTYPES
+
+
+def load_stories(data_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    store = StoryStore(data_dir)
+    store.refresh(force=True)
+    return [(record.story_id, record.data) for record in store.records() if '/' not in record.story_id]
+
+
+def build_questions(stories: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, str]]:
+    """(story_id, question) pairs taken from the story metadata"""
+    questions = []
+    for story_id, data in stories:
+        for field in ('lesson', 'moral', 'summary', 'theme'):
+            if data.get(field):
+                questions.append((story_id, data[field]))
+        for character in data.get('characters', []):
+            if character.get('description'):
+                questions.append((story_id, f"{character['name']} {character['description']}"))
+        for word in data.get('difficult_words', []):
+            if word.get('example'):
+                questions.append((story_id, word['example']))
+    return questions
+
+
+def build_stores(sentences, vectors: np.ndarray, dtypes) -> Dict[str, NumpyVectorStore]:
+    stores = {}
+    for dtype in dtypes:
+        store = NumpyVectorStore(dtype=dtype)
+        store.add(
+            ids=[sentence_id for sentence_id, _, _ in sentences],
+            embeddings=vectors,
+            documents=[sentence for _, sentence, _ in sentences],
+            metadatas=[metadata for _, _, metadata in sentences]
+        )
+        stores[dtype] = store
+    return stores
+
+
+def evaluate(stores: Dict[str, NumpyVectorStore], questions: List[Tuple[str, str]],
+             question_vectors: np.ndarray, ks: List[int]) -> Dict[str, Any]:
+    max_k = max(ks)
+    report = {}
+    for scope in ('story', 'corpus'):
+        # float32 results are the reference
+        reference = []
+        for (story_id, _), vector in zip(questions, question_vectors):
+            results = stores['float32'].query(vector, max_k, story_id=story_id if scope == 'story' else None)
+            reference.append(results['ids'])
+
+        scope_report = {}
+        for dtype, store in stores.items():
+            recalls = {k: [] for k in ks}
+            latencies = []
+            for i, ((story_id, _), vector) in enumerate(zip(questions, question_vectors)):
+                start = time.perf_counter()
+                results = store.query(vector, max_k, story_id=story_id if scope == 'story' else None)
+                latencies.append(time.perf_counter() - start)
+                for k in ks:
+                    expected = set(reference[i][:k])
+                    if expected:
+                        recalls[k].append(len(expected & set(results['ids'][:k])) / len(expected))
+            scope_report[dtype] = {
+                **{f"recall@{k}": statistics.mean(values) if values else 1.0 for k, values in recalls.items()},
+                'median_query_us': statistics.median(latencies) * 1e6
+            }
+        report[scope] = scope_report
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and memory of quantized vector storage")
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--questions', help="JSON list of {story_id, question} objects to add to the question set")
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    stories = load_stories(args.data_dir)
+    sentences = [item for story_id, data in stories for item in story_sentences(story_id, data)]
+    questions = build_questions(stories)
+    if args.questions:
+        with open(args.questions, 'r', encoding='utf-8') as f:
+            questions.extend((StoryStore.normalize_id(q['story_id']), q['question']) for q in json.load(f))
+
+    vectors = np.asarray(model.encode([sentence for _, sentence, _ in sentences], batch_size=args.batch_size), dtype=np.float32)
+    question_vectors = np.asarray(model.encode([question for _, question in questions], batch_size=args.batch_size), dtype=np.float32)
+
+    stores = build_stores(sentences, vectors, VECTOR_DTYPES)
+    report = {
+        'stories': len(stories),
+        'sentences': len(sentences),
+        'questions': len(questions),
+        'dimension': int(vectors.shape[1]),
+        'memory_bytes': {dtype: store.nbytes() for dtype, store in stores.items()},
+        'results': evaluate(stores, questions, question_vectors, args.k)
+    }
+
+    print(f"{report['sentences']} sentences from {report['stories']} stories, {report['questions']} questions")
+    for scope, scope_report in report['results'].items():
+        print(f"Scope: {scope}")
+        for dtype, metrics in scope_report.items():
+            recalls = '  '.join(f"{name} {value:.3f}" for name, value in metrics.items() if name.startswith('recall'))
+            print(f"  {dtype:<8} {report['memory_bytes'][dtype] / 1024:9.1f} KiB  {recalls}  "
+                  f"median {metrics['median_query_us']:.1f} us")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Sweep RAGHandler's retrieval settings and report quality against latency
+
+Runs a labeled question set through RAGHandler's retrieval stage for every
+combination of a parameter grid and every vector backend, and reports per
+combination recall@k, MRR (mean reciprocal rank of the first relevant
+sentence) and the per-query retrieval time. The combinations that no other
+combination beats on both quality and latency form the Pareto frontier.
+
+Swept parameters (RAGHandler attributes):
+    hybrid_retrieval           fuse BM25 with the vector ranking, or vector search only
+    hybrid_candidates          candidates from each ranking before fusing
+    context_sentences          sentences of context returned
+    rrf_k                      reciprocal rank fusion constant
+    lexical_min_score          BM25 score a fused sentence must exceed
+    context_overlap_threshold  similarity above which vector results count as duplicates
+
+Backends are ``chroma``, ``numpy`` or ``numpy-<dtype>`` (float16, int8).
+The chroma backend builds its collection in a temporary directory, so the
+server's ``.chroma`` index and manifest are never touched.
+
+The labeled questions are built from the stories: character and
+difficult-word questions (relevant: the sentences naming the character or
+word) and scrambled story sentences (relevant: the sentence itself).
+``--questions`` adds a JSON list of {"story_id", "question", "relevant": [sentences]}.
+
+Usage (from the repository root):
+    python src/benchmarks/retrieval_sweep.py --backends numpy numpy-int8 --json sweep.json
+    python src/benchmarks/retrieval_sweep.py --grid '{"context_sentences": [1, 2], "rrf_k": [10, 60]}'
+"""
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+import numpy as np
+from story_store import StoryStore
+from rag.indexer import story_sentences
+from benchmarks.qa_workload import load_stories
+
+DEFAULT_GRID = {
+    'hybrid_retrieval': [True, False],
+    'hybrid_candidates': [2, 3, 5, 8],
+    'context_sentences': [1, 2, 3],
+    'rrf_k': [10, 60],
+    'lexical_min_score': [0.0, 1.0],
+    'context_overlap_threshold': [0.2, 0.5, 1.0]
+}
+
+# Only used by hybrid retrieval; vector-only combinations that differ in them are the same run
+_HYBRID_PARAMETERS = ('hybrid_candidates', 'rrf_k', 'lexical_min_score')
+
+
+def _normalize(sentence: str) -> str:
+    return ' '.join(sentence.split())
+
+
+def build_labeled_questions(data_dir: str, seed: int = 0, scrambled_per_story: int = 5) -> List[Dict[str, Any]]:
+    """(story, question, relevant sentences) triples taken from the story metadata and text"""
+    rng = random.Random(seed)
+    questions = []
+    for story_id, data in load_stories(data_dir):
+        sentences = [sentence for _, sentence, _ in story_sentences(story_id, data)]
+
+        def containing(text: str) -> List[str]:
+            return [sentence for sentence in sentences if text in sentence]
+
+        for character in data.get('characters', []):
+            relevant = containing(character.get('name', '')) if character.get('name') else []
+            if relevant:
+                questions.append({'category': 'character', 'story_id': story_id,
+                                  'question': f"{character['name']} کون ہے؟", 'relevant': relevant})
+        for word in data.get('difficult_words', []):
+            relevant = containing(word.get('word', '')) if word.get('word') else []
+            if relevant:
+                questions.append({'category': 'difficult_word', 'story_id': story_id,
+                                  'question': f"{word['word']} کا مطلب کیا ہے؟", 'relevant': relevant})
+
+        # Scrambled word order keeps the vocabulary but defeats substring (completion) matching
+        long_sentences = [sentence for sentence in sentences if len(sentence.split()) >= 6]
+        for sentence in rng.sample(long_sentences, min(scrambled_per_story, len(long_sentences))):
+            words = sentence.split()
+            rng.shuffle(words)
+            questions.append({'category': 'scrambled', 'story_id': story_id,
+                              'question': ' '.join(words[:-1]), 'relevant': [sentence]})
+    return questions
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Every combination of the grid, without vector-only duplicates"""
+    names = sorted(grid)
+    configs, seen = [], set()
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = dict(zip(names, values))
+        key = tuple((name, value) for name, value in sorted(config.items())
+                    if config.get('hybrid_retrieval', True) or name not in _HYBRID_PARAMETERS)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def open_handler(backend: str, data_dir: str, shared=None):
+    """
+    A RAGHandler on the given backend with a throwaway index; shares the
+    embedding model and cache with ``shared``. Remove ``handler.chroma_path``
+    when done.
+    """
+    from rag.rag_handler import RAGHandler
+    vector_backend, _, dtype = backend.partition('-')
+    chroma_path = tempfile.mkdtemp(prefix='retrieval-sweep-')
+    try:
+        handler = RAGHandler(data_dir=data_dir, vector_backend=vector_backend, vector_dtype=dtype or 'float32',
+                             chroma_path=chroma_path)
+        if shared is not None:
+            handler._embedding_model = shared.embedding_model
+            handler.embedding_cache = shared.embedding_cache
+        handler.story_store.refresh(force=True)
+        handler.vector_store
+    except Exception:
+        shutil.rmtree(chroma_path, ignore_errors=True)
+        raise
+    return handler
+
+
+def evaluate(handler, questions: List[Dict[str, Any]], config: Dict[str, Any], ks: List[int]) -> Dict[str, Any]:
+    """Retrieval quality and latency of one parameter combination"""
+    from rag.rag_handler import AnswerRequest
+    for name, value in config.items():
+        setattr(handler, name, value)
+
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for item in questions:
+        start = time.perf_counter()
+        retrieved = handler._retrieve(AnswerRequest(handler, item['question'], item['story_id']))
+        latencies.append(time.perf_counter() - start)
+
+        retrieved = [_normalize(sentence) for sentence in retrieved]
+        relevant = {_normalize(sentence) for sentence in item['relevant']}
+        for k in ks:
+            recalls[k].append(len(relevant.intersection(retrieved[:k])) / len(relevant))
+        rank = next((i + 1 for i, sentence in enumerate(retrieved) if sentence in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    return {
+        **{f"recall@{k}": float(np.mean(values)) for k, values in recalls.items()},
+        'mrr': float(np.mean(reciprocal_ranks)),
+        'mean_us': float(np.mean(latencies)) * 1e6,
+        'p50_us': float(np.percentile(latencies, 50)) * 1e6,
+        'p95_us': float(np.percentile(latencies, 95)) * 1e6
+    }
+
+
+def pareto_frontier(results: List[Dict[str, Any]], quality: str, latency: str) -> List[Dict[str, Any]]:
+    """Results that no other result beats on both quality (higher) and latency (lower), fastest first"""
+    frontier = []
+    for result in sorted(results, key=lambda r: (r['metrics'][latency], -r['metrics'][quality])):
+        if not frontier or result['metrics'][quality] > frontier[-1]['metrics'][quality]:
+            frontier.append(result)
+    return frontier
+
+
+def _describe(result: Dict[str, Any]) -> str:
+    config = result['config']
+    if not config.get('hybrid_retrieval', True):
+        config = {name: value for name, value in config.items() if name not in _HYBRID_PARAMETERS}
+    return f"{result['backend']:<14} " + ' '.join(f"{name}={value}" for name, value in sorted(config.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality against latency over a grid of RAG parameters")
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--backends', nargs='+', default=['numpy', 'numpy-float16', 'numpy-int8'])
+    parser.add_argument('--grid', help="JSON object of parameter name -> list of values, replacing the default grid's entries")
+    parser.add_argument('--questions', help="JSON list of {story_id, question, relevant} objects to add to the question set")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--quality', default='mrr', help="Quality metric of the frontier: mrr or recall@<k>")
+    parser.add_argument('--latency', default='p95_us', choices=['mean_us', 'p50_us', 'p95_us'])
+    parser.add_argument('--json', help="Write all results and the frontier to this file")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        grid.update(json.loads(args.grid))
+    configs = expand_grid(grid)
+
+    questions = build_labeled_questions(args.data_dir, args.seed)
+    if args.questions:
+        with open(args.questions, 'r', encoding='utf-8') as f:
+            questions.extend(dict(q, story_id=StoryStore.normalize_id(q['story_id']), category='custom') for q in json.load(f))
+    print(f"{len(questions)} labeled questions, {len(configs)} parameter combinations, {len(args.backends)} backends")
+
+    results, shared, directories = [], None, []
+    try:
+        for backend in args.backends:
+            handler = open_handler(backend, args.data_dir, shared)
+            directories.append(handler.chroma_path)
+            shared = shared or handler
+            # Untimed pass: embeds the questions and builds the per-story indexes
+            evaluate(handler, questions, configs[0], args.k)
+            for config in configs:
+                results.append({'backend': backend, 'config': config, 'metrics': evaluate(handler, questions, config, args.k)})
+    finally:
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    frontier = pareto_frontier(results, args.quality, args.latency)
+    print(f"Pareto frontier ({args.quality} against {args.latency}):")
+    for result in frontier:
+        metrics = result['metrics']
+        recalls = '  '.join(f"{name} {value:.3f}" for name, value in metrics.items() if name.startswith('recall'))
+        print(f"  {metrics[args.latency]:9.1f} us  mrr {metrics['mrr']:.3f}  {recalls}  {_describe(result)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'questions': len(questions),
+                'grid': grid,
+                'quality': args.quality,
+                'latency': args.latency,
+                'results': results,
+                'frontier': frontier
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
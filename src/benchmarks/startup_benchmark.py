@@ -0,0 +1,137 @@
+"""
+Measure how long it takes to start the Flask server
+
+Each run imports the server entry point in a fresh interpreter with
+``python -X importtime`` and reports the wall-clock time of the process, the
+time spent importing ``flask_server`` and the slowest modules by cumulative
+and by self import time (median over all runs).
+
+Usage (from the repository root):
+    python src/benchmarks/startup_benchmark.py --runs 5 --json startup.json
+    python src/benchmarks/startup_benchmark.py --warm-up   # also time rag_handler.warm_up()
+"""
+from typing import Dict, List, Any
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SRC_DIR = os.path.join(REPO_ROOT, 'src')
+
+_CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import {module}
+timings = {{'import_seconds': time.perf_counter() - start}}
+if {warm_up}:
+    start = time.perf_counter()
+    {module}.rag_handler.warm_up()
+    timings['warm_up_seconds'] = time.perf_counter() - start
+print('STARTUP_TIMINGS ' + json.dumps(timings))
+"""
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """Parse 'import time: self [us] | cumulative | imported package' lines"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules[name.strip()] = {'self_us': int(self_us), 'cumulative_us': int(cumulative_us)}
+    return modules
+
+
+def run_once(module: str, warm_up: bool) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    script = _CHILD_SCRIPT.format(module=module, warm_up=warm_up)
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    wall_seconds = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    timings = {}
+    for line in completed.stdout.splitlines():
+        if line.startswith('STARTUP_TIMINGS '):
+            timings = json.loads(line[len('STARTUP_TIMINGS '):])
+    return {
+        'wall_seconds': wall_seconds,
+        **timings,
+        'modules': _parse_importtime(completed.stderr)
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    summary = {}
+    for key in ('wall_seconds', 'import_seconds', 'warm_up_seconds'):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            summary[key] = {
+                'median': statistics.median(values),
+                'min': min(values),
+                'max': max(values)
+            }
+
+    module_names = set().union(*(run['modules'] for run in runs))
+    modules = {}
+    for name in module_names:
+        samples = [run['modules'][name] for run in runs if name in run['modules']]
+        modules[name] = {
+            'self_ms': statistics.median(s['self_us'] for s in samples) / 1000,
+            'cumulative_ms': statistics.median(s['cumulative_us'] for s in samples) / 1000
+        }
+    by_cumulative = sorted(modules.items(), key=lambda item: item[1]['cumulative_ms'], reverse=True)
+    by_self = sorted(modules.items(), key=lambda item: item[1]['self_ms'], reverse=True)
+    summary['slowest_cumulative'] = [{'module': name, **times} for name, times in by_cumulative[:top]]
+    summary['slowest_self'] = [{'module': name, **times} for name, times in by_self[:top]]
+    summary['module_count'] = len(modules)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server start-up time")
+    parser.add_argument('--module', default='flask_server', help="Entry point module to import")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters to start")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest modules to report")
+    parser.add_argument('--warm-up', action='store_true', help="Also time rag_handler.warm_up() (loads the models)")
+    parser.add_argument('--json', help="Write the full report to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module, args.warm_up) for _ in range(args.runs)]
+    report = {
+        'module': args.module,
+        'runs': args.runs,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'summary': summarize(runs, args.top)
+    }
+
+    summary = report['summary']
+    print(f"Start-up of {args.module} over {args.runs} runs (median):")
+    for key in ('wall_seconds', 'import_seconds', 'warm_up_seconds'):
+        if key in summary:
+            print(f"  {key:<16} {summary[key]['median'] * 1000:9.1f} ms")
+    print(f"  modules imported {summary['module_count']}")
+    print("Slowest imports (cumulative):")
+    for entry in summary['slowest_cumulative']:
+        print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['self_ms']:9.1f} ms self  {entry['module']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
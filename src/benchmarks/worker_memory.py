@@ -0,0 +1,167 @@
+"""
+Measure the memory used by each gunicorn worker
+
+Starts the server with gunicorn.conf.py, waits until it reports ready,
+optionally sends some traffic, and then reads /proc/<pid>/smaps_rollup of the
+master and every worker (Linux only). The important columns:
+
+    private  memory only this process uses (what another worker would add)
+    shared   memory shared with other processes (model weights, mmap'd index)
+    pss      proportional set size: private plus its share of shared pages
+
+Compare the default preload-and-fork mode with ``--no-preload``, in which
+every worker loads its own copy of the models.
+
+Usage (from the repository root):
+    python src/benchmarks/worker_memory.py --workers 4 --requests 200 --json memory.json
+    python src/benchmarks/worker_memory.py --workers 4 --no-preload
+"""
+from typing import Dict, List, Any
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_ROLLUP_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """Memory of a process in KiB from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in _ROLLUP_FIELDS:
+                values[name] = int(rest.split()[0])
+    return {
+        'rss_kib': values.get('Rss', 0),
+        'pss_kib': values.get('Pss', 0),
+        'shared_kib': values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0),
+        'private_kib': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                # The command name may contain spaces; the parent pid follows it
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def wait_until_ready(base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health/ready", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} was not ready within {timeout} seconds")
+
+
+def send_traffic(base_url: str, requests: int):
+    """Exercise the story and answer endpoints so the workers touch their memory"""
+    with urllib.request.urlopen(f"{base_url}/api/stories", timeout=30) as response:
+        stories = json.loads(response.read())
+    story_ids = [story['id'] for story in stories.get('stories', [])] or [None]
+    for i in range(requests):
+        story_id = story_ids[i % len(story_ids)]
+        body = json.dumps({'question': 'کہانی کا عنوان کیا ہے؟', 'story_id': story_id}).encode('utf-8')
+        request = urllib.request.Request(f"{base_url}/api/ask", data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+        except urllib.error.HTTPError:
+            pass
+
+
+def measure(workers: int, threads: int, preload: bool, port: int, requests: int, timeout: float) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.update({
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'GUNICORN_BIND': f"127.0.0.1:{port}",
+        'GUNICORN_PRELOAD': '1' if preload else '0'
+    })
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'flask_server:app'],
+        cwd=REPO_ROOT, env=env
+    )
+    try:
+        wait_until_ready(base_url, timeout)
+        # Without preload every worker loads on its own; wait until all of them have
+        while len(child_pids(server.pid)) < workers:
+            time.sleep(0.5)
+        if not preload:
+            for _ in range(workers * 4):
+                wait_until_ready(base_url, timeout)
+        if requests:
+            send_traffic(base_url, requests)
+
+        master = read_memory(server.pid)
+        worker_memory = {pid: read_memory(pid) for pid in child_pids(server.pid)}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    total_pss = master['pss_kib'] + sum(memory['pss_kib'] for memory in worker_memory.values())
+    return {
+        'workers': workers,
+        'threads': threads,
+        'preload': preload,
+        'requests': requests,
+        'master': master,
+        'worker_processes': worker_memory,
+        'mean_worker_private_kib': sum(m['private_kib'] for m in worker_memory.values()) / max(len(worker_memory), 1),
+        'total_pss_kib': total_pss
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per gunicorn worker")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--no-preload', action='store_true', help="Load the models in every worker")
+    parser.add_argument('--port', type=int, default=5057)
+    parser.add_argument('--requests', type=int, default=0, help="Questions to send before measuring")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for the server to be ready")
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = measure(args.workers, args.threads, not args.no_preload, args.port, args.requests, args.timeout)
+
+    print(f"{'process':<16}{'rss MiB':>10}{'pss MiB':>10}{'shared MiB':>12}{'private MiB':>13}")
+    rows = [('master', report['master'])] + [(f"worker {pid}", memory) for pid, memory in report['worker_processes'].items()]
+    for name, memory in rows:
+        print(f"{name:<16}{memory['rss_kib'] / 1024:>10.1f}{memory['pss_kib'] / 1024:>10.1f}"
+              f"{memory['shared_kib'] / 1024:>12.1f}{memory['private_kib'] / 1024:>13.1f}")
+    print(f"Mean private memory per worker: {report['mean_worker_private_kib'] / 1024:.1f} MiB "
+          f"({'preload' if report['preload'] else 'no preload'})")
+    print(f"Total PSS: {report['total_pss_kib'] / 1024:.1f} MiB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
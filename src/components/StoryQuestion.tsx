@@ -60,66 +60,88 @@ const StoryQuestion: React.FC<StoryQuestionProps> = ({ storyId, storyContent })
         const thinkingMessage = { role: 'assistant' as const, content: '...' };
         setMessages(prev => [...prev, thinkingMessage]);
 
-        // Delay for 2 seconds to simulate thinking
-        setTimeout(async () => {
-            try {
-                // Clean up story_id to remove 'root/' prefix if present
-                const cleanStoryId = storyId.replace('root/', '');
-                
-                const response = await fetch(`${API_BASE_URL}/api/stories/${cleanStoryId}/chat`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ 
-                        message: userMessage,
-                        story_id: cleanStoryId
-                    }),
-                    signal: controller.signal
-                });
+        // Replace the "thinking" message (or the partial answer) with new content
+        const showAssistantMessage = (content: string) => {
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                const rest = last && last.role === 'assistant' ? prev.slice(0, -1) : prev;
+                return [...rest, { role: 'assistant', content }];
+            });
+        };
+
+        const errorMessage = 'معذرت، میں اس وقت سوالات کا جواب نہیں دے سکتا۔ براہ کرم دوبارہ کوشش کریں۔';
+
+        try {
+            // Clean up story_id to remove 'root/' prefix if present
+            const cleanStoryId = storyId.replace('root/', '');
+            
+            // The answer is streamed as Server-Sent Events: 'token' events while
+            // the model generates, then one 'done' event with the final answer
+            const response = await fetch(`${API_BASE_URL}/api/stories/${cleanStoryId}/chat/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ 
+                    message: userMessage,
+                    story_id: cleanStoryId
+                }),
+                signal: controller.signal
+            });
+
+            if (!response.ok || !response.body) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
 
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let streamed = '';
+            let finished = false;
+
+            while (!finished) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split('\n\n');
+                buffer = events.pop() || '';
+                for (const rawEvent of events) {
+                    const eventName = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+                    const dataLine = (rawEvent.match(/^data: (.*)$/m) || [])[1];
+                    if (!eventName || !dataLine) continue;
+
+                    const data = JSON.parse(dataLine);
+                    if (eventName === 'token') {
+                        streamed += data.token;
+                        showAssistantMessage(streamed);
+                    } else if (eventName === 'done') {
+                        showAssistantMessage(data.success ? data.response : (data.error || errorMessage));
+                        finished = true;
+                    }
                 }
+            }
 
-                const data = await response.json();
-                
-                // Remove "thinking" message and add the real response
+            if (!finished) {
+                showAssistantMessage(streamed || errorMessage);
+            }
+        } catch (error: any) {
+            if (error.name === 'AbortError') {
                 setMessages(prev => {
                     const filtered = prev.filter(m => m.content !== '...');
-                    if (!data.success) {
-                        return [...filtered, { 
-                            role: 'assistant', 
-                            content: data.error || 'معذرت، میں اس وقت سوالات کا جواب نہیں دے سکتا۔ براہ کرم دوبارہ کوشش کریں۔' 
-                        }];
-                    } else {
-                        return [...filtered, { role: 'assistant', content: data.response }];
-                    }
+                    return [...filtered, { 
+                        role: 'assistant', 
+                        content: 'جواب روک دیا گیا۔' 
+                    }];
                 });
-            } catch (error: any) {
-                if (error.name === 'AbortError') {
-                    setMessages(prev => {
-                        const filtered = prev.filter(m => m.content !== '...');
-                        return [...filtered, { 
-                            role: 'assistant', 
-                            content: 'جواب روک دیا گیا۔' 
-                        }];
-                    });
-                } else {
-                    console.error('Error sending message:', error);
-                    setMessages(prev => {
-                        const filtered = prev.filter(m => m.content !== '...');
-                        return [...filtered, { 
-                            role: 'assistant', 
-                            content: 'معذرت، میں اس وقت سوالات کا جواب نہیں دے سکتا۔ براہ کرم دوبارہ کوشش کریں۔' 
-                        }];
-                    });
-                }
-            } finally {
-                setIsLoading(false);
-                setAbortController(null);
+            } else {
+                console.error('Error sending message:', error);
+                showAssistantMessage(errorMessage);
             }
-        }, 2000); // 2-second delay
+        } finally {
+            setIsLoading(false);
+            setAbortController(null);
+        }
     };
 
     const handleStop = () => {
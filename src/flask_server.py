@@ -1,21 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import json
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
 
+import metrics
+from http_cache import CachedBody, ResponseCache, cached_response
 from rag.rag_handler import rag_handler
 from story_handler import StoryHandler
+from story_store import get_story_store
 
 app = Flask(__name__)
 # Enable CORS for all routes with more specific configuration
 CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type"]}})
 
 print("Initializing Flask server...")
+# Stories are loaded on first access or by the warm-up at start-up
+story_store = get_story_store("data")
 story_handler = StoryHandler("data")
 print(f"Story handler: {story_handler}")
 print(f"RAG handler initialized")
 
+# Story and listing bodies with their ETags and compressed encodings, until the stories change
+story_responses = ResponseCache()
+listing_responses = ResponseCache(max_entries=64)
+# Seconds browsers may reuse a story response before revalidating it
+STORY_CACHE_MAX_AGE = int(os.getenv('STORY_CACHE_MAX_AGE', '60'))
+
 def load_json_file(filename):
     """Load data from a JSON file"""
     file_path = os.path.join('data', filename)
@@ -48,6 +61,36 @@ def ask_question():
             'error': str(e)
         }), 500
 
+def sse_response(events, max_lines=None):
+    """Send answer events as Server-Sent Events; the final event's response is limited to max_lines"""
+    def generate():
+        try:
+            for event in events:
+                if event['event'] == 'done' and max_lines and event.get('response'):
+                    response_lines = event['response'].split('\n')
+                    if len(response_lines) > max_lines:
+                        event = dict(event, response='\n'.join(response_lines[:max_lines]))
+                payload = {key: value for key, value in event.items() if key != 'event'}
+                yield f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield f"event: done\ndata: {json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False)}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Like /api/ask, but stream generated tokens as Server-Sent Events"""
+    data = request.get_json()
+    
+    if not data or 'question' not in data:
+        return jsonify({'success': False, 'error': 'Question is required'}), 400
+    
+    return sse_response(rag_handler.stream_answer(data['question'], data.get('story_id')))
+
 @app.route('/api/stories', methods=['GET'])
 def get_stories():
     """Get all stories or filter by age group and/or type"""
@@ -55,48 +98,37 @@ def get_stories():
     story_type = request.args.get('type')
     
     try:
-        # Direct implementation to read all stories
-        stories = []
-        data_dir = 'data'
-        
-        # Read stories from the data directory
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(data_dir, filename)
-                if os.path.isfile(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            story_data = json.load(f)
-                        
-                        # Extract story metadata
-                        story_title = story_data.get('title', 'Untitled')
-                        story_age_group = story_data.get('ageGroup', story_data.get('age_group', ''))
-                        story_language = story_data.get('language', 'urdu')
-                        story_type_value = story_data.get('type', 'story').lower()
-                        
-                        # Create story metadata object
-                        stories.append({
-                            'id': f'root/{os.path.splitext(filename)[0]}',
-                            'title': story_title,
-                            'age_group': story_age_group,
-                            'language': story_language,
-                            'type': story_type_value
-                        })
-                    except Exception as e:
-                        print(f"Error reading story file {file_path}: {e}")
-        
-        # Apply age group filter if specified
-        if age_group:
-            stories = [s for s in stories if s.get('age_group') == age_group]
+        # The response only changes when the stories do
+        story_store.refresh()
+        key = (age_group or '', (story_type or '').lower())
+        version = story_store.version
+        cached = listing_responses.get(key, version)
+        if cached is None:
+            records = {record.listing_entry['id']: record for record in story_store.records()}
             
-        # Apply type filter if specified
-        if story_type:
-            stories = [s for s in stories if s.get('type', '').lower() == story_type.lower()]
+            # Listing entries are pre-built by the story store
+            stories = story_store.list_stories()
             
-        return jsonify({
-            'success': True,
-            'stories': stories
-        })
+            # Apply age group filter if specified
+            if age_group:
+                stories = [s for s in stories if s.get('age_group') == age_group]
+                
+            # Apply type filter if specified
+            if story_type:
+                stories = [s for s in stories if s.get('type', '').lower() == story_type.lower()]
+            
+            listed = [records[s['id']] for s in stories if s['id'] in records]
+            etag = hashlib.sha1('\n'.join([repr(key)] + [f"{r.story_id}:{r.content_hash}" for r in listed]).encode('utf-8')).hexdigest()
+            cached = listing_responses.put(key, version, CachedBody(
+                jsonify({
+                    'success': True,
+                    'stories': stories
+                }).get_data(),
+                etag,
+                # Of the whole store: removing a story must change the listing's validators too
+                story_store.changed_at
+            ))
+        return cached_response(request, cached, STORY_CACHE_MAX_AGE)
     except Exception as e:
         error_msg = f"Error in get_stories: {str(e)}"
         print(error_msg)
@@ -105,6 +137,35 @@ def get_stories():
             'error': error_msg
         }), 500
 
+def resolve_story_name(story_name):
+    """Find the stored story matching a (possibly misspelled) story name"""
+    all_names = [name for name in story_store.story_ids() if '/' not in name]
+    
+    # Try to find the story with the exact name
+    if story_name in all_names:
+        return story_name
+    
+    # Try to find a story that starts with the same prefix
+    prefix = story_name.split('-')[0]
+    matching_names = [name for name in all_names if name.startswith(prefix)]
+    if matching_names:
+        print(f"Found matching story: {matching_names[0]}")
+        return matching_names[0]
+    
+    # Try with 'h' instead of 'j' and the other way round
+    for alt_name in (story_name.replace('jheel', 'hheel'), story_name.replace('hheel', 'jheel')):
+        if alt_name in all_names:
+            print(f"Found story with alternative spelling: {alt_name}")
+            return alt_name
+    
+    # If all else fails, try to find any story that contains the story name
+    for name in all_names:
+        if story_name in name:
+            print(f"Found story containing story name: {name}")
+            return name
+    
+    return None
+
 @app.route('/api/stories/<path:story_id>', methods=['GET'])
 def get_story(story_id):
     """Get a specific story by ID"""
@@ -113,7 +174,6 @@ def get_story(story_id):
         
         # Parse story ID to get file path
         parts = story_id.split('/')
-        print(f"Split parts: {parts}")
         
         # Handle both formats: 'root/story-name' and just 'story-name'
         if len(parts) == 2:
@@ -128,85 +188,28 @@ def get_story(story_id):
                 'error': 'Invalid story ID format'
             }), 400
             
-        print(f"Story name: {story_name}")
-        
-        # Look in the data directory directly
-        data_dir = 'data'
-        
-        # List all files in the data directory
-        all_files = os.listdir(data_dir) if os.path.exists(data_dir) else []
-        print(f"All files in data directory: {all_files}")
-        
-        # Try to find the file with the exact name
-        file_path = os.path.join(data_dir, f"{story_name}.json")
-        print(f"Looking for file at: {file_path}")
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            print(f"File not found at exact path: {file_path}")
-            
-            # Try to find a file that starts with the same prefix
-            matching_files = [f for f in all_files if f.startswith(story_name.split('-')[0]) and f.endswith('.json')]
-            print(f"Matching files: {matching_files}")
-            
-            if matching_files:
-                file_path = os.path.join(data_dir, matching_files[0])
-                print(f"Found matching file: {file_path}")
-            else:
-                # Try with different spellings
-                alt_name = story_name.replace('jheel', 'jheel').replace('jheel', 'jheel')
-                alt_path = os.path.join(data_dir, f"{alt_name}.json")
-                print(f"Trying alternative path: {alt_path}")
-                
-                if os.path.exists(alt_path):
-                    file_path = alt_path
-                    print(f"Found file with alternative spelling: {alt_path}")
-                else:
-                    # Try with 'h' instead of 'j'
-                    alt_name = story_name.replace('jheel', 'hheel')
-                    alt_path = os.path.join(data_dir, f"{alt_name}.json")
-                    print(f"Trying another alternative path: {alt_path}")
-                    
-                    if os.path.exists(alt_path):
-                        file_path = alt_path
-                        print(f"Found file with another alternative spelling: {alt_path}")
-                    else:
-                        # Try with 'j' instead of 'h'
-                        alt_name = story_name.replace('hheel', 'jheel')
-                        alt_path = os.path.join(data_dir, f"{alt_name}.json")
-                        print(f"Trying yet another alternative path: {alt_path}")
-                        
-                        if os.path.exists(alt_path):
-                            file_path = alt_path
-                            print(f"Found file with yet another alternative spelling: {alt_path}")
-                        else:
-                            # If all else fails, try to find any file that contains the story name
-                            for file in all_files:
-                                if story_name in file and file.endswith('.json'):
-                                    file_path = os.path.join(data_dir, file)
-                                    print(f"Found file containing story name: {file_path}")
-                                    break
-        
-        print(f"Final file path: {file_path}")
-        print(f"File exists: {os.path.exists(file_path)}")
+        resolved_name = resolve_story_name(story_name)
+        record = story_store.get_record(resolved_name) if resolved_name else None
         
-        # Check if file exists
-        if not os.path.exists(file_path):
-            print(f"Story not found at: {file_path}")
+        if record is None:
+            print(f"Story not found: {story_id}")
             return jsonify({
                 'success': False,
                 'error': f'Story not found: {story_id}'
             }), 404
             
-        # Read the story file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            story_data = json.load(f)
-            
-        print(f"Successfully loaded story: {story_name}")
-        return jsonify({
-            'success': True,
-            'story': story_data
-        })
+        print(f"Successfully loaded story: {resolved_name}")
+        cached = story_responses.get(record.story_id, record.content_hash)
+        if cached is None:
+            cached = story_responses.put(record.story_id, record.content_hash, CachedBody(
+                jsonify({
+                    'success': True,
+                    'story': record.data
+                }).get_data(),
+                record.content_hash,
+                record.mtime_ns / 1e9
+            ))
+        return cached_response(request, cached, STORY_CACHE_MAX_AGE)
     except Exception as e:
         print(f"Error in get_story: {str(e)}")
         app.logger.error(f"Error in get_story: {str(e)}")
@@ -215,6 +218,30 @@ def get_story(story_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness probe: 200 once the models and index are loaded, 503 before"""
+    status = {
+        'ready': rag_handler.ready,
+        'components': rag_handler.load_state
+    }
+    return jsonify(status), 200 if rag_handler.ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latencies, answer tiers, queue depth and load state in the Prometheus text format"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+def start_warm_up():
+    """Load the models and the index in the background while the server already accepts requests"""
+    def warm_up():
+        try:
+            rag_handler.warm_up()
+        except Exception as e:
+            print(f"Error warming up RAG handler: {e}")
+    
+    threading.Thread(target=warm_up, name="rag-warm-up", daemon=True).start()
+
 @app.route('/api/vocabulary', methods=['GET'])
 def get_vocabulary():
     """Get vocabulary data"""
@@ -304,25 +331,13 @@ def chat_about_story(story_id):
             
         message = data['message']
         
-        # Check if this is a sentence completion request
-        # If the message ends with a partial sentence (no period, question mark, etc.)
-        if not any(message.endswith(p) for p in ['.', '?', '!', '۔', '؟', '!']):
-            # Try to find the exact sentence completion
-            result = rag_handler.answer_question(message, story_id)
-            if result['success']:
-                # Limit response to 4 lines
-                response_lines = result['response'].split('\n')
-                if len(response_lines) > 4:
-                    result['response'] = '\n'.join(response_lines[:4])
-                return jsonify(result)
-        
-        # If not a sentence completion or no exact match found, use regular RAG
+        # Sentence completions and regular questions go through the same pipeline
         result = rag_handler.answer_question(message, story_id)
         if result['success']:
-            # Limit response to 4 lines
+            # Limit response to 4 lines (results may be shared, so copy before changing)
             response_lines = result['response'].split('\n')
             if len(response_lines) > 4:
-                result['response'] = '\n'.join(response_lines[:4])
+                result = dict(result, response='\n'.join(response_lines[:4]))
         return jsonify(result)
         
     except Exception as e:
@@ -332,6 +347,18 @@ def chat_about_story(story_id):
             "error": str(e)
         }), 500
 
+@app.route('/api/stories/<path:story_id>/chat/stream', methods=['POST'])
+def chat_about_story_stream(story_id):
+    """Like the chat endpoint, but stream generated tokens as Server-Sent Events"""
+    data = request.get_json()
+    if not data or 'message' not in data:
+        return jsonify({
+            "success": False,
+            "error": "Message is required"
+        }), 400
+    
+    return sse_response(rag_handler.stream_answer(data['message'], story_id), max_lines=4)
+
 def generate_questions_from_story(story_data: dict) -> dict:
     """Generate questions from story data"""
     try:
@@ -419,20 +446,13 @@ def generate_questions():
                     'error': 'Invalid story ID format'
                 }), 400
 
-            # Look in the data directory
-            data_dir = 'data'
-            file_path = os.path.join(data_dir, f"{story_name}.json")
-            
-            if not os.path.exists(file_path):
+            story_data = story_store.get(story_name)
+            if story_data is None:
                 return jsonify({
                     'success': False,
                     'error': f'Story not found: {story_id}'
                 }), 404
 
-            # Read the story file
-            with open(file_path, 'r', encoding='utf-8') as f:
-                story_data = json.load(f)
-
         except Exception as e:
             print(f"Error fetching story data: {str(e)}")
             return jsonify({
@@ -459,4 +479,7 @@ def generate_questions():
         }), 500
 
 if __name__ == '__main__':
+    # With the reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Conditional and compressed responses for the story endpoints
+
+A CachedBody holds one JSON response body together with its validators (a
+strong ETag derived from story content hashes and the Last-Modified time of
+the story files) and its gzip and brotli encodings, which are compressed on
+first use and then kept. ResponseCache keeps one CachedBody per story or
+listing until its source changes. Brotli is used when the ``brotli`` package
+is installed.
+"""
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import gzip
+import threading
+from flask import Request, Response
+from werkzeug.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Bodies smaller than this are not worth a compressed copy
+MIN_COMPRESS_SIZE = 512
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        # mtime=0 keeps the output, and so the ETag's representation, identical across processes
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+class CachedBody:
+    """A response body with its validators and its compressed encodings"""
+
+    def __init__(self, body: bytes, etag: str, last_modified: Optional[float] = None,
+                 mimetype: str = 'application/json'):
+        """
+        Args:
+            body: Uncompressed body
+            etag: Strong entity tag of the uncompressed body, without quotes
+            last_modified: Modification time (Unix seconds) of the content
+        """
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.mimetype = mimetype
+        self._encoded: Dict[str, bytes] = {'identity': body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        """The body in the given content encoding, compressed once and then reused"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = _compress(self.body, encoding)
+                    self._encoded[encoding] = data
+        return data
+
+    def etag_for(self, encoding: str) -> str:
+        # Each encoding is its own representation and needs its own strong ETag
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+
+class ResponseCache:
+    """CachedBody per key, valid for one version of its source (content hash, corpus version)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[object, Tuple[object, CachedBody]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, cached: CachedBody) -> CachedBody:
+        with self._lock:
+            self._entries[key] = (version, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+
+def choose_encoding(request: Request, body_size: int) -> str:
+    """The best content encoding the client accepts, or 'identity'"""
+    if body_size < MIN_COMPRESS_SIZE:
+        return 'identity'
+    accepted = request.accept_encodings
+    best, best_quality = 'identity', 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _not_modified(request: Request, cached: CachedBody) -> bool:
+    if request.if_none_match:
+        # Any encoding of the same content is a match (If-None-Match uses weak comparison)
+        return any(request.if_none_match.contains_weak(cached.etag_for(encoding))
+                   for encoding in ('identity',) + ENCODINGS)
+    if request.if_modified_since is not None and cached.last_modified is not None:
+        return int(cached.last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+def cached_response(request: Request, cached: CachedBody, max_age: int = 0) -> Response:
+    """
+    Answer a GET from a CachedBody: 304 if the client's copy is current,
+    otherwise the body in the best encoding the client accepts
+    """
+    encoding = choose_encoding(request, len(cached.body))
+    headers = {
+        'ETag': f'"{cached.etag_for(encoding)}"',
+        'Cache-Control': f"public, max-age={max_age}, must-revalidate",
+        'Vary': 'Accept-Encoding'
+    }
+    if cached.last_modified is not None:
+        headers['Last-Modified'] = http_date(cached.last_modified)
+
+    if _not_modified(request, cached):
+        return Response(status=304, headers=headers)
+
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(cached.encoded(encoding), status=200, mimetype=cached.mimetype, headers=headers)
@@ -0,0 +1,145 @@
+from typing import Optional
+import asyncio
+import os
+import random
+import threading
+import time
+
+DEFAULT_BASE_URL = "https://api.cohere.ai"
+
+# Responses worth retrying: rate limiting and upstream failures
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CohereError(Exception):
+    """Raised when the Cohere API rejects a request or keeps failing until the deadline"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CohereTimeout(CohereError):
+    """Raised when a call does not complete within its deadline"""
+
+
+class AsyncCohereClient:
+    """
+    Async client for Cohere's generate endpoint
+
+    One pooled aiohttp session serves all calls. At most ``max_concurrency``
+    requests are in flight; callers wait for a slot within their deadline.
+    Each call has an overall deadline of ``timeout`` seconds covering the
+    wait for a slot and every attempt, and transient failures (connection
+    errors, 429 and 5xx responses) are retried with jittered exponential
+    backoff while the deadline allows.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str = DEFAULT_BASE_URL, max_concurrency: int = 8,
+                 timeout: float = 30.0, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.in_flight = 0
+        # Created on the event loop that first uses the client
+        self._session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                headers={
+                    'Authorization': f"Bearer {self.api_key}",
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json'
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, **params) -> str:
+        """Generate a completion and return its text"""
+        import aiohttp
+        deadline = time.monotonic() + (timeout or self.timeout)
+        session = self._get_session()
+        payload = dict(params, prompt=prompt)
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise CohereTimeout(f"No Cohere request slot became free within {timeout or self.timeout} seconds")
+        self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CohereTimeout(f"Cohere call did not complete within {timeout or self.timeout} seconds")
+                retry_after = None
+                try:
+                    async with session.post(f"{self.base_url}/v1/generate", json=payload,
+                                            timeout=aiohttp.ClientTimeout(total=remaining)) as response:
+                        if response.status == 200:
+                            body = await response.json()
+                            return body['generations'][0]['text']
+                        error = CohereError(f"Cohere returned {response.status}: {(await response.text())[:200]}", response.status)
+                        if response.status not in _RETRYABLE_STATUS:
+                            raise error
+                        retry_after = response.headers.get('Retry-After')
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    error = CohereTimeout(f"Cohere call timed out: {e}") if isinstance(e, asyncio.TimeoutError) else CohereError(f"Cohere connection failed: {e}")
+
+                if attempt >= self.max_retries:
+                    raise error
+                delay = self._backoff(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise error
+                print(f"Retrying Cohere call after error ({error}), attempt {attempt + 2}")
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class EventLoopThread:
+    """An asyncio event loop on a daemon thread, for calling async code from Flask's request threads"""
+
+    def __init__(self, name: str = "async-io"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+
+def client_from_env() -> AsyncCohereClient:
+    """Create a client configured by the COHERE_* environment variables"""
+    return AsyncCohereClient(
+        os.getenv('COHERE_API_KEY'),
+        base_url=os.getenv('COHERE_BASE_URL', DEFAULT_BASE_URL),
+        max_concurrency=int(os.getenv('COHERE_MAX_CONCURRENCY', '8')),
+        timeout=float(os.getenv('COHERE_TIMEOUT', '30')),
+        max_retries=int(os.getenv('COHERE_MAX_RETRIES', '3'))
+    )
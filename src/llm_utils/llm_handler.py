@@ -1,19 +1,58 @@
 from typing import Dict, Any
 import re
-import cohere
 import os
+import threading
+import time
+import atexit
 from dotenv import load_dotenv
+import metrics
+from llm_utils.cohere_client import AsyncCohereClient, CohereTimeout, EventLoopThread, client_from_env
 
 # Load environment variables
 load_dotenv()
 
+_COHERE_SECONDS = metrics.registry.histogram(
+    'cohere_generate_seconds', "Time of Cohere generate calls, including retries", ['outcome'])
+
 class LLMHandler:
     def __init__(self):
         print("LLM Handler initialized")
-        # Initialize Cohere client
-        self.co = cohere.Client(os.getenv('COHERE_API_KEY'))
+        self._client = None
+        self._loop_thread = None
+        self._init_lock = threading.Lock()
+        
+    @property
+    def client(self) -> AsyncCohereClient:
+        # Initialize Cohere client on first use, not when the server imports this module
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    self._client = client_from_env()
+        return self._client
+    
+    @property
+    def loop_thread(self) -> EventLoopThread:
+        # All calls share one event loop, and with it the client's connection pool and concurrency limit
+        if self._loop_thread is None:
+            with self._init_lock:
+                if self._loop_thread is None:
+                    self._loop_thread = EventLoopThread(name="cohere-io")
+                    atexit.register(self._close)
+        return self._loop_thread
+    
+    def _close(self):
+        if self._client is not None:
+            try:
+                self._loop_thread.run(self._client.close(), timeout=5)
+            except Exception as e:
+                print(f"Error closing Cohere client: {e}")
         
     def chat_about_story(self, story_content: str, question: str) -> dict:
+        """Generate a response about a story, blocking the calling (request) thread until it is done."""
+        # The client enforces its own deadline; the margin only guards against a stuck loop
+        return self.loop_thread.run(self.chat_about_story_async(story_content, question), timeout=self.client.timeout + 5)
+        
+    async def chat_about_story_async(self, story_content: str, question: str) -> dict:
         """Generate a response about a story using the full story content."""
         try:
             # Input validation
@@ -44,18 +83,27 @@ Please provide your answer in Urdu language.
 """
             
             # Get response from Cohere
-            response = self.co.generate(
-                model="command",  # Using Cohere's Command model
-                prompt=prompt,
-                max_tokens=200,  # Reduced for shorter responses
-                temperature=0.3,  # Lower temperature for more focused responses
-                k=0,
-                stop_sequences=["\n", "بچے کا سوال:", "کہانی:"],  # Stop at newlines or new questions
-                return_likelihoods='NONE'
-            )
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                generated_text = await self.client.generate(
+                    prompt,
+                    model="command",  # Using Cohere's Command model
+                    max_tokens=200,  # Reduced for shorter responses
+                    temperature=0.3,  # Lower temperature for more focused responses
+                    k=0,
+                    stop_sequences=["\n", "بچے کا سوال:", "کہانی:"],  # Stop at newlines or new questions
+                    return_likelihoods='NONE'
+                )
+                outcome = 'success'
+            except CohereTimeout:
+                outcome = 'timeout'
+                raise
+            finally:
+                _COHERE_SECONDS.labels(outcome).observe(time.perf_counter() - start)
             
             # Extract the generated text
-            generated_text = response.generations[0].text.strip()
+            generated_text = generated_text.strip()
             
             # Validate response
             if not generated_text:
@@ -89,4 +137,9 @@ def chat_about_story(story_content: str, question: str) -> dict:
     return _handler.chat_about_story(story_content, question)
 
 # Export the handler instance for direct use
-llm_handler = _handler 
\ No newline at end of file
+llm_handler = _handler
+
+metrics.registry.gauge(
+    'cohere_requests_in_flight', "Cohere requests holding a connection slot",
+    function=lambda: _handler._client.in_flight if _handler._client is not None else 0,
+    multiprocess_mode='sum') 
\ No newline at end of file
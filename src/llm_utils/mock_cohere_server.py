@@ -0,0 +1,85 @@
+"""
+Local stand-in for Cohere's generate endpoint, for working and testing offline
+
+Answers POST /v1/generate with a deterministic Urdu reply built from the
+child's question in the prompt. It can add latency and fail a share of the
+requests with 503 or 429 responses to exercise the client's timeouts and
+retries.
+
+Usage (from the repository root):
+    python src/llm_utils/mock_cohere_server.py --port 8081 --latency 0.2 --failure-rate 0.1
+    COHERE_BASE_URL=http://127.0.0.1:8081 python src/flask_server.py
+"""
+import argparse
+import asyncio
+import random
+from aiohttp import web
+
+_QUESTION_MARKER = "Child's question:"
+
+
+def _reply_for(prompt: str) -> str:
+    question = ''
+    if _QUESTION_MARKER in prompt:
+        question = prompt.split(_QUESTION_MARKER, 1)[1].strip().split('\n', 1)[0]
+    return f"کہانی کے مطابق: {question}" if question else "کہانی میں ذکر نہیں۔"
+
+
+def create_app(latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0, fail_first: int = 0,
+               retry_after: str = '0') -> web.Application:
+    """
+    Args:
+        latency: Seconds to wait before answering
+        failure_rate: Share of requests answered with a retryable error
+        seed: Seed of the failure sampling, for reproducible runs
+        fail_first: Fail this many requests first, alternating 429 and 503
+        retry_after: Retry-After header of the 429 responses
+    """
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'failures': 0}
+
+    async def generate(request: web.Request) -> web.Response:
+        stats['requests'] += 1
+        number = stats['requests']
+        payload = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        if number <= fail_first:
+            rate_limited = number % 2 == 1
+        elif rng.random() < failure_rate:
+            rate_limited = rng.random() < 0.5
+        else:
+            rate_limited = None
+        if rate_limited is not None:
+            stats['failures'] += 1
+            if rate_limited:
+                return web.json_response({'message': 'too many requests'}, status=429, headers={'Retry-After': retry_after})
+            return web.json_response({'message': 'service unavailable'}, status=503)
+        return web.json_response({
+            'id': f"mock-{number}",
+            'prompt': payload.get('prompt', ''),
+            'generations': [{'id': 'mock-0', 'text': _reply_for(payload.get('prompt', ''))}]
+        })
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post('/v1/generate', generate)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Cohere generate API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests that fail with 429/503")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    web.run_app(create_app(args.latency, args.failure_rate, args.seed), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
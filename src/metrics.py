@@ -0,0 +1,442 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+
+Counters, gauges and histograms live in one module-level registry and are
+served by the Flask server on /metrics. Recording a value costs a dict lookup,
+a lock and (for histograms) a bisect, so it is cheap enough for the request
+path. Gauges can be backed by a function that is only called when the metrics
+are rendered.
+
+Metrics are recorded per process. When PROMETHEUS_MULTIPROC_DIR names a
+directory (as under gunicorn, see gunicorn.conf.py), every process also
+writes a snapshot of its metrics there every METRICS_FLUSH_SECONDS (default
+5) and /metrics renders the sum over all processes, so a scrape sees the
+whole server whichever worker answers it. Counters and histograms of workers
+that exited are kept; gauges are reported per process with a ``pid`` label,
+or summed over the live processes for gauges registered with
+``multiprocess_mode='sum'``. Values of other workers are up to one flush
+interval old.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+# Seconds; from cache hits and index lookups up to full generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The metric for one combination of label values (strings, in labelnames order)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _sorted_children(self):
+        return sorted(list(self._children.items()))
+
+    def _values(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        """(label values, value) pairs; histogram values are (bucket counts, sum)"""
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        return {'kind': self.kind, 'documentation': self.documentation, 'labelnames': list(self.labelnames)}
+
+    def render(self) -> str:
+        return _render_metric(self.name, self.describe(), self._values())
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as the number of answers served; name it with a _total suffix"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Current value per combination of label values"""
+        return {values: child.value for values, child in self._sorted_children()}
+
+    def _values(self):
+        return [(values, child.value) for values, child in self._sorted_children()]
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def reset(self):
+        self.value = 0.0
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, such as the number of queued generations
+
+    With ``function`` the gauge is read when the metrics are rendered: the
+    function returns a number, or for labelled gauges a dict from label value
+    tuples to numbers. ``multiprocess_mode`` is 'all' (one series per process)
+    or 'sum' (summed over the live processes).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None, multiprocess_mode: str = 'all'):
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in ('all', 'sum'):
+            raise ValueError(f"Unknown multiprocess mode: {multiprocess_mode}")
+        self.function = function
+        self.multiprocess_mode = multiprocess_mode
+
+    def describe(self):
+        return dict(super().describe(), multiprocess_mode=self.multiprocess_mode)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _values(self):
+        if self.function is None:
+            return [(values, child.value) for values, child in self._sorted_children()]
+        try:
+            current = self.function()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return []
+        if not isinstance(current, dict):
+            return [((), float(current))]
+        return [(tuple(values), float(value)) for values, value in sorted(current.items())]
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One count per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager that observes the seconds spent in its block"""
+        return _Timer(self)
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds) over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+    def _values(self):
+        values = []
+        for label_values, child in self._sorted_children():
+            with child._lock:
+                values.append((label_values, (list(child.counts), child.sum)))
+        return values
+
+
+def _render_metric(name: str, description: Dict[str, Any], values: List[Tuple[Tuple[str, ...], Any]]) -> str:
+    labelnames = tuple(description['labelnames'])
+    lines = [f"# HELP {name} {description['documentation']}", f"# TYPE {name} {description['kind']}"]
+    for label_values, value in values:
+        labels = _format_labels(labelnames, label_values)
+        if description['kind'] != 'histogram':
+            lines.append(f"{name}{labels} {_format_value(value)}")
+            continue
+        counts, total = value
+        cumulative = 0
+        for upper_bound, count in zip(tuple(description['buckets']) + (math.inf,), counts):
+            cumulative += count
+            bucket_labels = _format_labels(labelnames + ('le',), tuple(label_values) + (_format_value(upper_bound),))
+            lines.append(f"{name}_bucket{bucket_labels} {_format_value(cumulative)}")
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {_format_value(cumulative)}")
+    return '\n'.join(lines)
+
+
+class Registry:
+    """The metrics of this process, by name"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules may be imported more than once (tests, benchmarks); keep the first metric
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                if isinstance(metric, Gauge) and metric.function is not None:
+                    existing.function = metric.function
+                    existing.multiprocess_mode = metric.multiprocess_mode
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], object]] = None, multiprocess_mode: str = 'all') -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function, multiprocess_mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def _all(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self):
+        """Forget all recorded values, e.g. those a forked worker inherited from its parent"""
+        # In place: modules keep references to children (metric.labels(...)) of their own
+        for metric in self._all():
+            for child in list(metric._children.values()):
+                child.reset()
+
+    def snapshot(self, include_gauges: bool = True) -> Dict[str, Any]:
+        """Every metric's description and current values, as stored in the multiprocess directory"""
+        snapshot = {}
+        for metric in self._all():
+            if isinstance(metric, Gauge) and not include_gauges:
+                continue
+            snapshot[metric.name] = dict(metric.describe(), values=[[list(values), value] for values, value in metric._values()])
+        return snapshot
+
+    def write_snapshot(self, directory: Optional[str] = None, include_gauges: bool = True):
+        """Store this process's metrics in the multiprocess directory, if there is one"""
+        directory = directory or multiprocess_dir()
+        if not directory:
+            return
+        path = _snapshot_path(directory, os.getpid())
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(include_gauges), f)
+        # Readers never see a partly written file
+        os.replace(temporary, path)
+
+    def start_flushing(self, interval: Optional[float] = None):
+        """Write this process's snapshot every ``interval`` seconds on a daemon thread (once per process)"""
+        if not multiprocess_dir() or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        interval = interval if interval is not None else float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    print(f"Error writing metrics snapshot: {e}")
+        threading.Thread(target=flush, name="metrics-flush", daemon=True).start()
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4),
+        summed over every process in the multiprocess directory if there is one
+        """
+        directory = multiprocess_dir()
+        if not directory:
+            return self._render_local()
+        self.write_snapshot(directory)
+        merged = merge_snapshots(directory)
+        return '\n'.join(_render_metric(name, description, description['values'])
+                         for name, description in merged.items()) + '\n'
+
+    def _render_local(self) -> str:
+        return '\n'.join(metric.render() for metric in self._all()) + '\n'
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.getenv('PROMETHEUS_MULTIPROC_DIR') or None
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def clear_multiprocess_dir(directory: Optional[str] = None):
+    """Remove the snapshots of an earlier server run; call once before starting the workers"""
+    directory = directory or multiprocess_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json*')):
+        os.remove(path)
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None):
+    """Drop the gauges of an exited process; its counters and histograms stay in the totals"""
+    directory = directory or multiprocess_dir()
+    if not directory:
+        return
+    path = _snapshot_path(directory, pid)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    snapshot = {name: description for name, description in snapshot.items() if description['kind'] != 'gauge'}
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(temporary, path)
+
+
+def merge_snapshots(directory: str) -> Dict[str, Any]:
+    """
+    The metrics of every process in the directory: counters and histograms
+    summed, gauges summed or labelled with the process id
+    """
+    merged: Dict[str, Any] = {}
+    totals: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'metrics_*.json'))):
+        pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading metrics snapshot {path}: {e}")
+            continue
+        for name, description in snapshot.items():
+            if name not in merged:
+                merged[name] = {key: value for key, value in description.items() if key != 'values'}
+                if description['kind'] == 'gauge' and description.get('multiprocess_mode') == 'all':
+                    merged[name]['labelnames'] = description['labelnames'] + ['pid']
+                totals[name] = {}
+            per_name = totals[name]
+            for values, value in description['values']:
+                key = tuple(values)
+                if description['kind'] == 'gauge' and description.get('multiprocess_mode') == 'all':
+                    per_name[key + (pid,)] = value
+                elif description['kind'] == 'histogram':
+                    counts, total = per_name.get(key, ([0] * len(value[0]), 0.0))
+                    per_name[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1])
+                else:
+                    per_name[key] = per_name.get(key, 0.0) + value
+    for name, description in merged.items():
+        description['values'] = sorted(totals[name].items())
+    return merged
+
+
+# Exposition content type served on /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
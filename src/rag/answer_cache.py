@@ -0,0 +1,133 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ('content_hash', 'response', 'embedding', 'created')
+
+    def __init__(self, content_hash: str, response: Dict[str, Any], embedding: Optional[np.ndarray], created: float):
+        self.content_hash = content_hash
+        self.response = response
+        self.embedding = embedding
+        self.created = created
+
+
+class AnswerCache:
+    """
+    LRU/TTL cache of generated answers keyed by (story_id, normalized question)
+
+    Besides exact key lookups, a question whose embedding is at least
+    ``similarity_threshold`` cosine-similar to a cached question about the same
+    story is served the cached answer. Entries remember the content hash of the
+    story they were generated from and are dropped once it changes.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 24 * 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # Per story: question keys and the matrix of their normalized embeddings
+        self._story_keys: Dict[str, list] = {}
+        self._story_matrices: Dict[str, Optional[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        keys = self._story_keys.get(key[0])
+        if keys is not None and key[1] in keys:
+            keys.remove(key[1])
+            self._story_matrices[key[0]] = None
+
+    def _is_valid(self, entry: _Entry, content_hash: str, now: float) -> bool:
+        return entry.content_hash == content_hash and now - entry.created < self.ttl_seconds
+
+    def _story_matrix(self, story_id: str) -> Optional[np.ndarray]:
+        matrix = self._story_matrices.get(story_id)
+        if matrix is None:
+            vectors = [self._entries[(story_id, key)].embedding for key in self._story_keys.get(story_id, [])]
+            if not vectors:
+                return None
+            matrix = np.stack(vectors)
+            self._story_matrices[story_id] = matrix
+        return matrix
+
+    def get(self, story_id: str, question_key: str, content_hash: str,
+            question_embedding: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """Get a cached answer for the question or a near-duplicate of it"""
+        now = time.monotonic()
+        with self._lock:
+            key = (story_id, question_key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_valid(entry, content_hash, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.response
+                self._remove(key)
+
+            if question_embedding is not None:
+                matrix = self._story_matrix(story_id)
+                if matrix is not None:
+                    query = question_embedding / max(float(np.linalg.norm(question_embedding)), 1e-12)
+                    similarities = matrix @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        near_key = (story_id, self._story_keys[story_id][best])
+                        near_entry = self._entries[near_key]
+                        if self._is_valid(near_entry, content_hash, now):
+                            self._entries.move_to_end(near_key)
+                            self.near_hits += 1
+                            return near_entry.response
+                        self._remove(near_key)
+
+            self.misses += 1
+            return None
+
+    def put(self, story_id: str, question_key: str, content_hash: str, response: Dict[str, Any],
+            question_embedding: Optional[np.ndarray] = None):
+        embedding = None
+        if question_embedding is not None:
+            embedding = np.asarray(question_embedding, dtype=np.float32)
+            embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+        with self._lock:
+            key = (story_id, question_key)
+            self._remove(key)
+            self._entries[key] = _Entry(content_hash, response, embedding, time.monotonic())
+            if embedding is not None:
+                self._story_keys.setdefault(story_id, []).append(question_key)
+                self._story_matrices[story_id] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_story(self, story_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == story_id]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._story_keys.clear()
+            self._story_matrices.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,123 @@
+"""
+Build a deployable retrieval index from the story files
+
+Segments and embeds every story in ``data/`` using several worker processes
+and writes an index artifact directory (see rag/index_artifact.py) holding the
+sentence vectors, sentence texts and metadata, the direct-answer table and
+the BM25 indexes, with a manifest of checksums. Point the server at it with
+INDEX_PATH and it memory-maps the artifact at start-up instead of embedding
+the corpus itself.
+
+Usage (from the repository root):
+    python src/rag/build_index.py --data-dir data --output index --workers 4
+"""
+from typing import Dict, List, Any, Tuple
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from story_store import StoryStore
+from rag.indexer import story_sentences, build_direct_answers, EMBEDDING_MODEL_NAME
+from rag.lexical_index import LexicalIndex
+from rag.vector_store import NumpyVectorStore, VECTOR_DTYPES
+from rag.index_artifact import save_artifact
+
+# Model held by each worker process, loaded by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _embed_stories(stories: List[Tuple[str, Dict[str, Any]]], batch_size: int) -> List[Tuple[str, list, np.ndarray]]:
+    """Segment and embed a shard of stories: (story_id, sentences, vectors) per story"""
+    segmented = [(story_id, story_sentences(story_id, data)) for story_id, data in stories]
+    texts = [sentence for _, sentences in segmented for _, sentence, _ in sentences]
+    vectors = np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32) if texts else None
+
+    results = []
+    offset = 0
+    for story_id, sentences in segmented:
+        results.append((story_id, sentences, vectors[offset:offset + len(sentences)] if sentences else None))
+        offset += len(sentences)
+    return results
+
+
+def build_index(data_dir: str, output: str, workers: int = 2, batch_size: int = 64,
+                stories_per_task: int = 16, dtype: str = 'float32') -> Dict[str, Any]:
+    """Embed every top-level story in data_dir and write the index artifact to output"""
+    store = StoryStore(data_dir)
+    store.refresh(force=True)
+    records = [record for record in store.records() if '/' not in record.story_id]
+    shards = [
+        [(record.story_id, record.data) for record in records[start:start + stories_per_task]]
+        for start in range(0, len(records), stories_per_task)
+    ]
+
+    if workers > 1:
+        # Spawn rather than fork, as in the inference pool
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(EMBEDDING_MODEL_NAME,)) as executor:
+            embedded = [story for shard in executor.map(_embed_stories, shards, [batch_size] * len(shards)) for story in shard]
+    else:
+        _init_worker(EMBEDDING_MODEL_NAME)
+        embedded = [story for shard in shards for story in _embed_stories(shard, batch_size)]
+
+    vector_store = NumpyVectorStore(dtype=dtype)
+    vector_store.replace_stories({
+        story_id: (
+            [sentence_id for sentence_id, _, _ in sentences],
+            vectors,
+            [sentence for _, sentence, _ in sentences],
+            [metadata for _, _, metadata in sentences]
+        )
+        for story_id, sentences, vectors in embedded if sentences
+    })
+
+    sentences_by_story = {story_id: sentences for story_id, sentences, _ in embedded}
+    lexical_indexes = {
+        story_id: LexicalIndex([sentence_id for sentence_id, _, _ in sentences], [sentence for _, sentence, _ in sentences])
+        for story_id, sentences in sentences_by_story.items()
+    }
+    direct_answers = {record.story_id: build_direct_answers(record.data) for record in records}
+
+    return save_artifact(
+        output,
+        vector_store,
+        {record.story_id: record.content_hash for record in records},
+        direct_answers,
+        lexical_indexes,
+        EMBEDDING_MODEL_NAME
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the retrieval index artifact")
+    parser.add_argument('--data-dir', default='data', help="Directory with the story JSON files")
+    parser.add_argument('--output', default='index', help="Artifact directory to write")
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help="Embedding processes (each loads its own model)")
+    parser.add_argument('--batch-size', type=int, default=64, help="Sentences per encode call")
+    parser.add_argument('--stories-per-task', type=int, default=16, help="Stories handed to a worker at a time")
+    parser.add_argument('--dtype', choices=VECTOR_DTYPES, default='float32', help="Storage type of the vectors")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = build_index(args.data_dir, args.output, workers=args.workers, batch_size=args.batch_size,
+                           stories_per_task=args.stories_per_task, dtype=args.dtype)
+    print(f"Indexed {manifest['sentences']} sentences from {len(manifest['story_hashes'])} stories "
+          f"into {args.output} (build {manifest['build_id']}, {manifest['dtype']}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+from typing import List, Optional, Tuple
+import bisect
+import numpy as np
+from rag.text_utils import fold_text
+
+# Separates sentences in the indexed text; never part of a query
+_SEPARATOR = '\x00'
+
+
+def _suffix_array(text: str) -> np.ndarray:
+    """Build a suffix array by prefix doubling"""
+    n = len(text)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.array([ord(c) for c in text], dtype=np.int64)
+    sa = np.argsort(rank, kind='stable')
+    k = 1
+    while True:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        sa = np.lexsort((second, rank))
+        ranked_first = rank[sa]
+        ranked_second = second[sa]
+        boundaries = (ranked_first[1:] != ranked_first[:-1]) | (ranked_second[1:] != ranked_second[:-1])
+        new_rank = np.empty(n, dtype=np.int64)
+        new_rank[sa] = np.concatenate(([0], np.cumsum(boundaries)))
+        rank = new_rank
+        if rank[sa[-1]] == n - 1 or k >= n:
+            return sa
+        k *= 2
+
+
+class CompletionIndex:
+    """
+    Substring index over the sentences of one story
+
+    Answers "which sentence contains this partial text, and from what offset"
+    with two binary searches over a suffix array of the folded sentence text.
+    When the text occurs several times the earliest sentence and offset win,
+    matching a front-to-back scan of the story.
+    """
+
+    def __init__(self, sentences: List[str]):
+        self.sentences = sentences
+        self._starts = []
+        position = 0
+        for sentence in sentences:
+            self._starts.append(position)
+            position += len(sentence) + 1
+        self._text = _SEPARATOR.join(fold_text(sentence) for sentence in sentences)
+        self._suffixes = _suffix_array(self._text)
+
+    def _bounds(self, pattern: str) -> Tuple[int, int]:
+        text = self._text
+        suffixes = self._suffixes
+        m = len(pattern)
+
+        lo, hi = 0, len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = suffixes[mid]
+            if text[start:start + m] < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+
+        hi = len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = suffixes[mid]
+            if text[start:start + m] <= pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return first, lo
+
+    def find(self, partial_text: str) -> Optional[Tuple[int, int]]:
+        """
+        Locate partial text in the story
+
+        Returns:
+            (sentence index, character offset) of the earliest occurrence, or None
+        """
+        if not partial_text or _SEPARATOR in partial_text:
+            return None
+        first, last = self._bounds(fold_text(partial_text))
+        if first >= last:
+            return None
+        position = int(self._suffixes[first:last].min())
+        sentence_index = bisect.bisect_right(self._starts, position) - 1
+        return sentence_index, position - self._starts[sentence_index]
+
+    def complete(self, partial_text: str) -> Optional[str]:
+        """Get the rest of the sentence starting at the partial text"""
+        found = self.find(partial_text)
+        if found is None:
+            return None
+        sentence_index, offset = found
+        return self.sentences[sentence_index][offset:]
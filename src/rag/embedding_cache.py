@@ -0,0 +1,122 @@
+from typing import Callable, Dict, List, Any, Optional, Sequence
+from collections import OrderedDict
+import os
+import threading
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a text: surrounding and repeated whitespace removed"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of text -> embedding vector in front of an encode function
+
+    Texts are normalized before lookup and the normalized text is what gets
+    encoded, so equal keys always map to the same vector. Entries are evicted in
+    least-recently-used order once their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_bytes: int = 64 * 1024 * 1024,
+                 persist_path: Optional[str] = None):
+        self.encode_fn = encode_fn
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _put(self, key: str, vector: np.ndarray):
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def encode(self, text: str) -> np.ndarray:
+        """Get the embedding of a single text"""
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Get the embeddings of several texts, encoding all misses in one batch"""
+        keys = [normalize_text(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [self._get(key) for key in keys]
+
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, self.encode_fn(missing)))
+            for key, vector in encoded.items():
+                self._put(key, vector)
+            vectors = [vector if vector is not None else encoded[key] for key, vector in zip(keys, vectors)]
+
+        return np.stack([np.asarray(vector, dtype=np.float32) for vector in vectors])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def save(self, path: Optional[str] = None):
+        """Write all entries to an .npz file, least recently used first"""
+        path = path or self.persist_path
+        if not path:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Per process, as forked server workers may save at the same time
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=np.array(keys, dtype=str), vectors=np.stack(vectors))
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None):
+        """Add entries from a file written by ``save``"""
+        path = path or self.persist_path
+        try:
+            with np.load(path) as data:
+                for key, vector in zip(data['keys'], data['vectors']):
+                    self._put(str(key), vector)
+        except Exception as e:
+            print(f"Error loading embedding cache {path}: {e}")
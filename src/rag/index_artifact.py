@@ -0,0 +1,160 @@
+from typing import Dict, Any, Optional
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from rag.lexical_index import LexicalIndex
+from rag.vector_store import NumpyVectorStore
+
+# Bumped whenever the layout of the artifact changes
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.npy'
+SCALES_FILE = 'scales.npy'
+SENTENCES_FILE = 'sentences.json'
+DIRECT_ANSWERS_FILE = 'direct_answers.json'
+LEXICAL_FILE = 'lexical.json'
+
+
+class ArtifactError(Exception):
+    """Raised when an index artifact is missing, incompatible or corrupt"""
+
+
+class IndexArtifact:
+    """A loaded index artifact: vector store plus the per-story tables built with it"""
+
+    def __init__(self, manifest: Dict[str, Any], store: NumpyVectorStore,
+                 direct_answers: Dict[str, Dict[str, Any]], lexical_indexes: Dict[str, LexicalIndex]):
+        self.manifest = manifest
+        self.store = store
+        self.direct_answers = direct_answers
+        self.lexical_indexes = lexical_indexes
+
+    @property
+    def story_hashes(self) -> Dict[str, str]:
+        return self.manifest['story_hashes']
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data: Any):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def save_artifact(path: str, store: NumpyVectorStore, story_hashes: Dict[str, str],
+                  direct_answers: Dict[str, Dict[str, Any]], lexical_indexes: Dict[str, LexicalIndex],
+                  model_name: str) -> Dict[str, Any]:
+    """
+    Write an index artifact directory
+
+    The files are written to a temporary directory next to ``path`` which then
+    replaces ``path``, so readers never see a half-written artifact.
+
+    Returns:
+        The artifact manifest
+    """
+    arrays = store.arrays()
+    tmp_path = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, VECTORS_FILE), arrays['matrix'])
+    if arrays['scales'] is not None:
+        np.save(os.path.join(tmp_path, SCALES_FILE), arrays['scales'])
+    _write_json(os.path.join(tmp_path, SENTENCES_FILE), {
+        'ids': arrays['ids'],
+        'documents': arrays['documents'],
+        'metadatas': arrays['metadatas'],
+        'ranges': {story_id: list(row_range) for story_id, row_range in arrays['ranges'].items()}
+    })
+    _write_json(os.path.join(tmp_path, DIRECT_ANSWERS_FILE), direct_answers)
+    _write_json(os.path.join(tmp_path, LEXICAL_FILE), {story_id: index.to_dict() for story_id, index in lexical_indexes.items()})
+
+    files = {}
+    for name in sorted(os.listdir(tmp_path)):
+        file_path = os.path.join(tmp_path, name)
+        files[name] = {'sha256': _sha256(file_path), 'bytes': os.path.getsize(file_path)}
+
+    # Identifies the indexed content, independent of when it was built
+    build_id = hashlib.sha256(json.dumps(
+        [FORMAT_VERSION, model_name, store.dtype, sorted(story_hashes.items())]
+    ).encode('utf-8')).hexdigest()[:16]
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'build_id': build_id,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'model': model_name,
+        'dtype': store.dtype,
+        'dimension': int(arrays['matrix'].shape[1]) if arrays['matrix'].ndim == 2 else 0,
+        'sentences': len(arrays['ids']),
+        'story_hashes': story_hashes,
+        'files': files
+    }
+    _write_json(os.path.join(tmp_path, MANIFEST_FILE), manifest)
+
+    old_path = f"{path.rstrip(os.sep)}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return manifest
+
+
+def load_artifact(path: str, verify: bool = True, model_name: Optional[str] = None) -> IndexArtifact:
+    """
+    Open an index artifact, memory-mapping the vectors read-only
+
+    Args:
+        path: Artifact directory written by save_artifact
+        verify: Check the SHA-256 of every file against the manifest
+        model_name: If given, the embedding model the artifact must have been built with
+
+    Raises:
+        ArtifactError: If the artifact is missing, of another format version,
+            built with another model or fails its checksums
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ArtifactError(f"No index artifact at {path}")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"Index artifact format {manifest.get('format_version')} is not supported (expected {FORMAT_VERSION})")
+    if model_name and manifest.get('model') != model_name:
+        raise ArtifactError(f"Index artifact was built with {manifest.get('model')}, not {model_name}")
+    if verify:
+        for name, expected in manifest['files'].items():
+            file_path = os.path.join(path, name)
+            if not os.path.exists(file_path) or _sha256(file_path) != expected['sha256']:
+                raise ArtifactError(f"Checksum mismatch for {file_path}")
+
+    matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+    scales = None
+    if SCALES_FILE in manifest['files']:
+        scales = np.load(os.path.join(path, SCALES_FILE), mmap_mode='r')
+    with open(os.path.join(path, SENTENCES_FILE), 'r', encoding='utf-8') as f:
+        sentences = json.load(f)
+    with open(os.path.join(path, DIRECT_ANSWERS_FILE), 'r', encoding='utf-8') as f:
+        direct_answers = json.load(f)
+    with open(os.path.join(path, LEXICAL_FILE), 'r', encoding='utf-8') as f:
+        lexical_indexes = {story_id: LexicalIndex.from_dict(data) for story_id, data in json.load(f).items()}
+
+    store = NumpyVectorStore.from_arrays(
+        matrix, scales,
+        sentences['ids'], sentences['documents'], sentences['metadatas'], sentences['ranges'],
+        dtype=manifest['dtype']
+    )
+    return IndexArtifact(manifest, store, direct_answers, lexical_indexes)
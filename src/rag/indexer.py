@@ -0,0 +1,238 @@
+from typing import Dict, List, Any, Iterable, Iterator, Tuple, Optional
+from contextlib import contextmanager
+import json
+import os
+import queue
+import threading
+from rag.text_utils import sent_tokenize
+
+try:
+    import fcntl
+except ImportError:
+    # Not on Windows; there the manifest is not locked across processes
+    fcntl = None
+
+# Sentence embedding model used for the index and for queries
+EMBEDDING_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+# Marks the end of the sentence stream on the producer queue
+_END = object()
+
+
+def story_sentences(story_id: str, story_data: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Split a story into the (id, sentence, metadata) triples stored in the index
+
+    The title is prepended so that the first indexed sentence carries it.
+    """
+    story_text = f"عنوان: {story_data.get('title', '')}\n\n{story_data.get('content', '')}"
+    sentences = sent_tokenize(story_text)
+
+    items = []
+    for i, sentence in enumerate(sentences):
+        if not sentence.strip():
+            continue
+        items.append((
+            f"{story_id}_sentence_{i}",
+            sentence,
+            {
+                'story_id': story_id,
+                'title': story_data.get('title', 'Untitled'),
+                'sentence_index': i,
+                'total_sentences': len(sentences)
+            }
+        ))
+    return items
+
+
+# Story fields that answer each metadata question type
+DIRECT_ANSWER_FIELDS = {
+    'title': 'title',
+    'lesson': 'lesson',
+    'characters': 'characters',
+    'moral': 'moral',
+    'summary': 'summary',
+    'theme': 'theme',
+    'difficulty': 'difficulty_level',
+    'age_group': 'age_group',
+    'difficult_words': 'difficult_words'
+}
+
+
+def build_direct_answers(story_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Build the response for every metadata question type of a story"""
+    answers = {}
+    for question_type, field in DIRECT_ANSWER_FIELDS.items():
+        if question_type == 'characters':
+            characters = story_data.get('characters', [])
+            text = '، '.join(char['name'] for char in characters)
+        elif question_type == 'difficult_words':
+            difficult_words = story_data.get('difficult_words', [])
+            text = '\n'.join(f"{word['word']} - {word['meaning']}" for word in difficult_words)
+        else:
+            text = story_data.get(field, '')
+        answers[question_type] = {
+            'success': True,
+            'response': text,
+            'context': text
+        }
+    return answers
+
+
+def _produce(stories: Iterable[Tuple[str, Dict[str, Any]]], out: queue.Queue, errors: List[Exception],
+             stop: threading.Event):
+    def put(item) -> bool:
+        # Give up once the consumer has stopped reading instead of blocking on a full queue forever
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for story_id, story_data in stories:
+            for item in story_sentences(story_id, story_data):
+                if not put(item):
+                    return
+    except Exception as e:
+        errors.append(e)
+    put(_END)
+
+
+def iter_sentence_batches(stories: Iterable[Tuple[str, Dict[str, Any]]], batch_size: int) -> Iterator[List[Tuple[str, str, Dict[str, Any]]]]:
+    """
+    Stream sentences from all stories in batches of ``batch_size``
+
+    Stories are segmented on a background thread so that parsing the next
+    stories overlaps with encoding the current batch.
+    """
+    items: queue.Queue = queue.Queue(maxsize=batch_size * 4)
+    errors: List[Exception] = []
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(stories, items, errors, stop), name="index-segmenter", daemon=True)
+    producer.start()
+
+    try:
+        batch = []
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        # Also when the consumer stops early (an error while encoding or writing)
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+
+
+class IndexManifest:
+    """
+    Content hash of every story in a vector index
+
+    Comparing it with the story store tells which stories have to be
+    re-embedded. With a path it is saved next to the index it describes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.hashes: Dict[str, str] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f)
+        except Exception as e:
+            print(f"Error loading index manifest {self.path}: {e}")
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold a lock shared by every process using this manifest file and
+        re-read the file under it
+
+        Server workers sharing a persistent index all notice the same story
+        change; the first one to get the lock re-embeds the story and the
+        others then find the manifest up to date.
+        """
+        if not self.path or fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def diff(self, current: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """(changed, removed) story ids given the current {story_id: content_hash}"""
+        changed = [story_id for story_id, content_hash in current.items() if self.hashes.get(story_id) != content_hash]
+        removed = [story_id for story_id in self.hashes if story_id not in current]
+        return changed, removed
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Per process, as forked server workers may save at the same time
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp_path, self.path)
+
+
+def reindex_stories(stories: List[Tuple[str, Dict[str, Any], str]], removed: List[str], embedding_model, store,
+                    manifest: IndexManifest, batch_size: int = 64, stories_per_write: int = 64) -> int:
+    """
+    Re-embed changed stories and drop removed ones from the vector store
+
+    Stories are replaced in groups of ``stories_per_write``, so queries keep
+    seeing the previous version of a story until its new sentences are in.
+    The manifest is updated and saved after every group.
+
+    Args:
+        stories: (story_id, story_data, content_hash) of the changed stories
+        removed: Ids of stories to delete from the index
+
+    Returns:
+        Number of indexed sentences
+    """
+    total = 0
+    for start in range(0, len(stories), stories_per_write):
+        group = stories[start:start + stories_per_write]
+        entries = {story_id: ([], [], [], []) for story_id, _, _ in group}
+        for batch in iter_sentence_batches([(story_id, data) for story_id, data, _ in group], batch_size):
+            embeddings = embedding_model.encode([sentence for _, sentence, _ in batch], batch_size=batch_size)
+            for (sentence_id, sentence, metadata), embedding in zip(batch, embeddings):
+                ids, vectors, documents, metadatas = entries[metadata['story_id']]
+                ids.append(sentence_id)
+                vectors.append(embedding)
+                documents.append(sentence)
+                metadatas.append(metadata)
+            total += len(batch)
+
+        store.replace_stories(entries)
+        for story_id, _, content_hash in group:
+            manifest.hashes[story_id] = content_hash
+        manifest.save()
+
+    if removed:
+        store.replace_stories({}, removed=removed)
+        for story_id in removed:
+            manifest.hashes.pop(story_id, None)
+        manifest.save()
+    return total
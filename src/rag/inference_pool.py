@@ -0,0 +1,212 @@
+from typing import Callable, Dict, Any, Optional, Iterator
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+# Model held by each worker process, loaded by _init_worker
+_worker_llm = None
+
+
+def load_gguf_model(model_path: str, model_kwargs: Dict[str, Any]):
+    from ctransformers import AutoModelForCausalLM
+    return AutoModelForCausalLM.from_pretrained(model_path, **model_kwargs)
+
+
+def _init_worker(model_path: str, model_kwargs: Dict[str, Any], model_loader: Callable[[str, Dict[str, Any]], Any]):
+    global _worker_llm
+    _worker_llm = model_loader(model_path, model_kwargs)
+
+
+def _generate(prompt: str, kwargs: Dict[str, Any]) -> str:
+    return _worker_llm(prompt, **kwargs)
+
+
+def _stream(prompt: str, kwargs: Dict[str, Any], tokens) -> None:
+    try:
+        for token in _worker_llm(prompt, stream=True, **kwargs):
+            tokens.put(token)
+    finally:
+        tokens.put(None)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class InferencePoolBusy(Exception):
+    """Raised when the request queue stays full for longer than the queue timeout"""
+
+
+class InferenceTimeout(Exception):
+    """Raised when a generation does not finish within its deadline"""
+
+
+class InferenceWorkerLost(Exception):
+    """Raised when a worker process died during a generation"""
+
+
+class InferencePool:
+    """
+    Worker processes that each hold their own copy of the GGUF model
+
+    At most ``max_pending`` generations are queued or running at a time; callers
+    beyond that wait up to ``queue_timeout`` seconds for a slot and then get
+    InferencePoolBusy. Each generation has a deadline of ``timeout`` seconds.
+
+    A worker cannot be interrupted: a generation that misses its deadline
+    keeps its worker and its slot until it finishes, so timeouts do not free
+    capacity. If a worker process dies, the executor is replaced by a new one
+    and ``ready`` is False until its workers have loaded the model.
+    """
+
+    def __init__(self, model_path: str, num_workers: int = 2, max_pending: int = 8,
+                 timeout: float = 60.0, queue_timeout: float = 5.0, model_kwargs: Optional[Dict[str, Any]] = None,
+                 model_loader: Callable[[str, Dict[str, Any]], Any] = load_gguf_model):
+        """
+        Args:
+            model_loader: Module-level function (model_path, model_kwargs) -> model,
+                run in every worker process; the model is called like a
+                ctransformers model: model(prompt, stream=False, **kwargs)
+        """
+        self.model_loader = model_loader
+        self.model_path = model_path
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+        self._manager = None
+        self._model_kwargs = model_kwargs or {}
+        self._executor_lock = threading.Lock()
+        self._restarting = False
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawn rather than fork: forking a process that already runs torch threads can deadlock
+        return ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.model_path, self._model_kwargs, self.model_loader)
+        )
+
+    @property
+    def ready(self) -> bool:
+        """False while the workers of a replaced executor are still loading the model"""
+        return not self._restarting
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken executor (once, however many callers noticed) and warm up the new one"""
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            print("An inference worker died; starting new workers")
+            self._executor = self._new_executor()
+            self._restarting = True
+        broken.shutdown(wait=False, cancel_futures=True)
+        threading.Thread(target=self._finish_restart, name="inference-pool-restart", daemon=True).start()
+
+    def _finish_restart(self):
+        try:
+            self.warm_up()
+            self._restarting = False
+        except Exception as e:
+            # Stays not ready; the next request that hits the broken executor restarts it again
+            print(f"Error restarting inference workers: {e}")
+
+    @property
+    def pending(self) -> int:
+        """Number of generations queued or running"""
+        return self._pending
+
+    def _release(self, _future):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def warm_up(self):
+        """Start every worker process and wait until each has loaded the model"""
+        futures = [self._executor.submit(_ping) for _ in range(self.num_workers)]
+        for future in futures:
+            future.result()
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise InferencePoolBusy(f"All {self.max_pending} inference slots are in use")
+        with self._pending_lock:
+            self._pending += 1
+
+        try:
+            executor = self._executor
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died since the last generation
+                self._restart(executor)
+                executor = self._executor
+                future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is held until the worker is done, even if the caller gave up
+        future.add_done_callback(self._release)
+        return future, executor
+
+    def _result(self, future, executor: ProcessPoolExecutor, timeout: Optional[float]):
+        try:
+            return future.result(timeout=timeout)
+        except BrokenProcessPool as e:
+            self._restart(executor)
+            raise InferenceWorkerLost(f"An inference worker died during the generation: {e}")
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """Generate a completion for the prompt in a worker process"""
+        future, executor = self._submit(_generate, prompt, kwargs)
+        try:
+            return self._result(future, executor, timeout or self.timeout)
+        except FutureTimeoutError:
+            # Only takes effect if the generation has not started yet
+            future.cancel()
+            raise InferenceTimeout(f"Generation did not finish within {timeout or self.timeout} seconds")
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """Yield the completion piece by piece as the worker generates it"""
+        if self._manager is None:
+            with self._pending_lock:
+                if self._manager is None:
+                    self._manager = self._context.Manager()
+        tokens = self._manager.Queue()
+        future, executor = self._submit(_stream, prompt, kwargs, tokens)
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                future.cancel()
+                raise InferenceTimeout(f"Generation did not finish within {timeout or self.timeout} seconds")
+            try:
+                # Wake up now and then to notice a worker that died without ending the stream
+                token = tokens.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            if token is None:
+                break
+            yield token
+
+        # Re-raise errors from the worker. The stream has ended, so the task is
+        # finishing (or its worker died) and waiting for it cannot block.
+        self._result(future, executor, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
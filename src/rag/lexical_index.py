@@ -0,0 +1,102 @@
+from typing import Dict, List, Any, Tuple
+from collections import Counter
+import math
+import numpy as np
+from rag.text_utils import tokenize_words
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the sentences of one story
+
+    Sentences are tokenized once at build time; a query only walks the posting
+    lists of its own terms.
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.documents = documents
+        self.positions = {sentence_id: i for i, sentence_id in enumerate(ids)}
+        self.k1 = k1
+        self.b = b
+
+        term_counts = [Counter(tokenize_words(document)) for document in documents]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        # BM25 length normalization per document
+        norms = k1 * (1 - b + b * lengths / max(average_length, 1e-12))
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                doc_ids, frequencies = postings.setdefault(term, ([], []))
+                doc_ids.append(doc)
+                frequencies.append(count)
+
+        n = len(documents)
+        # term -> (document numbers, precomputed BM25 term weights)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, (doc_ids, frequencies) in postings.items():
+            doc_ids = np.array(doc_ids, dtype=np.int32)
+            frequencies = np.array(frequencies, dtype=np.float32)
+            idf = math.log(1 + (n - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            weights = idf * frequencies * (k1 + 1) / (frequencies + norms[doc_ids])
+            self.postings[term] = (doc_ids, weights.astype(np.float32))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form of the index, including the posting lists"""
+        terms = sorted(self.postings)
+        return {
+            'ids': self.ids,
+            'documents': self.documents,
+            'k1': self.k1,
+            'b': self.b,
+            'terms': terms,
+            'doc_ids': [self.postings[term][0].tolist() for term in terms],
+            'weights': [self.postings[term][1].tolist() for term in terms]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LexicalIndex':
+        """Restore an index written by to_dict without re-tokenizing the sentences"""
+        index = cls.__new__(cls)
+        index.ids = data['ids']
+        index.documents = data['documents']
+        index.positions = {sentence_id: i for i, sentence_id in enumerate(index.ids)}
+        index.k1 = data['k1']
+        index.b = data['b']
+        index.postings = {
+            term: (np.array(doc_ids, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for term, doc_ids, weights in zip(data['terms'], data['doc_ids'], data['weights'])
+        }
+        return index
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every sentence for the query (0 for sentences sharing no term)"""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize_words(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    @staticmethod
+    def top(scores: np.ndarray, n_results: int) -> List[Tuple[int, float]]:
+        """(sentence number, score) of the best scored sentences that share a term with the query"""
+        order = np.argsort(-scores, kind='stable')[:n_results]
+        return [(int(i), float(scores[i])) for i in order if scores[i] > 0]
+
+    def search(self, query: str, n_results: int) -> List[Tuple[int, float]]:
+        return self.top(self.scores(query), n_results)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuse ranked id lists: each id scores the sum of 1 / (k + rank) over the lists it appears in"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,156 @@
+from typing import Dict, List, Tuple
+from collections import deque
+from rag.text_utils import normalize_question
+
+# (pattern, weight) per question type. Weights say how sure a single match makes
+# us: phrases that name the story are decisive. Bare keywords like 'کردار' or
+# 'نام' are also used in questions about the story's content ("علی کا کردار
+# کیسا تھا؟"), so they stay below the handler's routing threshold (0.8) even
+# with STORY_CUE_BOOST and only decide the type when nothing stronger matches.
+QUESTION_PATTERNS: Dict[str, List[Tuple[str, float]]] = {
+    'title': [
+        ('کہانی کا عنوان', 1.0), ('کہانی کا نام', 1.0),
+        ('کا عنوان', 0.8), ('عنوان', 0.5), ('نام', 0.4), ('کا نام', 0.4)
+    ],
+    'lesson': [
+        ('کہانی کا سبق', 1.0), ('کہانی سے سبق', 1.0), ('کہانی سے کیا سبق', 1.0),
+        ('سبق', 0.5), ('سیکھنا', 0.4), ('سیکھتے', 0.4), ('سیکھا', 0.4)
+    ],
+    'characters': [
+        ('کہانی کے کردار', 1.0), ('کہانی کے کرداروں', 1.0), ('کردار', 0.5), ('کرداروں', 0.5),
+        ('کون کون', 0.6), ('کون ہے', 0.4)
+    ],
+    'moral': [
+        ('کہانی کا پیغام', 1.0), ('کہانی کا مقصد', 1.0), ('کہانی کا نتیجہ', 1.0),
+        ('پیغام', 0.5), ('مقصد', 0.4), ('نتیجہ', 0.4)
+    ],
+    'summary': [
+        ('کہانی کا خلاصہ', 1.0), ('کہانی کا مختصر بیان', 1.0), ('خلاصہ', 0.5)
+    ],
+    'theme': [
+        ('کہانی کا موضوع', 1.0), ('موضوع', 0.5), ('تھیم', 0.5)
+    ],
+    'difficulty': [
+        ('کہانی کی مشکل', 0.9), ('مشکل', 0.4), ('آسان', 0.4)
+    ],
+    'age_group': [
+        ('کہانی کس عمر کے لیے ہے', 1.0), ('عمر', 0.4)
+    ],
+    'difficult_words': [
+        ('مشکل الفاظ', 0.9), ('مشکل لفظ', 0.9), ('لفظوں کا مطلب', 0.9)
+    ]
+}
+
+# Mentioning the story makes a keyword match more likely to be about its metadata
+STORY_CUE = 'کہانی'
+STORY_CUE_BOOST = 0.2
+
+
+class QuestionRouter:
+    """
+    Classify a question into a metadata question type in one pass
+
+    All patterns are compiled into a single Aho-Corasick automaton over
+    normalized question text. Matches must start and end on word boundaries,
+    and a match inside a longer match (e.g. 'مشکل' inside 'مشکل الفاظ') is
+    ignored. The confidence is the weight of the best match for a type, boosted
+    when the question mentions the story and halved when another type matches
+    just as strongly.
+    """
+
+    def __init__(self, patterns: Dict[str, List[Tuple[str, float]]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        # (question type, weight, length) per pattern id
+        self._patterns: List[Tuple[str, float, int]] = []
+        # Earlier types win ties, as in the original if-chain
+        self._type_order: Dict[str, int] = {}
+
+        for question_type, entries in (patterns or QUESTION_PATTERNS).items():
+            for pattern, weight in entries:
+                self._add_pattern(pattern, question_type, weight)
+        self._add(STORY_CUE, ('', 0.0))
+        self._build_failure_links()
+
+    def _add(self, pattern: str, entry: Tuple[str, float]):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(len(self._patterns))
+        self._patterns.append((entry[0], entry[1], len(pattern)))
+
+    def _add_pattern(self, pattern: str, question_type: str, weight: float):
+        self._type_order.setdefault(question_type, len(self._type_order))
+        pattern = normalize_question(pattern)
+        if pattern:
+            self._add(pattern, (question_type, weight))
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                pending.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child].extend(self._output[self._fail[child]])
+
+    def _matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """Find all whole-word (start, end, pattern id) matches"""
+        matches = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern_id in self._output[node]:
+                end = position + 1
+                start = end - self._patterns[pattern_id][2]
+                if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                    matches.append((start, end, pattern_id))
+        return matches
+
+    def classify(self, question: str) -> Tuple[str, float]:
+        """
+        Get the question type and a confidence between 0 and 1
+
+        Returns ('content', 0.0) when no metadata pattern matches.
+        """
+        text = normalize_question(question)
+        matches = self._matches(text)
+
+        has_story_cue = False
+        scores: Dict[str, float] = {}
+        for start, end, pattern_id in matches:
+            question_type, weight, _ = self._patterns[pattern_id]
+            if not question_type:
+                has_story_cue = True
+                continue
+            if any(other_start <= start and end <= other_end and (other_start, other_end) != (start, end)
+                   and self._patterns[other_id][0]
+                   for other_start, other_end, other_id in matches):
+                continue
+            scores[question_type] = max(scores.get(question_type, 0.0), weight)
+
+        if not scores:
+            return 'content', 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._type_order[item[0]]))
+        question_type, confidence = ranked[0]
+        if has_story_cue:
+            confidence = min(1.0, confidence + STORY_CUE_BOOST)
+        if len(ranked) > 1 and ranked[1][1] >= ranked[0][1]:
+            confidence *= 0.5
+        return question_type, confidence
@@ -1,28 +1,233 @@
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Iterator, Tuple
+from functools import cached_property
 import os
 import json
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-from ctransformers import AutoModelForCausalLM
+import atexit
+import queue
+import threading
+import time
 import numpy as np
 import re
-from nltk.tokenize import sent_tokenize
-import nltk
-from sklearn.metrics.pairwise import cosine_similarity
+import metrics
+from story_store import StoryStore, get_story_store
+from rag.indexer import IndexManifest, reindex_stories, story_sentences, build_direct_answers, DIRECT_ANSWER_FIELDS, EMBEDDING_MODEL_NAME
+from rag.index_artifact import load_artifact
+from rag.embedding_cache import EmbeddingCache
+from rag.completion_index import CompletionIndex
+from rag.question_router import QuestionRouter, QUESTION_PATTERNS
+from rag.answer_cache import AnswerCache
+from rag.inference_pool import InferencePool, InferencePoolBusy, InferenceTimeout
+from rag.text_utils import normalize_question, sent_tokenize, tokenize_words
+from rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from rag.vector_store import VectorStore, ChromaVectorStore, NumpyVectorStore
+
+# Where the Chroma collection and its index manifest are persisted
+_CHROMA_PATH = ".chroma"
+
+# Hugging Face tokenizer with the GGUF model's vocabulary, for counting prompt
+# tokens without loading the model when generation runs in worker processes
+_LLM_TOKENIZER_NAME = os.getenv('LLM_TOKENIZER', "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or each row of a matrix so that dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+_STORY_NOT_FOUND = {
+    'success': False,
+    'error': 'Story not found'
+}
+
+_INVALID_QUESTION_TYPE = {
+    'success': False,
+    'error': 'Invalid question type'
+}
+
+_QUESTION_TOO_LONG = {
+    'success': False,
+    'error': 'Question is too long'
+}
+
+_NO_CONTEXT = {
+    'success': False,
+    'error': 'No relevant context found'
+}
+
+_NOT_RELEVANT = {
+    'success': False,
+    'error': 'Generated response was not relevant to the context'
+}
+
+_MODEL_BUSY = {
+    'success': False,
+    'error': 'The model is busy, please try again'
+}
+
+_GENERATION_FAILED = {
+    'success': False,
+    'error': 'Could not generate a valid response due to token limits'
+}
+
+# Marks the end of an in-process token stream
+_END_OF_STREAM = object()
+
+# Stages that run before generation, in order; each may answer the question
+_PREPARE_STAGES = ('direct', 'completion', 'routed', 'cache', 'retrieval')
+
+# Answer tier reported for the stage that produced a successful answer
+_STAGE_TIERS = {
+    'direct': 'direct',
+    'routed': 'direct',
+    'completion': 'completion',
+    'cache': 'cache',
+    'validation': 'rag'
+}
+
+_STAGE_SECONDS = metrics.registry.histogram(
+    'rag_answer_stage_seconds', "Time spent in each stage of RAGHandler.answer_question", ['stage'])
+_OPERATION_SECONDS = metrics.registry.histogram(
+    'rag_operation_seconds', "Time of calls into the embedding model, the vector store and the LLM", ['operation'])
+_ANSWERS = metrics.registry.counter(
+    'rag_answers_total', "Answers by the tier that served them (direct, completion, cache, rag) or failure", ['tier'])
+_EMBED_SECONDS = _OPERATION_SECONDS.labels('embed')
+_VECTOR_QUERY_SECONDS = _OPERATION_SECONDS.labels('vector_query')
+_GENERATE_SECONDS = _OPERATION_SECONDS.labels('generate')
+
+class AnswerRequest:
+    """
+    One question moving through RAGHandler's answer pipeline
+
+    Creating it is the normalize stage. Intermediate values (question
+    embedding, exact-match sentence, router decision) are computed on first
+    use and shared by every later stage; the retrieval and generation stages
+    fill in the context, prompt and response.
+    """
+
+    def __init__(self, handler: "RAGHandler", question: str, story_id: Optional[str] = None):
+        self.handler = handler
+        self.question = question
+        self.story_id = story_id or None
+        self.story_key = StoryStore.normalize_id(story_id) if story_id else None
+        self.normalized_question = normalize_question(question)
+        # Name of the stage that produced the result
+        self.answered_by: Optional[str] = None
+        self.sentences: List[str] = []
+        self.context = ''
+        self.prompt: Optional[str] = None
+        self.response: Optional[str] = None
+
+    @cached_property
+    def embedding(self) -> np.ndarray:
+        return self.handler._encode(self.question)
+
+    @cached_property
+    def exact_match(self) -> Optional[str]:
+        return self.handler._find_exact_match(self.question, self.story_id)
+
+    @cached_property
+    def route(self) -> Tuple[str, float]:
+        return self.handler.question_router.classify(self.question)
+
+    @cached_property
+    def content_hash(self) -> str:
+        return self.handler._content_hash(self.story_id)
+
+    @property
+    def cache_key(self) -> tuple:
+        """(story, normalized question, content hash) used by the answer cache"""
+        return self.story_key or '', self.normalized_question, self.content_hash
 
 class RAGHandler:
-    def __init__(self, data_dir: str = "data", model_path: str = "models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf", chunk_size: int = 200):
+    def __init__(self, data_dir: str = "data", model_path: str = "models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf", chunk_size: int = 200,
+                 embed_batch_size: int = 64, index_stories_per_write: int = 64,
+                 embedding_cache_bytes: int = 64 * 1024 * 1024, embedding_cache_path: Optional[str] = None,
+                 answer_cache_size: int = 1024, answer_cache_ttl: float = 24 * 3600, answer_cache_similarity: float = 0.95,
+                 llm_workers: int = 0, llm_max_pending: int = 8, llm_timeout: float = 60.0,
+                 vector_backend: str = "chroma", vector_dtype: str = "float32", index_path: Optional[str] = None,
+                 chroma_path: str = _CHROMA_PATH):
         self.data_dir = data_dir
         self.model_path = model_path
         self.chunk_size = chunk_size
+        self.embed_batch_size = embed_batch_size
+        self.index_stories_per_write = index_stories_per_write
+        self.story_store = get_story_store(data_dir)
         self._embedding_model = None
         self._chroma_client = None
         self._llm = None
-        self._collection = None
+        self._llm_lock = threading.Lock()
+        self._tokenizer = None
+        # Exact token counts of prompt pieces (story sentences, prompt templates)
+        self.token_count_cache_size = 65536
+        self._token_counts: Dict[str, int] = {}
+        self._token_counts_lock = threading.Lock()
+        # "chroma" (persistent, on disk) or "numpy" (in-process, rebuilt at start-up)
+        if vector_backend not in ('chroma', 'numpy'):
+            raise ValueError(f"Unknown vector backend: {vector_backend}")
+        self.vector_backend = vector_backend
+        # Storage type of the in-process vectors: float32, float16 or int8
+        self.vector_dtype = vector_dtype
+        # Prebuilt index artifact (see build_index.py); implies the numpy backend
+        self.index_path = index_path
+        # Directory of the persistent Chroma collection and its manifest
+        self.chroma_path = chroma_path
+        self._vector_store = None
+        self.index_manifest: Optional[IndexManifest] = None
+        # Background reindexing after story changes
+        self._reindex_lock = threading.Lock()
+        self._reindex_run_lock = threading.Lock()
+        self._reindex_requested = False
+        self._reindex_thread: Optional[threading.Thread] = None
+        self.llm_config = {
+            'model_type': "llama",
+            # TinyLlama's context window; prompts are fitted to it without loading the model
+            'context_length': 2048,
+            'max_new_tokens': 256,
+            'temperature': 0.2
+        }
+        
+        # With llm_workers > 0 generation runs in separate processes instead of request threads
+        self.llm_workers = llm_workers
+        self.llm_max_pending = llm_max_pending
+        self.llm_timeout = llm_timeout
+        self._inference_pool = None
+        # Generations waiting for or running on the in-process model
+        self._llm_in_flight = 0
+        self._llm_in_flight_lock = threading.Lock()
+        
+        # Components are loaded lazily (or by warm_up) exactly once each
+        self._component_locks = {name: threading.Lock() for name in ('embedding_model', 'chroma_client', 'vector_store', 'llm', 'inference_pool', 'tokenizer')}
+        self.load_state = {name: 'not_loaded' for name in self._component_locks}
+        self._warm_up_lock = threading.Lock()
+        self._ready = False
         self.similarity_threshold = 0.5
         self.min_response_length = 10
         self.context_overlap_threshold = 0.2
+        # Constant of the reciprocal rank fusion of vector and BM25 rankings
+        self.rrf_k = 60
+        # Retrieval settings; src/benchmarks/retrieval_sweep.py measures their quality and latency
+        self.hybrid_retrieval = True
+        # Candidates taken from each of the vector and BM25 rankings before fusing them
+        self.hybrid_candidates = 3
+        # Sentences of context handed to the LLM
+        self.context_sentences = 2
+        # Fused sentences need a BM25 score above this, i.e. share a word with the question
+        self.lexical_min_score = 0.0
+        
+        # Shared by every call site that embeds questions, responses or context
+        self.embedding_cache = EmbeddingCache(
+            self._embed,
+            max_bytes=embedding_cache_bytes,
+            persist_path=embedding_cache_path
+        )
+        if embedding_cache_path:
+            atexit.register(self.embedding_cache.save)
+        
+        # Generated answers per (story, normalized question)
+        self.answer_cache = AnswerCache(
+            max_entries=answer_cache_size,
+            ttl_seconds=answer_cache_ttl,
+            similarity_threshold=answer_cache_similarity
+        )
         
         # Exact question patterns for benchmark testing
         self.exact_questions = {
@@ -52,44 +257,381 @@ class RAGHandler:
             ]
         }
         
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+        # Routes paraphrased metadata questions to direct answers
+        self.router_confidence_threshold = 0.8
+        patterns = {question_type: list(entries) for question_type, entries in QUESTION_PATTERNS.items()}
+        for question_type, questions in self.exact_questions.items():
+            patterns.setdefault(question_type, []).extend((question, 1.0) for question in questions)
+        self.question_router = QuestionRouter(patterns)
+        
+        # Per-story structures built when a story is loaded or changes
+        self._completion_indexes: Dict[str, tuple] = {}
+        self._lexical_indexes: Dict[str, tuple] = {}
+        self._direct_answers: Dict[tuple, Dict[str, Any]] = {}
+        self.story_store.add_listener(self._on_corpus_change)
     
+    def _load_component(self, name: str, attribute: str, loader):
+        """Load a component once, even when several threads ask for it at the same time"""
+        component = getattr(self, attribute)
+        if component is not None:
+            return component
+        with self._component_locks[name]:
+            component = getattr(self, attribute)
+            if component is None:
+                self.load_state[name] = 'loading'
+                try:
+                    component = loader()
+                except Exception:
+                    self.load_state[name] = 'failed'
+                    raise
+                setattr(self, attribute, component)
+                self.load_state[name] = 'loaded'
+        return component
+
+    # The heavy libraries (torch, chromadb, ctransformers) are imported by the
+    # loaders below, so importing this module stays fast
+    def _load_embedding_model(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    def _load_chroma_client(self):
+        import chromadb
+        return chromadb.PersistentClient(path=self.chroma_path)
+
+    def _load_llm(self):
+        from ctransformers import AutoModelForCausalLM
+        return AutoModelForCausalLM.from_pretrained(self.model_path, **self.llm_config)
+
+    def _load_tokenizer(self) -> Callable[[str], List[int]]:
+        if self.llm_workers <= 0:
+            # The in-process model is loaded for generating anyway
+            return self.llm.tokenize
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(_LLM_TOKENIZER_NAME)
+        # Counts the BOS token, like the model's own tokenize()
+        return tokenizer.encode
+
     @property
     def embedding_model(self):
-        if self._embedding_model is None:
-            self._embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-        return self._embedding_model
+        return self._load_component('embedding_model', '_embedding_model', self._load_embedding_model)
     
     @property
     def chroma_client(self):
-        if self._chroma_client is None:
-            self._chroma_client = chromadb.PersistentClient(path=".chroma")
-        return self._chroma_client
+        return self._load_component('chroma_client', '_chroma_client', self._load_chroma_client)
     
     @property
     def llm(self):
-        if self._llm is None:
-            self._llm = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                model_type="llama",
-                max_new_tokens=256,
-                temperature=0.2
-            )
-        return self._llm
+        return self._load_component('llm', '_llm', self._load_llm)
+    
+    @property
+    def inference_pool(self) -> Optional[InferencePool]:
+        if self.llm_workers <= 0:
+            return None
+        return self._load_component('inference_pool', '_inference_pool', lambda: InferencePool(
+            self.model_path,
+            num_workers=self.llm_workers,
+            max_pending=self.llm_max_pending,
+            timeout=self.llm_timeout,
+            model_kwargs=self.llm_config
+        ))
     
     @property
-    def collection(self):
-        if self._collection is None:
-            self._collection = self.chroma_client.get_or_create_collection(
+    def generation_queue_depth(self) -> int:
+        """Generations queued or running, in the worker pool or on the in-process model"""
+        if self._inference_pool is not None:
+            return self._inference_pool.pending
+        return self._llm_in_flight
+
+    def _track_in_flight(self, change: int):
+        with self._llm_in_flight_lock:
+            self._llm_in_flight += change
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Encode the texts the embedding cache does not have yet"""
+        with _EMBED_SECONDS.time():
+            return self.embedding_model.encode(texts, batch_size=self.embed_batch_size)
+
+    def _generate_stream(self, prompt: str) -> Iterator[str]:
+        """Like _generate, but yield the generated text piece by piece"""
+        pool = self.inference_pool
+        if pool is not None:
+            yield from pool.stream(prompt)
+            return
+        # A thread generates into the queue, so the model lock is never held
+        # while tokens are written to a (possibly slow) client. The queue holds
+        # every token the model may produce plus the end marker, so the
+        # generating thread never waits for the client.
+        tokens = queue.Queue(maxsize=self.llm_config['max_new_tokens'] + 1)
+        stop = threading.Event()
+        
+        def produce():
+            try:
+                with self._llm_lock:
+                    for token in self.llm(prompt, stream=True):
+                        # The client went away; free the model for other requests
+                        if stop.is_set():
+                            break
+                        tokens.put(token)
+            except Exception as e:
+                tokens.put(e)
+                return
+            finally:
+                self._track_in_flight(-1)
+            tokens.put(_END_OF_STREAM)
+        
+        self._track_in_flight(1)
+        threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+        try:
+            while True:
+                token = tokens.get()
+                if token is _END_OF_STREAM:
+                    return
+                if isinstance(token, Exception):
+                    raise token
+                yield token
+        finally:
+            stop.set()
+    
+    def _generate(self, prompt: str, **kwargs) -> str:
+        """Run the LLM in the worker pool, or in-process one request at a time"""
+        with _GENERATE_SECONDS.time():
+            pool = self.inference_pool
+            if pool is not None:
+                return pool.generate(prompt, **kwargs)
+            self._track_in_flight(1)
+            try:
+                with self._llm_lock:
+                    return self.llm(prompt, **kwargs)
+            finally:
+                self._track_in_flight(-1)
+    
+    def _open_artifact(self) -> VectorStore:
+        """Memory-map the prebuilt index and adopt its tables for stories that have not changed since"""
+        artifact = load_artifact(self.index_path, model_name=EMBEDDING_MODEL_NAME)
+        print(f"Loaded index artifact {artifact.manifest['build_id']} with {artifact.store.count()} sentences")
+        self.index_manifest = IndexManifest()
+        self.index_manifest.hashes = dict(artifact.story_hashes)
+        for story_id, content_hash in artifact.story_hashes.items():
+            if self.story_store.content_hash(story_id) != content_hash:
+                continue
+            if story_id in artifact.lexical_indexes:
+                self._lexical_indexes[story_id] = (content_hash, artifact.lexical_indexes[story_id])
+            for question_type, answer in artifact.direct_answers.get(story_id, {}).items():
+                self._direct_answers[(story_id, question_type)] = answer
+        return artifact.store
+
+    def _open_vector_store(self) -> VectorStore:
+        if self.index_path:
+            store = self._open_artifact()
+        elif self.vector_backend == 'numpy':
+            store = NumpyVectorStore(dtype=self.vector_dtype)
+            self.index_manifest = IndexManifest()
+        else:
+            store = ChromaVectorStore(self.chroma_client.get_or_create_collection(
                 name="urdu_stories",
                 metadata={"hnsw:space": "cosine"}
-            )
-            if self._collection.count() == 0:
-                self._load_and_index_stories()
-        return self._collection
+            ))
+            self.index_manifest = IndexManifest(os.path.join(self.chroma_path, "urdu_stories_manifest.json"))
+        if store.count() == 0:
+            # A manifest that outlived its collection (deleted or recreated) would make reindex skip every story
+            if self.index_manifest.hashes:
+                print("Vector index is empty; discarding its manifest")
+                self.index_manifest.hashes = {}
+                self.index_manifest.save()
+            # Nothing to serve yet, so index before the first query
+            self.reindex(store)
+        # Otherwise catch up with edits made while the server was down, serving the old index meanwhile
+        self._schedule_reindex()
+        return store
+    
+    @property
+    def vector_store(self) -> VectorStore:
+        return self._load_component('vector_store', '_vector_store', self._open_vector_store)
+
+    @property
+    def ready(self) -> bool:
+        # Not while the worker pool replaces a worker that died
+        return self._ready and (self._inference_pool is None or self._inference_pool.ready)
+
+    def warm_up(self, before_fork: bool = False):
+        """
+        Load every component once and run a dummy encode and generation,
+        so that the first request does not pay for model loading or indexing
+
+        Args:
+            before_fork: Warm up a server master that forks its workers next
+                (see gunicorn.conf.py). The worker pool is left for the
+                workers to start, since its processes belong to the process
+                that starts them, and the background reindex is finished here
+                because threads do not survive the fork.
+        """
+        with self._warm_up_lock:
+            if self._ready:
+                return
+            print("Warming up RAG handler...")
+            self.story_store.refresh(force=True)
+            self.embedding_model.encode(["سلام"])
+            self.vector_store
+            # Finish catching up with the story files before declaring ready
+            self.reindex()
+            self.build_story_indexes()
+            # Loads the tokenizer used for fitting prompts
+            self._tokenize("سلام")
+            if before_fork:
+                self._wait_for_reindex()
+                if self.llm_workers > 0:
+                    # Not ready: every forked worker warms up its own pool
+                    print("RAG handler loaded; the workers start their inference pools")
+                    return
+            pool = self.inference_pool
+            if pool is not None:
+                pool.warm_up()
+            self._generate(self._build_prompt("سلام", "سلام"), max_new_tokens=1)
+            self._ready = True
+            print("RAG handler ready")
+
+    def after_fork(self):
+        """
+        Reset per-process state in a server worker forked from a process that
+        already loaded the models (see gunicorn.conf.py)
+
+        The embedding model, the LLM and an in-process or memory-mapped vector
+        index are kept and shared copy-on-write. Threads do not survive the
+        fork, and the worker pool and Chroma's SQLite connection belong to
+        the parent, so those are recreated by the worker's own warm-up;
+        ``ready`` stays False until then.
+        """
+        self._reindex_lock = threading.Lock()
+        self._reindex_run_lock = threading.Lock()
+        self._reindex_thread = None
+        self._llm_in_flight = 0
+        self._llm_in_flight_lock = threading.Lock()
+        if self._inference_pool is not None:
+            # The parent's pool (not started by warm_up(before_fork=True)) is the parent's to shut down
+            self._inference_pool = None
+            self.load_state['inference_pool'] = 'not_loaded'
+            self._ready = False
+        if self._chroma_client is not None:
+            self._chroma_client = None
+            self.load_state['chroma_client'] = 'not_loaded'
+            if isinstance(self._vector_store, ChromaVectorStore):
+                self._vector_store = None
+                self.load_state['vector_store'] = 'not_loaded'
+                self._ready = False
+        if self._reindex_requested:
+            self._schedule_reindex()
+
+    def _schedule_reindex(self):
+        """Bring the vector index up to date with the story store on a background thread"""
+        with self._reindex_lock:
+            self._reindex_requested = True
+            if self._reindex_thread is not None:
+                return
+            self._reindex_thread = threading.Thread(target=self._run_reindex, name="rag-reindex", daemon=True)
+            self._reindex_thread.start()
+
+    def _wait_for_reindex(self):
+        thread = self._reindex_thread
+        if thread is not None:
+            thread.join()
+
+    def _run_reindex(self):
+        while True:
+            with self._reindex_lock:
+                if not self._reindex_requested:
+                    self._reindex_thread = None
+                    return
+                self._reindex_requested = False
+            try:
+                self.reindex()
+                # Rebuild the lookup structures dropped by _on_corpus_change before a request needs them
+                self.build_story_indexes()
+            except Exception as e:
+                print(f"Error reindexing stories: {e}")
+
+    def reindex(self, store: Optional[VectorStore] = None) -> tuple:
+        """
+        Re-embed the stories whose content hash differs from the index manifest
+        and drop deleted stories; returns (changed, removed) story counts
+        """
+        # Outside the lock: opening an empty store reindexes it first
+        store = store if store is not None else self.vector_store
+        with self._reindex_run_lock:
+            # With the Chroma index this also serializes the gunicorn workers sharing it
+            with self.index_manifest.locked():
+                records = [record for record in self.story_store.records() if '/' not in record.story_id]
+                changed, removed = self.index_manifest.diff({record.story_id: record.content_hash for record in records})
+                if not changed and not removed:
+                    return 0, 0
+                
+                print(f"Reindexing {len(changed)} changed and {len(removed)} removed stories...")
+                changed_ids = set(changed)
+                reindex_stories(
+                    [(record.story_id, record.data, record.content_hash) for record in records if record.story_id in changed_ids],
+                    removed,
+                    self.embedding_model,
+                    store,
+                    self.index_manifest,
+                    batch_size=self.embed_batch_size,
+                    stories_per_write=self.index_stories_per_write
+                )
+                return len(changed), len(removed)
+
+    def _on_corpus_change(self, changed: List[str], removed: List[str]):
+        """
+        Drop the per-story lookup structures of changed and removed stories
+
+        Runs inside StoryStore.refresh(), so nothing is built here: indexes are
+        rebuilt on first use of the story or by warm_up().
+        """
+        for story_id in changed + removed:
+            self.answer_cache.invalidate_story(story_id)
+            self._completion_indexes.pop(story_id, None)
+            self._lexical_indexes.pop(story_id, None)
+            for question_type in DIRECT_ANSWER_FIELDS:
+                self._direct_answers.pop((story_id, question_type), None)
+        if self._vector_store is not None:
+            self._schedule_reindex()
+
+    def build_story_indexes(self):
+        """Build the per-story lookup structures of every story that does not have them yet"""
+        for record in self.story_store.records():
+            entry = self._completion_indexes.get(record.story_id)
+            if entry is None or entry[0] != record.content_hash:
+                self._build_story_indexes(record)
+
+    def _build_story_indexes(self, record):
+        sentences = sent_tokenize(record.data.get('content', ''))
+        self._completion_indexes[record.story_id] = (record.content_hash, CompletionIndex(sentences))
+        # Same sentences and ids as the vector index, so the two rankings can be fused
+        indexed = story_sentences(record.story_id, record.data)
+        self._lexical_indexes[record.story_id] = (
+            record.content_hash,
+            LexicalIndex([sentence_id for sentence_id, _, _ in indexed], [sentence for _, sentence, _ in indexed])
+        )
+        for question_type, answer in build_direct_answers(record.data).items():
+            self._direct_answers[(record.story_id, question_type)] = answer
+
+    def _get_story_index(self, indexes: Dict[str, tuple], story_id: str):
+        """Get a per-story index, rebuilding it if the story changed since it was built"""
+        record = self.story_store.get_record(story_id)
+        if record is None:
+            return None
+        entry = indexes.get(record.story_id)
+        if entry is None or entry[0] != record.content_hash:
+            self._build_story_indexes(record)
+            entry = indexes[record.story_id]
+        return entry[1]
+
+    def _get_completion_index(self, story_id: str) -> Optional[CompletionIndex]:
+        return self._get_story_index(self._completion_indexes, story_id)
+
+    def _get_lexical_index(self, story_id: str) -> Optional[LexicalIndex]:
+        return self._get_story_index(self._lexical_indexes, story_id)
+
+    def _encode(self, text: str) -> np.ndarray:
+        """Embed a text through the shared embedding cache"""
+        return self.embedding_cache.encode(text)
 
     def _chunk_text(self, text: str) -> List[str]:
         """Improved chunking that preserves sentence boundaries and important phrases"""
@@ -108,53 +650,13 @@ class RAGHandler:
             
         return chunks
 
-    def _load_and_index_stories(self):
-        stories = []
-        embeddings = []
-        metadata = []
-        ids = []
-        
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(self.data_dir, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    story_data = json.load(f)
-                    
-                # Split story into sentences
-                story_text = f"عنوان: {story_data.get('title', '')}\n\n{story_data.get('content', '')}"
-                sentences = sent_tokenize(story_text)
-                
-                # Index each sentence separately
-                for i, sentence in enumerate(sentences):
-                    if not sentence.strip():
-                        continue
-                        
-                    embedding = self.embedding_model.encode(sentence)
-                    stories.append(sentence)
-                    embeddings.append(embedding.tolist())
-                    metadata.append({
-                        'story_id': filename[:-5],
-                        'title': story_data.get('title', 'Untitled'),
-                        'sentence_index': i,
-                        'total_sentences': len(sentences)
-                    })
-                    ids.append(f"{filename[:-5]}_sentence_{i}")
-        
-        if stories:
-            self.collection.add(
-                embeddings=embeddings,
-                documents=stories,
-                metadatas=metadata,
-                ids=ids
-            )
-
     def _validate_response(self, response: str, context: str) -> bool:
         if len(response) < self.min_response_length:
             return False
             
         # Check for word overlap between response and context
-        response_words = set(response.lower().split())
-        context_words = set(context.lower().split())
+        response_words = set(tokenize_words(response))
+        context_words = set(tokenize_words(context))
         word_overlap = len(response_words.intersection(context_words))
         
         # If good word overlap, consider it valid
@@ -162,9 +664,8 @@ class RAGHandler:
             return True
             
         # Otherwise check semantic similarity
-        response_embedding = self.embedding_model.encode(response)
-        context_embedding = self.embedding_model.encode(context)
-        similarity = cosine_similarity([response_embedding], [context_embedding])[0][0]
+        response_embedding, context_embedding = self.embedding_cache.encode_many([response, context])
+        similarity = float(_normalize_rows(response_embedding) @ _normalize_rows(context_embedding))
         
         return similarity >= self.similarity_threshold
 
@@ -176,9 +677,8 @@ class RAGHandler:
         return response
 
     def _is_context_relevant(self, question: str, context: str) -> bool:
-        question_embedding = self.embedding_model.encode(question)
-        context_embedding = self.embedding_model.encode(context)
-        similarity = cosine_similarity([question_embedding], [context_embedding])[0][0]
+        question_embedding, context_embedding = self.embedding_cache.encode_many([question, context])
+        similarity = float(_normalize_rows(question_embedding) @ _normalize_rows(context_embedding))
         return similarity > self.similarity_threshold
 
     def _find_exact_match(self, partial_text: str, story_id: Optional[str] = None) -> Optional[str]:
@@ -186,249 +686,91 @@ class RAGHandler:
         if not story_id:
             return None
             
-        # First try to find the exact sentence in the story file
-        story_file = os.path.join(self.data_dir, f"{story_id}.json")
-        if os.path.exists(story_file):
-            with open(story_file, 'r', encoding='utf-8') as f:
-                story_data = json.load(f)
-                story_text = story_data.get('content', '')
-                
-                # Split into sentences
-                sentences = sent_tokenize(story_text)
-                
-                # Look for the sentence containing the exact partial text
-                for sentence in sentences:
-                    # Check if the sentence starts with the partial text
-                    if sentence.startswith(partial_text):
-                        return sentence
-                    # Check if the partial text is in the middle of the sentence
-                    if partial_text in sentence:
-                        # Get the part of the sentence that starts with the partial text
-                        start_idx = sentence.find(partial_text)
-                        if start_idx >= 0:
-                            return sentence[start_idx:]
-        
-        # If not found in story file, try the vector database
-        results = self.collection.query(
-            query_embeddings=[self.embedding_model.encode(partial_text).tolist()],
-            n_results=3,
-            where={"story_id": story_id}
-        )
-        
-        if not results['documents']:
+        index = self._get_completion_index(story_id)
+        if index is None:
             return None
-            
-        # Look for exact matches or continuations
-        partial_text = partial_text.strip()
-        for doc in results['documents'][0]:
-            # Split into sentences for more precise matching
-            sentences = sent_tokenize(doc)
-            for sentence in sentences:
-                # Check if the sentence starts with the partial text
-                if sentence.startswith(partial_text):
-                    return sentence
-                # Check if the partial text is in the middle of the sentence
-                if partial_text in sentence:
-                    # Get the part of the sentence that starts with the partial text
-                    start_idx = sentence.find(partial_text)
-                    if start_idx >= 0:
-                        return sentence[start_idx:]
-                        
-        return None
+        
+        # Look for the sentence containing the exact partial text, from where it starts
+        match = index.complete(partial_text)
+        if match is None and partial_text.strip() != partial_text:
+            match = index.complete(partial_text.strip())
+        return match
 
     def _get_relevant_context(self, question: str, story_id: Optional[str] = None) -> str:
+        return " ".join(self._get_relevant_sentences(question, story_id))
+
+    def _get_relevant_sentences(self, question: str, story_id: Optional[str] = None) -> List[str]:
+        return self._retrieve(AnswerRequest(self, question, story_id))
+
+    def _retrieve(self, request: AnswerRequest) -> List[str]:
+        """Sentences of the story (or corpus) most relevant to the request's question"""
+        question = request.question
         # First try exact matching for sentence completion
-        if story_id:
-            exact_match = self._find_exact_match(question, story_id)
-            if exact_match:
-                return exact_match
+        if request.exact_match:
+            return [request.exact_match]
         
-        question_embedding = self.embedding_model.encode(question)
+        question_embedding = request.embedding
         
-        # Extract key words from question
-        question_words = set(question.lower().split())
-        
-        # Try with exact word matching
-        if story_id:
-            results = self.collection.query(
-                query_embeddings=[question_embedding.tolist()],
-                n_results=3,  # Reduced from 10 to 3
-                where={"story_id": story_id}
-            )
-            
-            if results['documents']:
-                # Score each document based on word overlap and semantic similarity
-                scored_docs = []
-                for doc in results['documents'][0]:
-                    # Split into sentences for more precise matching
-                    sentences = sent_tokenize(doc)
-                    for sentence in sentences:
-                        sentence_words = set(sentence.lower().split())
-                        word_overlap = len(question_words.intersection(sentence_words))
-                        semantic_sim = cosine_similarity(
-                            [self.embedding_model.encode(sentence)], 
-                            [question_embedding]
-                        )[0][0]
-                        
-                        # Combined score (weighted)
-                        score = (word_overlap * 0.7) + (semantic_sim * 0.3)
-                        scored_docs.append((sentence, score))
+        # Hybrid search: fuse the vector ranking with the story's BM25 ranking
+        story_key = request.story_key
+        lexical_index = self._get_lexical_index(story_key) if story_key and self.hybrid_retrieval else None
+        if lexical_index is not None:
+            lexical_scores = lexical_index.scores(question)
+            lexical_ranking = [lexical_index.ids[i] for i, _ in lexical_index.top(lexical_scores, self.hybrid_candidates)]
+            if lexical_ranking:
+                with _VECTOR_QUERY_SECONDS.time():
+                    results = self.vector_store.query(question_embedding, n_results=self.hybrid_candidates, story_id=story_key)
+                fused = reciprocal_rank_fusion([results['ids'], lexical_ranking], k=self.rrf_k)
                 
-                # Sort by score and take top 2
-                scored_docs.sort(key=lambda x: x[1], reverse=True)
-                best_matches = [doc for doc, score in scored_docs[:2] if score > 0.3]
+                # Take the top sentences that share at least one word with the question
+                best_matches = []
+                for sentence_id in sorted(fused, key=fused.get, reverse=True):
+                    position = lexical_index.positions.get(sentence_id)
+                    if position is not None and lexical_scores[position] > self.lexical_min_score:
+                        best_matches.append(lexical_index.documents[position])
+                        if len(best_matches) == self.context_sentences:
+                            break
                 
                 if best_matches:
-                    return " ".join(best_matches)
+                    return best_matches
         
         # If no good matches found, fall back to semantic search
-        results = self.collection.query(
-            query_embeddings=[question_embedding.tolist()],
-            n_results=2,  # Reduced from 3 to 2
-            where={"story_id": story_id} if story_id else None
-        )
+        with _VECTOR_QUERY_SECONDS.time():
+            results = self.vector_store.query(question_embedding, n_results=self.context_sentences, story_id=story_key)
         
         if not results['documents']:
-            return ""
+            return []
             
         # Combine relevant sentences with overlap handling
-        combined_context = []
-        seen_content = set()
+        documents = results['documents']
+        embeddings = _normalize_rows(np.asarray(results['embeddings'], dtype=np.float32))
+        pairwise_sims = embeddings @ embeddings.T
         
-        for doc in results['documents'][0]:
-            # Split into sentences for more precise matching
-            sentences = sent_tokenize(doc)
-            for sentence in sentences:
-                # Check for overlap with existing content
-                sentence_embedding = self.embedding_model.encode(sentence)
-                is_duplicate = False
-                
-                for existing in combined_context:
-                    existing_embedding = self.embedding_model.encode(existing)
-                    if cosine_similarity([sentence_embedding], [existing_embedding])[0][0] > self.context_overlap_threshold:
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    combined_context.append(sentence)
+        kept = []
+        for i in range(len(documents)):
+            # Check for overlap with existing content
+            if kept and pairwise_sims[i, kept].max() > self.context_overlap_threshold:
+                continue
+            kept.append(i)
         
-        return " ".join(combined_context)
+        return [documents[i] for i in kept]
 
     def _detect_question_type(self, question: str) -> str:
-        question = question.lower()
-        
-        # Title related questions
-        if any(pattern in question for pattern in ['عنوان', 'نام', 'کا نام', 'کا عنوان', 'کہانی کا عنوان', 'کہانی کا نام']):
-            return 'title'
-            
-        # Lesson related questions
-        if any(pattern in question for pattern in ['سبق', 'سیکھنا', 'سیکھتے', 'سیکھا', 'کہانی کا سبق', 'کہانی سے سبق']):
-            return 'lesson'
-            
-        # Character related questions
-        if any(pattern in question for pattern in ['کردار', 'کرداروں', 'کون کون', 'کون ہے', 'کہانی کے کردار']):
-            return 'characters'
-            
-        # Moral related questions
-        if any(pattern in question for pattern in ['سبق', 'پیغام', 'مقصد', 'نتیجہ', 'کہانی کا پیغام']):
-            return 'moral'
-            
-        # Summary related questions
-        if any(pattern in question for pattern in ['خلاصہ', 'کہانی کا خلاصہ', 'کہانی کا مختصر بیان']):
-            return 'summary'
-            
-        # Theme related questions
-        if any(pattern in question for pattern in ['تھیم', 'موضوع', 'کہانی کا موضوع']):
-            return 'theme'
-            
-        # Difficulty level questions
-        if any(pattern in question for pattern in ['مشکل', 'آسان', 'کہانی کی مشکل']):
-            return 'difficulty'
-            
-        # Age group questions
-        if any(pattern in question for pattern in ['عمر', 'کہانی کس عمر کے لیے ہے']):
-            return 'age_group'
-            
-        # Difficult words questions
-        if any(pattern in question for pattern in ['مشکل الفاظ', 'مشکل لفظ', 'لفظوں کا مطلب']):
-            return 'difficult_words'
-            
-        return 'content'
+        return self.question_router.classify(question)[0]
 
     def _get_direct_answer(self, question_type: str, story_id: str) -> Dict[str, Any]:
-        story_file = os.path.join(self.data_dir, f"{story_id}.json")
-        if not os.path.exists(story_file):
-            return {
-                'success': False,
-                'error': 'Story not found'
-            }
-            
-        with open(story_file, 'r', encoding='utf-8') as f:
-            story_data = json.load(f)
-            
-        if question_type == 'title':
-            return {
-                'success': True,
-                'response': story_data.get('title', ''),
-                'context': story_data.get('title', '')
-            }
-        elif question_type == 'lesson':
-            return {
-                'success': True,
-                'response': story_data.get('lesson', ''),
-                'context': story_data.get('lesson', '')
-            }
-        elif question_type == 'characters':
-            characters = story_data.get('characters', [])
-            character_names = [char['name'] for char in characters]
-            return {
-                'success': True,
-                'response': '، '.join(character_names),
-                'context': '، '.join(character_names)
-            }
-        elif question_type == 'moral':
-            return {
-                'success': True,
-                'response': story_data.get('moral', ''),
-                'context': story_data.get('moral', '')
-            }
-        elif question_type == 'summary':
-            return {
-                'success': True,
-                'response': story_data.get('summary', ''),
-                'context': story_data.get('summary', '')
-            }
-        elif question_type == 'theme':
-            return {
-                'success': True,
-                'response': story_data.get('theme', ''),
-                'context': story_data.get('theme', '')
-            }
-        elif question_type == 'difficulty':
-            return {
-                'success': True,
-                'response': story_data.get('difficulty_level', ''),
-                'context': story_data.get('difficulty_level', '')
-            }
-        elif question_type == 'age_group':
-            return {
-                'success': True,
-                'response': story_data.get('age_group', ''),
-                'context': story_data.get('age_group', '')
-            }
-        elif question_type == 'difficult_words':
-            difficult_words = story_data.get('difficult_words', [])
-            words_with_meanings = [f"{word['word']} - {word['meaning']}" for word in difficult_words]
-            return {
-                'success': True,
-                'response': '\n'.join(words_with_meanings),
-                'context': '\n'.join(words_with_meanings)
-            }
-            
-        return {
-            'success': False,
-            'error': 'Invalid question type'
-        }
+        """Serve a pre-built answer from the story metadata; the returned dict is shared and must not be modified"""
+        answer = self._direct_answers.get((StoryStore.normalize_id(story_id), question_type))
+        if answer is not None:
+            return answer
+        
+        # Not built yet (or the story was just added)
+        record = self.story_store.get_record(story_id)
+        if record is None:
+            return _STORY_NOT_FOUND
+        if (record.story_id, question_type) not in self._direct_answers:
+            self._build_story_indexes(record)
+        return self._direct_answers.get((record.story_id, question_type), _INVALID_QUESTION_TYPE)
 
     def _is_exact_question(self, question: str) -> tuple[bool, str]:
         """Check if the question matches any exact pattern"""
@@ -438,118 +780,273 @@ class RAGHandler:
                 return True, qtype
         return False, ''
 
+    @property
+    def context_length(self) -> int:
+        """Tokens the LLM attends to: the prompt plus the generated tokens"""
+        return self.llm_config['context_length']
+
+    def _tokenize(self, text: str) -> List[int]:
+        """Token ids under the LLM's tokenizer (the model's own one when it runs in-process)"""
+        return self._load_component('tokenizer', '_tokenizer', self._load_tokenizer)(text)
+
+    def _count_tokens_many(self, texts: List[str]) -> List[int]:
+        """
+        Exact token counts under the LLM's own tokenizer
+
+        Counts are cached per text, so story sentences and the prompt template
+        are tokenized once.
+        """
+        with self._token_counts_lock:
+            counts = {text: self._token_counts.get(text) for text in texts}
+        missing = [text for text, count in counts.items() if count is None]
+        if missing:
+            for text in missing:
+                counts[text] = len(self._tokenize(text))
+            with self._token_counts_lock:
+                if len(self._token_counts) + len(missing) > self.token_count_cache_size:
+                    self._token_counts.clear()
+                self._token_counts.update((text, counts[text]) for text in missing)
+        return [counts[text] for text in texts]
+
     def _count_tokens(self, text: str) -> int:
-        # Rough estimation of tokens (words + punctuation)
-        return len(text.split()) + len([c for c in text if c in '.,!?;:'])
-        
-    def _truncate_context(self, context: str, max_tokens: int = 200) -> str:
-        """Truncate context to fit within token limit"""
-        words = context.split()
-        if len(words) <= max_tokens:
-            return context
-            
-        # Take first max_tokens words
-        truncated = ' '.join(words[:max_tokens])
-        return truncated
+        return self._count_tokens_many([text])[0]
 
-    def answer_question(self, question: str, story_id: Optional[str] = None) -> Dict[str, Any]:
-        # First check for exact question match
-        is_exact, question_type = self._is_exact_question(question)
-        
-        if is_exact and story_id:
-            direct_answer = self._get_direct_answer(question_type, story_id)
-            if direct_answer['success']:
-                return direct_answer
-        
-        # Check for sentence completion first
-        if story_id:
-            exact_match = self._find_exact_match(question, story_id)
-            if exact_match:
-                return {
-                    'success': True,
-                    'response': exact_match,
-                    'context': exact_match
-                }
-        
-        # Get relevant context
-        context = self._get_relevant_context(question, story_id)
-        
-        if not context:
-            return {
-                'success': False,
-                'error': 'No relevant context found'
-            }
-        
-        # If we found an exact match, return it directly
-        if story_id and self._find_exact_match(question, story_id):
-            return {
-                'success': True,
-                'response': context,
-                'context': context
-            }
-        
-        # Truncate context to be very conservative with tokens
-        context = self._truncate_context(context, max_tokens=100)
-        
-        # Create a minimal prompt
-        prompt = f"""<|system|>Answer based ONLY on this context. If unsure, say: "کہانی میں ذکر نہیں۔"
+    def _truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of whole words that is at most max_tokens tokens"""
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if len(self._tokenize(' '.join(words[:middle]))) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return ' '.join(words[:low])
+
+    def _build_prompt(self, question: str, context: str) -> str:
+        return f"""<|system|>Answer based ONLY on this context. If unsure, say: "کہانی میں ذکر نہیں۔"
 <|user|>{question}
 <|context|>{context}
 <|assistant|>"""
+
+    def _fit_prompt(self, question: str, sentences: List[str]) -> tuple:
+        """
+        Build the prompt from as many context sentences (in order) as fit into
+        the model's context window next to max_new_tokens generated tokens
+
+        Returns:
+            (context, prompt); prompt is None if not even the question fits
+        """
+        budget = self.context_length - self.llm_config['max_new_tokens']
+        template_tokens, *sentence_tokens = self._count_tokens_many([self._build_prompt(question, '')] + sentences)
+        if template_tokens > budget:
+            return '', None
+        
+        kept, used = [], template_tokens
+        for sentence, tokens in zip(sentences, sentence_tokens):
+            if used + tokens > budget:
+                break
+            kept.append(sentence)
+            used += tokens
+        if not kept and sentences:
+            # Not even the first sentence fits, so keep as many of its words as do
+            kept = [self._truncate_to_tokens(sentences[0], budget - template_tokens)]
         
+        # Tokens can merge where the pieces are joined, so check the whole prompt once
+        context = " ".join(kept)
+        prompt = self._build_prompt(question, context)
+        while context and len(self._tokenize(prompt)) > budget:
+            if len(kept) > 1:
+                kept.pop()
+                context = " ".join(kept)
+            else:
+                words = context.split()
+                context = ' '.join(words[:-max(1, len(words) // 10)])
+                kept = [context]
+            prompt = self._build_prompt(question, context)
+        return context, prompt
+
+    def _direct_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Answer questions that match a known metadata question word for word"""
+        if not request.story_id:
+            return None
+        is_exact, question_type = self._is_exact_question(request.question)
+        if is_exact:
+            direct_answer = self._get_direct_answer(question_type, request.story_id)
+            if direct_answer['success']:
+                return direct_answer
+        return None
+
+    def _completion_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Complete a partial sentence from the story"""
+        if not request.exact_match:
+            return None
+        return {
+            'success': True,
+            'response': request.exact_match,
+            'context': request.exact_match
+        }
+
+    def _routed_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Route paraphrased metadata questions to direct answers"""
+        if not request.story_id:
+            return None
+        question_type, confidence = request.route
+        if question_type != 'content' and confidence >= self.router_confidence_threshold:
+            direct_answer = self._get_direct_answer(question_type, request.story_id)
+            if direct_answer['success']:
+                return direct_answer
+        return None
+
+    def _cache_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Serve answers generated earlier for the same or a near-identical question"""
+        return self.answer_cache.get(*request.cache_key, request.embedding)
+
+    def _retrieval_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Retrieve the context and build a prompt that fits the model"""
+        request.sentences = self._retrieve(request)
+        if not request.sentences:
+            return _NO_CONTEXT
+        request.context, request.prompt = self._fit_prompt(request.question, request.sentences)
+        if request.prompt is None:
+            return _QUESTION_TOO_LONG
+        return None
+
+    def _generation_error(self, error: Exception) -> Dict[str, Any]:
+        print(f"Error generating response: {error}")
+        if isinstance(error, (InferencePoolBusy, InferenceTimeout)):
+            return _MODEL_BUSY
+        return _GENERATION_FAILED
+
+    def _generation_stage(self, request: AnswerRequest) -> Optional[Dict[str, Any]]:
         try:
-            # Check total tokens before generation
-            total_tokens = self._count_tokens(prompt)
-            if total_tokens > 400:  # Leave room for response
-                # Try with even shorter context
-                context = self._truncate_context(context, max_tokens=50)
-                prompt = f"""<|system|>Answer based ONLY on this context. If unsure, say: "کہانی میں ذکر نہیں۔"
-<|user|>{question}
-<|context|>{context}
-<|assistant|>"""
-            
-            answer = self.llm(prompt)
-            formatted_answer = self._format_response(answer)
-            
-            # Validate response
-            if not self._validate_response(formatted_answer, context):
-                return {
-                    'success': False,
-                    'error': 'Generated response was not relevant to the context'
-                }
-            
-            return {
-                'success': True,
-                'response': formatted_answer,
-                'context': context
-            }
-            
+            request.response = self._format_response(self._generate(request.prompt))
         except Exception as e:
-            if "Number of tokens exceeded" in str(e):
-                # Last resort: try with minimal context
-                context = self._truncate_context(context, max_tokens=25)
-                prompt = f"""<|system|>Answer based ONLY on this context. If unsure, say: "کہانی میں ذکر نہیں۔"
-<|user|>{question}
-<|context|>{context}
-<|assistant|>"""
-                
-                try:
-                    answer = self.llm(prompt)
-                    formatted_answer = self._format_response(answer)
-                    
-                    if self._validate_response(formatted_answer, context):
-                        return {
-                            'success': True,
-                            'response': formatted_answer,
-                            'context': context
-                        }
-                except:
-                    pass
-            
-            return {
-                'success': False,
-                'error': 'Could not generate a valid response due to token limits'
-            }
+            return self._generation_error(e)
+        return None
+
+    def _validation_stage(self, request: AnswerRequest) -> Dict[str, Any]:
+        """Check the generated response against the context and cache it if it is valid"""
+        if not self._validate_response(request.response, request.context):
+            return _NOT_RELEVANT
+        result = {
+            'success': True,
+            'response': request.response,
+            'context': request.context
+        }
+        self.answer_cache.put(*request.cache_key, result, request.embedding)
+        return result
+
+    def _run_stages(self, request: AnswerRequest, stages: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Run pipeline stages in order until one of them produces the result"""
+        for name in stages:
+            start = time.perf_counter()
+            result = getattr(self, f"_{name}_stage")(request)
+            _STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+            if result is not None:
+                request.answered_by = name
+                return result
+        return None
+
+    def _new_request(self, question: str, story_id: Optional[str]) -> AnswerRequest:
+        start = time.perf_counter()
+        request = AnswerRequest(self, question, story_id)
+        _STAGE_SECONDS.labels('normalize').observe(time.perf_counter() - start)
+        return request
+
+    def _count_answer(self, request: AnswerRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+        tier = _STAGE_TIERS.get(request.answered_by, 'failure') if result['success'] else 'failure'
+        _ANSWERS.labels(tier).inc()
+        return result
+
+    def answer_question(self, question: str, story_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a question about a story (or the whole corpus without story_id)
+
+        Stages: normalize, direct answer, sentence completion, routed direct
+        answer, answer cache, retrieval, generation and validation. The first
+        stage that produces a result ends the pipeline.
+        """
+        request = self._new_request(question, story_id)
+        return self._count_answer(request, self._run_stages(request, _PREPARE_STAGES + ('generation', 'validation')))
+
+    def stream_answer(self, question: str, story_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question, yielding generated tokens as they are produced
+
+        Yields {'event': 'token', 'token': ...} events while the LLM generates,
+        then one {'event': 'done', ...} event carrying the same fields as
+        answer_question plus 'validated'. Answers that need no generation only
+        produce the final event.
+        """
+        request = self._new_request(question, story_id)
+        result = self._run_stages(request, _PREPARE_STAGES)
+        if result is not None:
+            yield dict(self._count_answer(request, result), event='done')
+            return
+        
+        # Includes the time the client takes to read the tokens
+        start = time.perf_counter()
+        tokens = []
+        try:
+            for token in self._generate_stream(request.prompt):
+                tokens.append(token)
+                yield {'event': 'token', 'token': token}
+        except Exception as e:
+            request.answered_by = 'generation'
+            yield dict(self._count_answer(request, self._generation_error(e)), event='done')
+            return
+        finally:
+            _STAGE_SECONDS.labels('generation').observe(time.perf_counter() - start)
+        
+        request.response = self._format_response(''.join(tokens))
+        result = self._run_stages(request, ('validation',))
+        self._count_answer(request, result)
+        if not result['success']:
+            yield dict(result, event='done', validated=False, response=request.response, context=request.context)
+            return
+        yield dict(result, event='done', validated=True)
+
+    def _content_hash(self, story_id: Optional[str]) -> str:
+        """Version of the content an answer about the story depends on"""
+        if not story_id:
+            return f"corpus-{self.story_store.version}"
+        return self.story_store.content_hash(story_id) or ''
 
 # Create a single instance of RAGHandler
-rag_handler = RAGHandler() 
\ No newline at end of file
+rag_handler = RAGHandler(
+    embedding_cache_path=os.getenv('EMBEDDING_CACHE_PATH'),
+    llm_workers=int(os.getenv('LLM_WORKERS', '0')),
+    vector_backend=os.getenv('VECTOR_BACKEND', 'chroma'),
+    vector_dtype=os.getenv('VECTOR_DTYPE', 'float32'),
+    index_path=os.getenv('INDEX_PATH')
+) 
+# Read when /metrics is rendered, so they cost nothing on the request path
+metrics.registry.gauge(
+    'rag_generation_queue_depth', "Generations queued or running",
+    function=lambda: rag_handler.generation_queue_depth, multiprocess_mode='sum')
+metrics.registry.gauge(
+    'rag_component_state', "Load state of each component; 1 for its current state", ['component', 'state'],
+    function=lambda: {(name, state): 1 for name, state in list(rag_handler.load_state.items())})
+metrics.registry.gauge(
+    'rag_ready', "1 once the models and the index are loaded",
+    function=lambda: int(rag_handler.ready))
+# The caches count per process since it started
+metrics.registry.gauge(
+    'rag_answer_cache_lookups', "Answer cache lookups by result (hit, near_hit, miss)", ['result'],
+    function=lambda: {('hit',): rag_handler.answer_cache.hits, ('near_hit',): rag_handler.answer_cache.near_hits,
+                      ('miss',): rag_handler.answer_cache.misses},
+    multiprocess_mode='sum')
+metrics.registry.gauge(
+    'rag_answer_cache_evictions', "Answers evicted from the answer cache",
+    function=lambda: rag_handler.answer_cache.evictions, multiprocess_mode='sum')
+metrics.registry.gauge(
+    'rag_embedding_cache_lookups', "Embedding cache lookups by result (hit, miss)", ['result'],
+    function=lambda: {('hit',): rag_handler.embedding_cache.hits, ('miss',): rag_handler.embedding_cache.misses},
+    multiprocess_mode='sum')
+metrics.registry.gauge(
+    'rag_embedding_cache_evictions', "Vectors evicted from the embedding cache",
+    function=lambda: rag_handler.embedding_cache.evictions, multiprocess_mode='sum')
+metrics.registry.gauge(
+    'rag_embedding_cache_bytes', "Memory held by cached embeddings",
+    function=lambda: rag_handler.embedding_cache.stats()['bytes'], multiprocess_mode='sum')
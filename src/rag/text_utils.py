@@ -0,0 +1,80 @@
+import re
+import threading
+from typing import List
+
+# Arabic code points that are commonly typed in place of their Urdu forms.
+# Every mapping is one character to one character so offsets are preserved.
+_URDU_FOLDING = str.maketrans({
+    '\u064a': '\u06cc',  # Arabic yeh -> Farsi yeh
+    '\u0649': '\u06cc',  # Alef maksura -> Farsi yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> keheh
+    '\u06c0': '\u06c2',  # Heh with yeh above -> heh goal with hamza above
+    '\u00a0': ' ',        # No-break space -> space
+})
+
+
+def fold_text(text: str) -> str:
+    """Map Arabic variants of Urdu letters to their Urdu forms without changing the length"""
+    return text.translate(_URDU_FOLDING)
+
+
+# Harakat and other marks that readers add or leave out freely
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u06d6-\u06ed]')
+
+# Urdu and Latin punctuation treated as whitespace when comparing questions
+_PUNCTUATION = re.compile(r'[؟?۔.،,!؛;:"\'()\[\]{}«»\-_/\\]+')
+
+
+def normalize_question(text: str) -> str:
+    """Fold letters, drop diacritics and punctuation and collapse whitespace"""
+    text = _DIACRITICS.sub('', fold_text(text).lower())
+    text = _PUNCTUATION.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def tokenize_words(text: str) -> List[str]:
+    """Split text into normalized words, as used for lexical matching"""
+    return normalize_question(text).split()
+
+
+# Sentence ends for text that nltk cannot split: Latin and Urdu full stops, question and exclamation marks
+_SENTENCE_END = re.compile(r'(?<=[.?!۔؟])\s+')
+
+_punkt_lock = threading.Lock()
+_punkt_available = None
+
+
+def _has_punkt() -> bool:
+    global _punkt_available
+    if _punkt_available is None:
+        with _punkt_lock:
+            if _punkt_available is None:
+                import nltk
+                try:
+                    nltk.data.find('tokenizers/punkt')
+                    _punkt_available = True
+                except LookupError:
+                    print("nltk punkt model not found (install it with: python -m nltk.downloader punkt); "
+                          "splitting sentences on punctuation instead")
+                    _punkt_available = False
+    return _punkt_available
+
+
+def sent_tokenize(text: str) -> List[str]:
+    """
+    Split text into sentences with nltk's punkt model
+
+    nltk is imported on first use rather than when the server starts. The
+    model is never downloaded at runtime; without it, text is split after
+    sentence-ending punctuation.
+    """
+    global _punkt_available
+    if _has_punkt():
+        import nltk
+        try:
+            return nltk.tokenize.sent_tokenize(text)
+        except LookupError:
+            # Newer nltk releases need punkt_tab as well
+            print("nltk punkt_tab model not found; splitting sentences on punctuation instead")
+            _punkt_available = False
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
@@ -0,0 +1,338 @@
+from typing import Dict, List, Any, Optional, Sequence
+import threading
+import numpy as np
+
+# Storage types supported by NumpyVectorStore
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+
+# Rows scored per matrix product when scanning quantized vectors
+_SCAN_BLOCK_ROWS = 65536
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple:
+    """
+    Convert normalized float32 vectors to the storage type
+
+    Returns (codes, scales). int8 uses symmetric per-vector scales so that
+    ``codes[i] * scales[i]`` approximates ``vectors[i]``; the float types have
+    no scales.
+    """
+    if dtype == 'float32':
+        return vectors.astype(np.float32, copy=False), None
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.maximum(np.abs(vectors).max(axis=1, initial=0.0), 1e-12) / 127.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype: {dtype}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def _empty_results() -> Dict[str, list]:
+    return {'ids': [], 'documents': [], 'metadatas': [], 'embeddings': [], 'scores': []}
+
+
+class VectorStore:
+    """
+    Sentence vectors with story metadata, searched by cosine similarity
+
+    ``query`` returns flat lists of ids, documents, metadatas, embeddings and
+    cosine-similarity scores, best match first.
+    """
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add(self, ids: List[str], embeddings: Sequence, documents: List[str], metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def delete_story(self, story_id: str):
+        raise NotImplementedError
+
+    def replace_stories(self, stories: Dict[str, tuple], removed: Sequence[str] = ()):
+        """
+        Swap in new sentences for whole stories
+
+        Args:
+            stories: story_id -> (ids, embeddings, documents, metadatas); a story
+                with no sentences is removed
+            removed: Ids of stories to delete
+        """
+        raise NotImplementedError
+
+    def query(self, embedding: np.ndarray, n_results: int, story_id: Optional[str] = None) -> Dict[str, list]:
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a Chroma collection using cosine distance"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(
+            embeddings=[np.asarray(embedding, dtype=np.float32).tolist() for embedding in embeddings],
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    def delete_story(self, story_id: str):
+        self.collection.delete(where={"story_id": story_id})
+
+    def replace_stories(self, stories, removed=()):
+        # Upsert first and delete leftovers after, so the story stays searchable
+        for story_id, (ids, embeddings, documents, metadatas) in stories.items():
+            existing = self.collection.get(where={"story_id": story_id}, include=[])['ids']
+            if ids:
+                self.collection.upsert(
+                    embeddings=[np.asarray(embedding, dtype=np.float32).tolist() for embedding in embeddings],
+                    documents=documents,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+            stale = sorted(set(existing) - set(ids))
+            if stale:
+                self.collection.delete(ids=stale)
+        for story_id in removed:
+            self.delete_story(story_id)
+
+    def query(self, embedding, n_results, story_id=None):
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=n_results,
+            where={"story_id": story_id} if story_id else None,
+            include=["documents", "metadatas", "embeddings", "distances"]
+        )
+        if not results['documents'] or not results['documents'][0]:
+            return _empty_results()
+        return {
+            'ids': results['ids'][0],
+            'documents': results['documents'][0],
+            'metadatas': results['metadatas'][0],
+            'embeddings': results['embeddings'][0],
+            # Cosine distance -> cosine similarity
+            'scores': [1.0 - distance for distance in results['distances'][0]]
+        }
+
+
+class _Snapshot:
+    """Immutable view of a NumpyVectorStore: one matrix with a row range per story"""
+
+    def __init__(self, matrix: np.ndarray, scales: Optional[np.ndarray], ids: List[str], documents: List[str],
+                 metadatas: List[Dict[str, Any]], ranges: Dict[str, tuple]):
+        self.matrix = matrix
+        self.scales = scales
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.ranges = ranges
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process VectorStore with exact search
+
+    Vectors are L2-normalized and kept in one contiguous matrix in which every
+    story occupies a contiguous row range, so a per-story query is a slice and
+    a matrix-vector product; a whole-corpus query is one product over the
+    whole matrix, which may be memory-mapped and shared between processes.
+    Writers build a new snapshot and swap it in, so readers never see a
+    half-updated store.
+
+    With ``dtype`` "float16" or "int8" the vectors take half or a quarter of
+    the memory (int8 plus one float32 scale per vector) and are scored
+    directly on the stored form.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, dtype: str = 'float32'):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.dimension = dimension
+        self.dtype = dtype
+        # story_id -> (ids, documents, metadatas, codes, scales)
+        self._stories: Dict[str, tuple] = {}
+        self._snapshot = self._empty_snapshot()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, matrix: np.ndarray, scales: Optional[np.ndarray], ids: List[str], documents: List[str],
+                    metadatas: List[Dict[str, Any]], ranges: Dict[str, tuple], dtype: str = 'float32') -> 'NumpyVectorStore':
+        """
+        Create a store over already quantized, story-ordered arrays
+
+        The arrays are used as they are (e.g. read-only memory maps) until a
+        story is replaced.
+        """
+        store = cls(dimension=matrix.shape[1], dtype=dtype)
+        ranges = {story_id: tuple(row_range) for story_id, row_range in ranges.items()}
+        for story_id, (start, end) in ranges.items():
+            store._stories[story_id] = (
+                ids[start:end],
+                documents[start:end],
+                metadatas[start:end],
+                matrix[start:end],
+                scales[start:end] if scales is not None else None
+            )
+        store._snapshot = _Snapshot(matrix, scales, ids, documents, metadatas, ranges)
+        return store
+
+    def arrays(self) -> Dict[str, Any]:
+        """The current snapshot as arrays and lists, the inverse of from_arrays"""
+        snapshot = self._snapshot
+        return {
+            'matrix': snapshot.matrix,
+            'scales': snapshot.scales,
+            'ids': snapshot.ids,
+            'documents': snapshot.documents,
+            'metadatas': snapshot.metadatas,
+            'ranges': snapshot.ranges
+        }
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _empty_snapshot(self) -> _Snapshot:
+        codes, scales = quantize(np.zeros((0, self.dimension or 0), dtype=np.float32), self.dtype)
+        return _Snapshot(codes, scales, [], [], [], {})
+
+    def _rebuild(self):
+        if not self._stories:
+            self._snapshot = self._empty_snapshot()
+            return
+        ids, documents, metadatas, blocks, scale_blocks, ranges = [], [], [], [], [], {}
+        for story_id in sorted(self._stories):
+            story_ids, story_documents, story_metadatas, codes, scales = self._stories[story_id]
+            ranges[story_id] = (len(ids), len(ids) + len(story_ids))
+            ids.extend(story_ids)
+            documents.extend(story_documents)
+            metadatas.extend(story_metadatas)
+            blocks.append(codes)
+            scale_blocks.append(scales)
+        matrix = np.ascontiguousarray(np.concatenate(blocks))
+        scales = np.concatenate(scale_blocks) if self.dtype == 'int8' else None
+        self._snapshot = _Snapshot(matrix, scales, ids, documents, metadatas, ranges)
+
+    def count(self) -> int:
+        return len(self._snapshot.ids)
+
+    def nbytes(self) -> int:
+        """Memory held by the stored vectors and their scales"""
+        snapshot = self._snapshot
+        return snapshot.matrix.nbytes + (snapshot.scales.nbytes if snapshot.scales is not None else 0)
+
+    def story_ids(self) -> List[str]:
+        return list(self._snapshot.ranges)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = self._normalize(np.asarray(embeddings))
+        if self.dimension is None and len(vectors):
+            self.dimension = vectors.shape[1]
+
+        grouped: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            grouped.setdefault(metadata['story_id'], []).append(i)
+
+        with self._write_lock:
+            for story_id, rows in grouped.items():
+                codes, scales = quantize(vectors[rows], self.dtype)
+                existing = self._stories.get(story_id)
+                if existing is not None:
+                    codes = np.concatenate([existing[3], codes])
+                    if scales is not None:
+                        scales = np.concatenate([existing[4], scales])
+                else:
+                    existing = ([], [], [], None, None)
+                self._stories[story_id] = (
+                    existing[0] + [ids[i] for i in rows],
+                    existing[1] + [documents[i] for i in rows],
+                    existing[2] + [metadatas[i] for i in rows],
+                    codes,
+                    scales
+                )
+            self._rebuild()
+
+    def delete_story(self, story_id: str):
+        self.replace_stories({}, removed=[story_id])
+
+    def replace_stories(self, stories, removed=()):
+        with self._write_lock:
+            for story_id, (ids, embeddings, documents, metadatas) in stories.items():
+                if not ids:
+                    self._stories.pop(story_id, None)
+                    continue
+                vectors = self._normalize(np.asarray(embeddings))
+                if self.dimension is None:
+                    self.dimension = vectors.shape[1]
+                codes, scales = quantize(vectors, self.dtype)
+                self._stories[story_id] = (list(ids), list(documents), list(metadatas), codes, scales)
+            for story_id in removed:
+                self._stories.pop(story_id, None)
+            # One snapshot swap for the whole batch
+            self._rebuild()
+
+    @staticmethod
+    def _score(snapshot: _Snapshot, start: int, end: int, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to rows start:end, computed on the stored codes"""
+        codes = snapshot.matrix
+        if codes.dtype == np.float32:
+            return codes[start:end] @ query
+        # Score block by block so the upcast copy of the codes stays small
+        scores = np.empty(end - start, dtype=np.float32)
+        for block_start in range(start, end, _SCAN_BLOCK_ROWS):
+            block_end = min(block_start + _SCAN_BLOCK_ROWS, end)
+            scores[block_start - start:block_end - start] = codes[block_start:block_end] @ query
+        if snapshot.scales is not None:
+            scores *= snapshot.scales[start:end]
+        return scores
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first"""
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            # Select the top k in linear time and sort only those
+            top = np.argpartition(-scores, k - 1)[:k]
+            return top[np.argsort(-scores[top], kind='stable')]
+        return np.argsort(-scores, kind='stable')
+
+    def query(self, embedding, n_results, story_id=None):
+        snapshot = self._snapshot
+        if not snapshot.ids:
+            return _empty_results()
+        query = self._normalize(embedding)
+
+        if story_id:
+            if story_id not in snapshot.ranges:
+                return _empty_results()
+            start, end = snapshot.ranges[story_id]
+        else:
+            start, end = 0, len(snapshot.ids)
+        scores = self._score(snapshot, start, end, query)
+        top = self._top_k(scores, n_results)
+        rows = start + top
+        top_scores = scores[top]
+
+        return {
+            'ids': [snapshot.ids[i] for i in rows],
+            'documents': [snapshot.documents[i] for i in rows],
+            'metadatas': [snapshot.metadatas[i] for i in rows],
+            'embeddings': dequantize(snapshot.matrix[rows], snapshot.scales[rows] if snapshot.scales is not None else None),
+            'scores': [float(score) for score in top_scores]
+        }
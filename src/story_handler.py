@@ -2,15 +2,24 @@ import os
 import json
 from typing import Dict, List, Any, Optional
 import re
+import metrics
 from llm_utils.llm_handler import chat_about_story
+from story_store import get_story_store
+
+_STAGE_SECONDS = metrics.registry.histogram(
+    'story_answer_stage_seconds', "Time spent in each stage of StoryHandler.answer_question", ['stage'])
+_ANSWERS = metrics.registry.counter(
+    'story_answers_total', "StoryHandler answers by outcome (llm or failure)", ['tier'])
+_LOOKUP_SECONDS = _STAGE_SECONDS.labels('lookup')
+_GENERATION_SECONDS = _STAGE_SECONDS.labels('generation')
 
 class StoryHandler:
     def __init__(self, data_dir: str = "data/stories"):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
         
-        # Cache for story data to avoid frequent disk reads
-        self.story_cache = {}
+        # Shared in-memory corpus to avoid frequent disk reads
+        self.story_store = get_story_store(data_dir)
         
     def get_all_stories(self) -> List[Dict[str, Any]]:
         """
@@ -19,53 +28,8 @@ class StoryHandler:
         Returns:
             List of story metadata objects
         """
-        stories = []
-        
-        # First look for stories directly in the data directory
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.json') and os.path.isfile(os.path.join(self.data_dir, filename)):
-                file_path = os.path.join(self.data_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        story_data = json.load(f)
-                        
-                    # Add metadata for the story list
-                    stories.append({
-                        "id": f"root/{filename[:-5]}",  # Remove .json extension
-                        "title": story_data.get("title", "Untitled"),
-                        "age_group": story_data.get("ageGroup", story_data.get("age_group", "")),
-                        "language": story_data.get("language", "urdu"),
-                        "type": story_data.get("type", "story").lower()  # Default to story if not specified
-                    })
-                except Exception as e:
-                    print(f"Error loading story {file_path}: {e}")
-        
-        # Walk through all subdirectories
-        for subdir in os.listdir(self.data_dir):
-            subdir_path = os.path.join(self.data_dir, subdir)
-            if not os.path.isdir(subdir_path):
-                continue
-                
-            # Look for story files in this subdirectory
-            for filename in os.listdir(subdir_path):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(subdir_path, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            story_data = json.load(f)
-                            
-                        # Add metadata for the story list
-                        stories.append({
-                            "id": f"{subdir}/{filename[:-5]}",  # Remove .json extension
-                            "title": story_data.get("title", "Untitled"),
-                            "age_group": story_data.get("ageGroup", story_data.get("age_group", "")),
-                            "language": story_data.get("language", "urdu"),
-                            "type": story_data.get("type", "story").lower()  # Default to story if not specified
-                        })
-                    except Exception as e:
-                        print(f"Error loading story {file_path}: {e}")
-        
-        return stories
+        # Stories in the data directory and in its subdirectories
+        return self.story_store.list_stories(include_subdirectories=True)
     
     def get_stories_by_age(self, age_group: str) -> List[Dict[str, Any]]:
         """
@@ -89,11 +53,7 @@ class StoryHandler:
         Returns:
             Story data or None if not found
         """
-        # Check if in cache first
-        if story_id in self.story_cache:
-            return self.story_cache[story_id]
-            
-        # Parse story ID to get file path
+        # Parse story ID to get the story name
         parts = story_id.split('/')
         if len(parts) == 2:
             # Format: root/story_name or subdirectory/story_name
@@ -105,46 +65,30 @@ class StoryHandler:
         # Convert underscores to hyphens in the story name
         story_name = story_name.replace('_', '-')
         
-        # Try loading from root directory first
-        file_path = os.path.join(self.data_dir, f"{story_name}.json")
+        # Try the root directory first, then the subdirectory
+        candidates = [story_name]
+        if len(parts) == 2:
+            candidates.append(f"{parts[0]}/{story_name}")
         
-        if not os.path.exists(file_path) and len(parts) == 2:
-            # If not found in root and we have a location, try the subdirectory
-            file_path = os.path.join(self.data_dir, parts[0], f"{story_name}.json")
+        # Try with different spellings (e.g., jheel vs hheel) and formats (with or without hyphens)
+        candidates.append(story_name.replace('jheel', 'hheel').replace('hheel', 'jheel'))
+        candidates.append(story_name.replace('-', '_'))
         
-        # If still not found, try with different spellings or formats
-        if not os.path.exists(file_path):
-            # Try with different spellings (e.g., jheel vs hheel)
-            alt_name = story_name.replace('jheel', 'hheel').replace('hheel', 'jheel')
-            alt_path = os.path.join(self.data_dir, f"{alt_name}.json")
-            
-            if os.path.exists(alt_path):
-                file_path = alt_path
-            else:
-                # Try with different formats (e.g., with or without hyphens)
-                alt_name = story_name.replace('-', '_')
-                alt_path = os.path.join(self.data_dir, f"{alt_name}.json")
-                
-                if os.path.exists(alt_path):
-                    file_path = alt_path
+        for candidate in candidates:
+            story_data = self.story_store.get(candidate)
+            if story_data is not None:
+                return story_data
         
-        if not os.path.exists(file_path):
-            print(f"Story not found: {file_path}")
-            return None
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                story_data = json.load(f)
-                
-            # Cache the story data
-            self.story_cache[story_id] = story_data
-            return story_data
-        except Exception as e:
-            print(f"Error loading story {file_path}: {e}")
-            return None
+        print(f"Story not found: {story_id}")
+        return None
     
     def answer_question(self, story_id: str, question: str) -> dict:
         """Answer a question about a specific story using direct prompt."""
+        result = self._answer_question(story_id, question)
+        _ANSWERS.labels('llm' if result['success'] else 'failure').inc()
+        return result
+    
+    def _answer_question(self, story_id: str, question: str) -> dict:
         try:
             # Validate inputs
             if not story_id or not question:
@@ -164,7 +108,8 @@ class StoryHandler:
                 }
             
             # Get the story content
-            story_data = self.get_story_content(story_id)
+            with _LOOKUP_SECONDS.time():
+                story_data = self.get_story_content(story_id)
             if not story_data:
                 return {
                     'error': 'Story not found',
@@ -194,7 +139,8 @@ class StoryHandler:
                 story_content = story_content[:10000]
             
             # Use the LLM handler to answer the question with the story content
-            llm_response = chat_about_story(story_content, question)
+            with _GENERATION_SECONDS.time():
+                llm_response = chat_about_story(story_content, question)
             
             if not llm_response.get('success'):
                 return {
@@ -0,0 +1,222 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+
+class StoryRecord:
+    """A parsed story file together with the file state it was loaded from"""
+
+    def __init__(self, story_id: str, path: str, mtime_ns: int, size: int, data: Dict[str, Any], content_hash: str):
+        self.story_id = story_id
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.data = data
+        self.content_hash = content_hash
+        self.listing_entry = self._build_listing_entry()
+
+    def _build_listing_entry(self) -> Dict[str, Any]:
+        if '/' in self.story_id:
+            listing_id = self.story_id
+        else:
+            listing_id = f"root/{self.story_id}"
+        return {
+            'id': listing_id,
+            'title': self.data.get('title', 'Untitled'),
+            'age_group': self.data.get('ageGroup', self.data.get('age_group', '')),
+            'language': self.data.get('language', 'urdu'),
+            'type': self.data.get('type', 'story').lower()
+        }
+
+
+class StoryStore:
+    """
+    In-memory corpus of all story JSON files in a data directory.
+
+    Files are parsed once and kept in memory. The directory is re-scanned with
+    ``stat`` calls at most once per ``poll_interval`` seconds, and only files whose
+    mtime or size changed are parsed again. Stories in the data directory itself
+    get their bare name as ID ('thanda-pani'); stories in a subdirectory are keyed
+    as 'subdir/name'.
+    """
+
+    def __init__(self, data_dir: str = "data", poll_interval: float = 2.0):
+        self.data_dir = data_dir
+        self.poll_interval = poll_interval
+        self.version = 0
+        # Unix time of the last change to the corpus, see _changed_at()
+        self.changed_at: Optional[float] = None
+        self._records: Dict[str, StoryRecord] = {}
+        self._listing: List[Dict[str, Any]] = []
+        self._listing_all: List[Dict[str, Any]] = []
+        self._listeners: List[Callable[[List[str], List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._last_check: Optional[float] = None
+        self._watcher: Optional[threading.Thread] = None
+
+    def _scan(self) -> Tuple[Dict[str, Tuple[str, int, int]], int]:
+        """Stat every story file without reading it; also returns the newest directory mtime (ns)"""
+        found = {}
+        if not os.path.isdir(self.data_dir):
+            return found, 0
+
+        directory_mtime_ns = os.stat(self.data_dir).st_mtime_ns
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    found[entry.name[:-5]] = (entry.path, stat.st_mtime_ns, stat.st_size)
+                elif entry.is_dir():
+                    directory_mtime_ns = max(directory_mtime_ns, entry.stat().st_mtime_ns)
+                    with os.scandir(entry.path) as sub_entries:
+                        for sub_entry in sub_entries:
+                            if sub_entry.is_file() and sub_entry.name.endswith('.json'):
+                                stat = sub_entry.stat()
+                                story_id = f"{entry.name}/{sub_entry.name[:-5]}"
+                                found[story_id] = (sub_entry.path, stat.st_mtime_ns, stat.st_size)
+        return found, directory_mtime_ns
+
+    def _load_record(self, story_id: str, path: str, mtime_ns: int, size: int) -> Optional[StoryRecord]:
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw.decode('utf-8'))
+        except Exception as e:
+            print(f"Error loading story {path}: {e}")
+            return None
+        return StoryRecord(story_id, path, mtime_ns, size, data, hashlib.sha1(raw).hexdigest())
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Pick up added, changed and removed story files
+
+        Args:
+            force: Scan even if the poll interval has not elapsed
+
+        Returns:
+            True if the corpus changed
+        """
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.poll_interval:
+            return False
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if not force and self._last_check is not None and now - self._last_check < self.poll_interval:
+                return False
+
+            found, directory_mtime_ns = self._scan()
+            records = dict(self._records)
+            changed = []
+            removed = [story_id for story_id in records if story_id not in found]
+            for story_id in removed:
+                del records[story_id]
+
+            for story_id, (path, mtime_ns, size) in found.items():
+                current = records.get(story_id)
+                if current is not None and current.mtime_ns == mtime_ns and current.size == size:
+                    continue
+                record = self._load_record(story_id, path, mtime_ns, size)
+                if record is None:
+                    # Keep serving the previous version (if any) and retry on the next scan
+                    continue
+                if current is not None and current.content_hash == record.content_hash:
+                    records[story_id] = record
+                    continue
+                records[story_id] = record
+                changed.append(story_id)
+
+            self._last_check = time.monotonic()
+            if not changed and not removed and len(records) == len(self._records):
+                self._records = records
+                return False
+
+            ordered = [records[story_id] for story_id in sorted(records)]
+            self._listing = [r.listing_entry for r in ordered if '/' not in r.story_id]
+            self._listing_all = [r.listing_entry for r in ordered]
+            self._records = records
+            # Adding or deleting a file updates its directory's mtime, changing one updates the file's.
+            # Taken from the files rather than the clock, so every server process agrees on it.
+            newest_ns = max([directory_mtime_ns] + [r.mtime_ns for r in records.values()])
+            self.changed_at = max(newest_ns / 1e9, self.changed_at or 0.0)
+            self.version += 1
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(changed, removed)
+            except Exception as e:
+                print(f"Error in story store listener: {e}")
+        return True
+
+    def add_listener(self, callback: Callable[[List[str], List[str]], None]):
+        """Register a callback(changed_ids, removed_ids) run after each corpus change"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def start_watcher(self, interval: Optional[float] = None):
+        """Poll the data directory from a daemon thread instead of on access"""
+        if self._watcher is not None:
+            return
+        interval = interval or self.poll_interval
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh(force=True)
+                except Exception as e:
+                    print(f"Error refreshing story store: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="story-store-watcher", daemon=True)
+        self._watcher.start()
+
+    @staticmethod
+    def normalize_id(story_id: str) -> str:
+        """Strip the 'root/' prefix used by listing IDs"""
+        if story_id.startswith('root/'):
+            return story_id[5:]
+        return story_id
+
+    def get_record(self, story_id: str) -> Optional[StoryRecord]:
+        self.refresh()
+        return self._records.get(self.normalize_id(story_id))
+
+    def get(self, story_id: str) -> Optional[Dict[str, Any]]:
+        """Get the parsed story data for 'name', 'root/name' or 'subdir/name'"""
+        record = self.get_record(story_id)
+        return record.data if record else None
+
+    def content_hash(self, story_id: str) -> Optional[str]:
+        record = self.get_record(story_id)
+        return record.content_hash if record else None
+
+    def story_ids(self) -> List[str]:
+        self.refresh()
+        return sorted(self._records)
+
+    def records(self) -> List[StoryRecord]:
+        self.refresh()
+        records = self._records
+        return [records[story_id] for story_id in sorted(records)]
+
+    def list_stories(self, include_subdirectories: bool = False) -> List[Dict[str, Any]]:
+        """Get the pre-built listing entries for all stories"""
+        self.refresh()
+        return self._listing_all if include_subdirectories else self._listing
+
+
+_stores: Dict[str, StoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_story_store(data_dir: str = "data") -> StoryStore:
+    """Get the store shared by every handler reading the given data directory"""
+    key = os.path.abspath(data_dir)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = StoryStore(data_dir)
+        return _stores[key]
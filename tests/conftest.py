@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The server runs with src/ on the path (see gunicorn.conf.py); so do the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
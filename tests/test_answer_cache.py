@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import rag.answer_cache as answer_cache
+from rag.answer_cache import AnswerCache
+
+ANSWER = {'success': True, 'response': 'جواب'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_exact_hit_and_content_hash_change():
+    cache = AnswerCache()
+    cache.put('story', 'سوال', 'hash1', ANSWER)
+    assert cache.get('story', 'سوال', 'hash1') is ANSWER
+    # The story changed since the answer was generated
+    assert cache.get('story', 'سوال', 'hash2') is None
+    assert cache.get('story', 'سوال', 'hash1') is None
+
+
+def test_invalidate_story_drops_only_that_story():
+    cache = AnswerCache()
+    embedding = np.array([1.0, 0.0], dtype=np.float32)
+    cache.put('a', 'q1', 'h', ANSWER, embedding)
+    cache.put('a', 'q2', 'h', ANSWER)
+    cache.put('b', 'q1', 'h', ANSWER, embedding)
+
+    cache.invalidate_story('a')
+    assert cache.get('a', 'q1', 'h') is None
+    assert cache.get('a', 'q2', 'h') is None
+    # Near-duplicate lookups no longer see the dropped questions either
+    assert cache.get('a', 'other', 'h', embedding) is None
+    assert cache.get('b', 'q1', 'h') is ANSWER
+    assert cache.stats()['entries'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put('story', 'سوال', 'h', ANSWER)
+    clock[0] += 59
+    assert cache.get('story', 'سوال', 'h') is ANSWER
+    clock[0] += 2
+    assert cache.get('story', 'سوال', 'h') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_near_duplicate_expires_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60, similarity_threshold=0.9)
+    cache.put('story', 'q', 'h', ANSWER, np.array([1.0, 0.0]))
+    similar = np.array([0.99, 0.05])
+    assert cache.get('story', 'other', 'h', similar) is ANSWER
+    clock[0] += 61
+    assert cache.get('story', 'other', 'h', similar) is None
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2)
+    cache.put('s', 'q1', 'h', ANSWER)
+    cache.put('s', 'q2', 'h', ANSWER)
+    cache.get('s', 'q1', 'h')
+    cache.put('s', 'q3', 'h', ANSWER)
+    assert cache.get('s', 'q2', 'h') is None
+    assert cache.get('s', 'q1', 'h') is ANSWER
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,107 @@
+import json
+import zlib
+import numpy as np
+import pytest
+from rag.rag_handler import RAGHandler
+
+STORY = {
+    'title': 'نیا موسم',
+    'content': 'بارش سے موسم خوشگوار ہو گیا تھا۔ دانی باہر جانے سے ڈرتا تھا۔ قمر نے اسے چھتری دی اور دونوں باغ میں کھیلے۔',
+    'lesson': 'مشکلات کا حل نکالنا چاہیے۔',
+    'characters': [{'name': 'دانی'}, {'name': 'قمر'}]
+}
+
+
+class StubEmbedder:
+    """Bag of words with a fixed random vector per word"""
+
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.texts.extend(texts)
+        vectors = np.zeros((len(texts), 32), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.split():
+                vectors[i] += np.random.default_rng(zlib.crc32(word.encode())).normal(size=32)
+        return vectors
+
+
+class StubLLM:
+    """Answers with the context of the prompt"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return prompt.split('<|context|>')[1].split('<|assistant|>')[0].strip()
+
+
+@pytest.fixture
+def handler(tmp_path):
+    (tmp_path / 'naya-mausam.json').write_text(json.dumps(STORY, ensure_ascii=False), encoding='utf-8')
+    handler = RAGHandler(data_dir=str(tmp_path), vector_backend='numpy')
+    handler._embedding_model = StubEmbedder()
+    handler._llm = StubLLM()
+    handler._tokenizer = str.split
+    for name in ('embedding_model', 'llm', 'tokenizer'):
+        handler.load_state[name] = 'loaded'
+
+    # Record the stages that run and count the per-request lookups
+    handler.stages_run = []
+    handler.lookups = {'embedding': 0, 'exact_match': 0}
+    for name in ('direct', 'completion', 'routed', 'cache', 'retrieval', 'generation', 'validation'):
+        def stage(request, name=name, run=getattr(handler, f"_{name}_stage")):
+            handler.stages_run.append(name)
+            return run(request)
+        setattr(handler, f"_{name}_stage", stage)
+    for lookup, attribute in (('embedding', '_encode'), ('exact_match', '_find_exact_match')):
+        def counted(*args, lookup=lookup, function=getattr(handler, attribute)):
+            handler.lookups[lookup] += 1
+            return function(*args)
+        setattr(handler, attribute, counted)
+    return handler
+
+
+def answer(handler, question):
+    handler.stages_run.clear()
+    handler.lookups.update(embedding=0, exact_match=0)
+    return handler.answer_question(question, 'root/naya-mausam')
+
+
+def test_exact_metadata_question_is_answered_directly(handler):
+    result = answer(handler, 'کہانی کا عنوان کیا ہے؟')
+    assert result['response'] == 'نیا موسم'
+    assert handler.stages_run == ['direct']
+    assert handler.lookups == {'embedding': 0, 'exact_match': 0}
+
+
+def test_partial_sentence_is_completed(handler):
+    result = answer(handler, 'دانی باہر جانے')
+    assert result['response'] == 'دانی باہر جانے سے ڈرتا تھا۔'
+    assert handler.stages_run == ['direct', 'completion']
+    assert handler.lookups == {'embedding': 0, 'exact_match': 1}
+
+
+def test_paraphrased_metadata_question_is_routed(handler):
+    result = answer(handler, 'مجھے کہانی کے کرداروں کے بارے میں بتاؤ')
+    assert result['response'] == 'دانی، قمر'
+    assert handler.stages_run == ['direct', 'completion', 'routed']
+    assert handler.lookups == {'embedding': 0, 'exact_match': 1}
+
+
+def test_content_question_is_generated_once_and_then_cached(handler):
+    question = 'قمر نے دانی کو کیا دیا؟'
+    result = answer(handler, question)
+    assert result['success']
+    assert 'چھتری' in result['context']
+    assert handler.stages_run == ['direct', 'completion', 'routed', 'cache', 'retrieval', 'generation', 'validation']
+    # Shared by the cache lookup, retrieval and the cache write
+    assert handler.lookups == {'embedding': 1, 'exact_match': 1}
+    assert len(handler._llm.prompts) == 1
+
+    assert answer(handler, question) == result
+    assert handler.stages_run == ['direct', 'completion', 'routed', 'cache']
+    assert handler.lookups == {'embedding': 1, 'exact_match': 1}
+    assert len(handler._llm.prompts) == 1
@@ -0,0 +1,138 @@
+import asyncio
+import socket
+import time
+import pytest
+from aiohttp.test_utils import TestServer
+from llm_utils.cohere_client import AsyncCohereClient, CohereError, CohereTimeout
+from llm_utils.mock_cohere_server import create_app
+
+PROMPT = "Child's question: بادشاہ کون تھا؟\n"
+
+
+def run_against_mock(check, client_kwargs=None, **app_kwargs):
+    """Run check(client, server) with a client of a mock API started with app_kwargs"""
+    async def main():
+        async with TestServer(create_app(**app_kwargs)) as server:
+            client = AsyncCohereClient('test-key', base_url=str(server.make_url('')), **(client_kwargs or {}))
+            try:
+                return await check(client, server)
+            finally:
+                await client.close()
+    return asyncio.run(main())
+
+
+async def stats(client, server):
+    async with client._get_session().get(server.make_url('/stats')) as response:
+        return await response.json()
+
+
+def test_generate():
+    async def check(client, server):
+        assert await client.generate(PROMPT) == "کہانی کے مطابق: بادشاہ کون تھا؟"
+
+    run_against_mock(check)
+
+
+def test_429_and_503_are_retried_after_retry_after():
+    async def check(client, server):
+        started = time.monotonic()
+        assert await client.generate(PROMPT) == "کہانی کے مطابق: بادشاہ کون تھا؟"
+        # 429 with Retry-After: 0.3, then a 503 retried after the (tiny) jittered backoff
+        assert time.monotonic() - started >= 0.3
+        assert await stats(client, server) == {'requests': 3, 'failures': 2}
+
+    run_against_mock(check, {'backoff_base': 0.01}, fail_first=2, retry_after='0.3')
+
+
+def test_gives_up_after_max_retries():
+    async def check(client, server):
+        with pytest.raises(CohereError) as raised:
+            await client.generate(PROMPT)
+        # 429, 503, 429
+        assert raised.value.status == 429
+        assert await stats(client, server) == {'requests': 3, 'failures': 3}
+
+    run_against_mock(check, {'backoff_base': 0.01, 'max_retries': 2}, fail_first=3)
+
+
+def test_client_errors_are_not_retried():
+    async def check(client, server):
+        client.base_url = str(server.make_url('/missing'))
+        with pytest.raises(CohereError) as raised:
+            await client.generate(PROMPT)
+        assert raised.value.status == 404
+        assert await stats(client, server) == {'requests': 0, 'failures': 0}
+
+    run_against_mock(check, {'backoff_base': 0.01})
+
+
+def test_deadline_raises_cohere_timeout():
+    async def check(client, server):
+        started = time.monotonic()
+        with pytest.raises(CohereTimeout):
+            await client.generate(PROMPT, timeout=0.3)
+        assert time.monotonic() - started < 0.9
+
+    run_against_mock(check, latency=1.0)
+
+
+def test_retry_after_beyond_the_deadline_is_not_waited_for():
+    async def check(client, server):
+        started = time.monotonic()
+        with pytest.raises(CohereError) as raised:
+            await client.generate(PROMPT, timeout=0.5)
+        assert raised.value.status == 429
+        assert time.monotonic() - started < 0.4
+
+    run_against_mock(check, fail_first=1, retry_after='5')
+
+
+def test_connection_error():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    async def check():
+        client = AsyncCohereClient('test-key', base_url=f"http://127.0.0.1:{port}", max_retries=1, backoff_base=0.01)
+        try:
+            with pytest.raises(CohereError) as raised:
+                await client.generate(PROMPT, timeout=5)
+        finally:
+            await client.close()
+        assert not isinstance(raised.value, CohereTimeout)
+        assert 'connection failed' in str(raised.value)
+
+    asyncio.run(check())
+
+
+def test_concurrency_is_capped():
+    async def check(client, server):
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, client.in_flight)
+                await asyncio.sleep(0.01)
+
+        watcher = asyncio.ensure_future(watch())
+        started = time.monotonic()
+        replies = await asyncio.gather(*[client.generate(PROMPT) for _ in range(6)])
+        watcher.cancel()
+        assert len(replies) == 6
+        assert peak == 2
+        # Three rounds of two requests
+        assert time.monotonic() - started >= 0.6
+
+    run_against_mock(check, {'max_concurrency': 2}, latency=0.2)
+
+
+def test_waiting_for_a_slot_counts_against_the_deadline():
+    async def check(client, server):
+        first = asyncio.ensure_future(client.generate(PROMPT))
+        await asyncio.sleep(0.05)
+        with pytest.raises(CohereTimeout):
+            await client.generate(PROMPT, timeout=0.2)
+        assert await first
+
+    run_against_mock(check, {'max_concurrency': 1}, latency=0.5)
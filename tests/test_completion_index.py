@@ -0,0 +1,38 @@
+from rag.completion_index import CompletionIndex
+
+SENTENCES = [
+    'ایک دن علی باغ میں گیا۔',
+    'علی نے ایک پرندہ دیکھا۔',
+    'پرندہ درخت پر بیٹھا تھا۔'
+]
+
+
+def test_complete_returns_rest_of_sentence():
+    index = CompletionIndex(SENTENCES)
+    assert index.complete('پرندہ درخت') == 'پرندہ درخت پر بیٹھا تھا۔'
+    assert index.complete('علی نے') == 'علی نے ایک پرندہ دیکھا۔'
+
+
+def test_earliest_occurrence_wins():
+    index = CompletionIndex(SENTENCES)
+    # 'علی' occurs in the first two sentences; 'پرندہ' in the last two
+    assert index.find('علی') == (0, SENTENCES[0].index('علی'))
+    assert index.find('پرندہ') == (1, SENTENCES[1].index('پرندہ'))
+
+
+def test_match_does_not_span_sentences():
+    index = CompletionIndex(SENTENCES)
+    assert index.find('گیا۔ علی') is None
+
+
+def test_arabic_letter_variants_match_urdu_text():
+    index = CompletionIndex(['کتاب میز پر ہے۔'])
+    # Arabic kaf in place of keheh
+    assert index.complete('كتاب') == 'کتاب میز پر ہے۔'
+
+
+def test_missing_and_empty_text():
+    index = CompletionIndex(SENTENCES)
+    assert index.find('') is None
+    assert index.complete('سمندر') is None
+    assert CompletionIndex([]).find('علی') is None
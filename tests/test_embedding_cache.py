@@ -0,0 +1,71 @@
+import numpy as np
+from rag.embedding_cache import EmbeddingCache
+
+DIMENSION = 4
+VECTOR_BYTES = DIMENSION * 4
+
+
+class CountingEncoder:
+    """Deterministic embeddings that remember which texts were encoded"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), ord(text[0]), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+
+def test_misses_are_encoded_once_in_one_batch():
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(encoder)
+    vectors = cache.encode_many(['الف', ' الف ', 'بے', 'الف'])
+    assert encoder.calls == [['الف', 'بے']]
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    cache.encode('بے')
+    assert len(encoder.calls) == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 4)
+
+
+def test_byte_budget_evicts_least_recently_used():
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(encoder, max_bytes=2 * VECTOR_BYTES)
+    cache.encode('a')
+    cache.encode('b')
+    # 'a' is now the most recently used
+    cache.encode('a')
+    cache.encode('c')
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] == 2 * VECTOR_BYTES
+    assert cache.stats()['evictions'] == 1
+
+    encoder.calls.clear()
+    cache.encode_many(['a', 'c', 'b'])
+    assert encoder.calls == [['b']]
+
+
+def test_cached_vectors_are_read_only():
+    cache = EmbeddingCache(CountingEncoder())
+    cache.encode('a')
+    stored = cache._entries['a']
+    assert not stored.flags.writeable
+
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / 'cache' / 'embeddings.npz')
+    cache = EmbeddingCache(CountingEncoder(), persist_path=path)
+    expected = cache.encode_many(['الف', 'بے'])
+    cache.save()
+
+    encoder = CountingEncoder()
+    restored = EmbeddingCache(encoder, persist_path=path)
+    np.testing.assert_array_equal(restored.encode_many(['الف', 'بے']), expected)
+    assert encoder.calls == []
+    assert not list(tmp_path.glob('cache/*.tmp*'))
+
+
+def test_corrupt_file_is_ignored(tmp_path):
+    path = tmp_path / 'embeddings.npz'
+    path.write_bytes(b'not a numpy file')
+    cache = EmbeddingCache(CountingEncoder(), persist_path=str(path))
+    assert cache.stats()['entries'] == 0
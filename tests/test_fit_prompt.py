@@ -0,0 +1,66 @@
+import pytest
+from rag.rag_handler import RAGHandler
+
+QUESTION = "بادشاہ نے شہزادی کو کیا تحفہ دیا؟"
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    def make(tokenize, room: int):
+        """A handler whose context window leaves ``room`` tokens for context next to the question"""
+        handler = RAGHandler(data_dir=str(tmp_path), vector_backend='numpy')
+        handler._tokenizer = tokenize
+        handler.load_state['tokenizer'] = 'loaded'
+        handler.llm_config['max_new_tokens'] = 16
+        template_tokens = len(tokenize(handler._build_prompt(QUESTION, '')))
+        handler.llm_config['context_length'] = template_tokens + 16 + room
+        return handler
+    return make
+
+
+def words(text):
+    return text.split()
+
+
+def fits(handler, prompt, tokenize):
+    return len(tokenize(prompt)) + handler.llm_config['max_new_tokens'] <= handler.context_length
+
+
+def test_sentences_are_dropped_from_the_end_until_the_prompt_fits(make_handler):
+    handler = make_handler(words, room=7)
+    sentences = ["پہلا جملہ یہ ہے۔", "دوسرا جملہ بھی ہے۔", "تیسرا جملہ۔"]
+    context, prompt = handler._fit_prompt(QUESTION, sentences)
+    assert context == "پہلا جملہ یہ ہے۔"
+    assert prompt == handler._build_prompt(QUESTION, context)
+    assert fits(handler, prompt, words)
+
+    handler = make_handler(words, room=8)
+    context, prompt = handler._fit_prompt(QUESTION, sentences)
+    assert context == "پہلا جملہ یہ ہے۔ دوسرا جملہ بھی ہے۔"
+    assert fits(handler, prompt, words)
+
+
+def test_first_sentence_is_cut_to_whole_words(make_handler):
+    handler = make_handler(words, room=3)
+    context, prompt = handler._fit_prompt(QUESTION, ["ایک دو تین چار پانچ چھ", "سات"])
+    assert context == "ایک دو تین"
+    assert f"<|user|>{QUESTION}\n" in prompt
+    assert fits(handler, prompt, words)
+
+
+def test_tokens_added_by_joining_sentences_are_counted(make_handler):
+    # One token per character: the space joining two sentences costs a token too
+    handler = make_handler(list, room=len("الف") + len("بے"))
+    context, prompt = handler._fit_prompt(QUESTION, ["الف", "بے"])
+    assert context == "الف"
+    assert fits(handler, prompt, list)
+
+
+def test_question_is_never_truncated(make_handler):
+    handler = make_handler(words, room=0)
+    context, prompt = handler._fit_prompt(QUESTION, ["کوئی جملہ"])
+    assert context == ''
+    assert prompt == handler._build_prompt(QUESTION, '')
+
+    handler.llm_config['context_length'] -= 1
+    assert handler._fit_prompt(QUESTION, ["کوئی جملہ"]) == ('', None)
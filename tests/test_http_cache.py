@@ -0,0 +1,67 @@
+import gzip
+import pytest
+from flask import Flask, request
+from werkzeug.http import http_date
+from http_cache import CachedBody, cached_response
+
+LAST_MODIFIED = 1700000000.0
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture
+def cached():
+    return CachedBody(b'{"stories": [' + b'"x", ' * 200 + b'"x"]}', 'abc123', LAST_MODIFIED)
+
+
+def respond(app, cached, headers=None):
+    with app.test_request_context('/api/stories', headers=headers or {}):
+        return cached_response(request, cached, max_age=60)
+
+
+def test_full_response_carries_validators(app, cached):
+    response = respond(app, cached)
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"abc123"'
+    assert response.headers['Last-Modified'] == http_date(LAST_MODIFIED)
+    assert response.get_data() == cached.body
+
+
+def test_if_none_match(app, cached):
+    assert respond(app, cached, {'If-None-Match': '"abc123"'}).status_code == 304
+    assert respond(app, cached, {'If-None-Match': '"other", "abc123"'}).status_code == 304
+    assert respond(app, cached, {'If-None-Match': '*'}).status_code == 304
+    assert respond(app, cached, {'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_if_none_match_accepts_any_encoding_of_the_same_content(app, cached):
+    response = respond(app, cached, {'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == cached.body
+    etag = response.headers['ETag']
+    assert etag == '"abc123-gzip"'
+    # Revalidated by a client that no longer accepts gzip
+    not_modified = respond(app, cached, {'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+
+
+def test_if_modified_since(app, cached):
+    assert respond(app, cached, {'If-Modified-Since': http_date(LAST_MODIFIED)}).status_code == 304
+    assert respond(app, cached, {'If-Modified-Since': http_date(LAST_MODIFIED + 60)}).status_code == 304
+    assert respond(app, cached, {'If-Modified-Since': http_date(LAST_MODIFIED - 60)}).status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(app, cached):
+    headers = {'If-None-Match': '"other"', 'If-Modified-Since': http_date(LAST_MODIFIED)}
+    assert respond(app, cached, headers).status_code == 200
+
+
+def test_without_last_modified_if_modified_since_is_ignored(app):
+    cached = CachedBody(b'{}', 'abc', None)
+    response = respond(app, cached, {'If-Modified-Since': http_date(LAST_MODIFIED)})
+    assert response.status_code == 200
+    assert 'Last-Modified' not in response.headers
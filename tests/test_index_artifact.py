@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pytest
+from rag.index_artifact import ArtifactError, VECTORS_FILE, load_artifact, save_artifact
+from rag.lexical_index import LexicalIndex
+from rag.vector_store import NumpyVectorStore
+
+MODEL = 'test-model'
+
+
+@pytest.fixture
+def artifact_path(tmp_path):
+    store = NumpyVectorStore()
+    store.add(
+        ids=['s_sentence_0', 's_sentence_1'],
+        embeddings=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32),
+        documents=['پہلا جملہ', 'دوسرا جملہ'],
+        metadatas=[{'story_id': 's'}, {'story_id': 's'}]
+    )
+    lexical = {'s': LexicalIndex(['s_sentence_0', 's_sentence_1'], ['پہلا جملہ', 'دوسرا جملہ'])}
+    path = str(tmp_path / 'index')
+    save_artifact(path, store, {'s': 'hash'}, {}, lexical, MODEL)
+    return path
+
+
+def test_load_round_trip(artifact_path):
+    artifact = load_artifact(artifact_path, model_name=MODEL)
+    assert artifact.story_hashes == {'s': 'hash'}
+    assert artifact.store.count() == 2
+    assert artifact.store.query(np.array([0.0, 1.0]), 1, story_id='s')['ids'] == ['s_sentence_1']
+
+
+def test_load_rejects_bad_hash(artifact_path):
+    vectors = os.path.join(artifact_path, VECTORS_FILE)
+    with open(vectors, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(ArtifactError, match='Checksum mismatch'):
+        load_artifact(artifact_path)
+
+
+def test_load_rejects_missing_file_and_other_model(artifact_path):
+    with pytest.raises(ArtifactError, match='was built with'):
+        load_artifact(artifact_path, model_name='another-model')
+    os.remove(os.path.join(artifact_path, VECTORS_FILE))
+    with pytest.raises(ArtifactError, match='Checksum mismatch'):
+        load_artifact(artifact_path)
+
+
+def test_load_rejects_missing_artifact(tmp_path):
+    with pytest.raises(ArtifactError, match='No index artifact'):
+        load_artifact(str(tmp_path / 'missing'))
@@ -0,0 +1,39 @@
+import threading
+import time
+from rag.indexer import IndexManifest, iter_sentence_batches
+
+STORIES = [(f"story{i}", {'content': '۔ '.join(['ایک جملہ'] * 20) + '۔'}) for i in range(20)]
+
+
+def test_batches_cover_every_sentence():
+    batches = list(iter_sentence_batches(STORIES, 8))
+    assert all(len(batch) == 8 for batch in batches[:-1])
+    assert sum(len(batch) for batch in batches) == 20 * 20
+
+
+def test_producer_stops_when_consumer_stops_early():
+    batches = iter_sentence_batches(STORIES, 2)
+    next(batches)
+    batches.close()
+    deadline = time.monotonic() + 2
+    while any(thread.name == 'index-segmenter' for thread in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not any(thread.name == 'index-segmenter' for thread in threading.enumerate())
+
+
+def test_manifest_diff():
+    manifest = IndexManifest()
+    manifest.hashes = {'a': '1', 'b': '2'}
+    assert manifest.diff({'a': '1', 'b': '3', 'c': '4'}) == (['b', 'c'], [])
+    assert manifest.diff({'a': '1'}) == ([], ['b'])
+
+
+def test_locked_manifest_reads_saves_of_other_instances(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    first, second = IndexManifest(path), IndexManifest(path)
+    with first.locked():
+        first.hashes = {'a': '1'}
+        first.save()
+    with second.locked():
+        assert second.diff({'a': '1'}) == ([], [])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['manifest.json', 'manifest.json.lock']
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+import pytest
+from rag.inference_pool import (InferencePool, InferencePoolBusy, InferenceTimeout,
+                                InferenceWorkerLost)
+
+
+class EchoModel:
+    """Answers 'echo:<prompt>'; 'sleep:<seconds>' sleeps first and 'die' kills the worker"""
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        if prompt == 'die':
+            os._exit(1)
+        if prompt.startswith('sleep:'):
+            time.sleep(float(prompt[len('sleep:'):]))
+        if stream:
+            return iter(['echo', ':', prompt])
+        return f"echo:{prompt}"
+
+
+def load_echo_model(model_path, model_kwargs):
+    return EchoModel()
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = InferencePool('unused', model_loader=load_echo_model, **{'num_workers': 1, **kwargs})
+        pool.warm_up()
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_generate_and_stream(make_pool):
+    pool = make_pool()
+    assert pool.generate('سلام') == 'echo:سلام'
+    assert ''.join(pool.stream('سلام')) == 'echo:سلام'
+    assert pool.pending == 0
+
+
+def test_busy_when_all_slots_are_in_use(make_pool):
+    pool = make_pool(max_pending=1, queue_timeout=0.1)
+    running = threading.Thread(target=pool.generate, args=('sleep:1',))
+    running.start()
+    assert wait_for(lambda: pool.pending == 1)
+    with pytest.raises(InferencePoolBusy):
+        pool.generate('سلام')
+    running.join()
+    assert pool.generate('سلام') == 'echo:سلام'
+
+
+def test_timeout_keeps_the_slot_until_the_generation_finishes(make_pool):
+    pool = make_pool(max_pending=2)
+    with pytest.raises(InferenceTimeout):
+        pool.generate('sleep:1', timeout=0.1)
+    assert pool.pending == 1
+    assert wait_for(lambda: pool.pending == 0)
+
+
+def test_stream_timeout(make_pool):
+    pool = make_pool()
+    with pytest.raises(InferenceTimeout):
+        list(pool.stream('sleep:1', timeout=0.1))
+
+
+def test_restart_after_worker_dies(make_pool):
+    pool = make_pool()
+    assert pool.ready
+    with pytest.raises(InferenceWorkerLost):
+        pool.generate('die')
+    assert not pool.ready
+    assert wait_for(lambda: pool.ready)
+    assert pool.generate('سلام') == 'echo:سلام'
+
+
+def test_submit_to_broken_executor_is_retried(make_pool):
+    pool = make_pool()
+    executor = pool._executor
+    for process in list(executor._processes.values()):
+        process.kill()
+        process.join()
+    # Until the executor notices, a generation submitted to it fails with InferenceWorkerLost instead
+    assert wait_for(lambda: executor._broken)
+    assert pool.generate('سلام') == 'echo:سلام'
+    assert wait_for(lambda: pool.ready)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+IDS = ['s0', 's1', 's2']
+DOCUMENTS = [
+    'علی باغ میں گیا',
+    'علی نے پرندہ دیکھا اور پرندہ اڑ گیا',
+    'بارش ہوئی'
+]
+
+
+def test_search_ranks_by_bm25_and_skips_unrelated_sentences():
+    index = LexicalIndex(IDS, DOCUMENTS)
+    results = index.search('پرندہ', 3)
+    assert [i for i, _ in results] == [1]
+    assert results[0][1] > 0
+
+    # The rarer term weighs more: 'باغ' is only in s0, 'علی' in s0 and s1
+    ranked = [IDS[i] for i, _ in index.search('علی باغ', 3)]
+    assert ranked == ['s0', 's1']
+
+
+def test_query_without_known_terms_returns_nothing():
+    index = LexicalIndex(IDS, DOCUMENTS)
+    assert index.search('سمندر', 3) == []
+    assert not index.scores('سمندر').any()
+
+
+def test_round_trip_through_dict():
+    index = LexicalIndex(IDS, DOCUMENTS)
+    restored = LexicalIndex.from_dict(index.to_dict())
+    np.testing.assert_allclose(restored.scores('علی پرندہ'), index.scores('علی پرندہ'))
+    assert restored.positions == index.positions
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'd']], k=60)
+    assert fused['b'] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused['a'] == pytest.approx(1 / 61)
+    assert fused['d'] == pytest.approx(1 / 62)
+    # Found by both rankings beats first place in one
+    assert max(fused, key=fused.get) == 'b'
+
+
+def test_reciprocal_rank_fusion_small_k_favours_top_ranks():
+    fused = reciprocal_rank_fusion([['a', 'b'], ['c', 'b']], k=1)
+    assert fused['a'] == fused['c'] == pytest.approx(0.5)
+    assert fused['b'] == pytest.approx(2 / 3)
+    assert reciprocal_rank_fusion([]) == {}
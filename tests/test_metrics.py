@@ -0,0 +1,55 @@
+import metrics
+
+
+def make_registry():
+    registry = metrics.Registry()
+    registry.counter('answers_total', "Answers", ['tier']).labels('rag').inc(2)
+    registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0)).observe(0.05)
+    registry.gauge('queue_depth', "Queued", function=lambda: 3, multiprocess_mode='sum')
+    registry.gauge('ready', "Ready", function=lambda: 1)
+    return registry
+
+
+def test_render_single_process():
+    text = make_registry().render()
+    assert 'answers_total{tier="rag"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_count 1' in text
+    assert 'queue_depth 3' in text
+
+
+def test_snapshots_of_all_processes_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    registry = make_registry()
+    for pid in (101, 102):
+        monkeypatch.setattr(metrics.os, 'getpid', lambda pid=pid: pid)
+        registry.write_snapshot()
+    metrics.mark_process_dead(101)
+
+    merged = metrics.merge_snapshots(str(tmp_path))
+    assert merged['answers_total']['values'] == [(('rag',), 4)]
+    counts, total = merged['latency_seconds']['values'][0][1]
+    assert counts == [2, 0, 0] and total == 0.1
+    # Gauges of the exited process are gone; its counters stay in the totals
+    assert merged['queue_depth']['values'] == [((), 3)]
+    assert merged['ready']['values'] == [(('102',), 1)]
+    assert merged['ready']['labelnames'] == ['pid']
+
+
+def test_reset_keeps_children_usable():
+    registry = metrics.Registry()
+    child = registry.counter('events_total', "Events").labels()
+    child.inc()
+    registry.reset()
+    child.inc()
+    assert registry.get('events_total').values() == {(): 1.0}
+
+
+def test_cache_stats_are_exported(monkeypatch):
+    from rag.rag_handler import rag_handler
+    monkeypatch.setattr(rag_handler.answer_cache, 'near_hits', 3)
+    monkeypatch.setattr(rag_handler.embedding_cache, 'misses', 5)
+    text = metrics.registry.render()
+    assert 'rag_answer_cache_lookups{result="near_hit"} 3' in text
+    assert 'rag_embedding_cache_lookups{result="miss"} 5' in text
+    assert 'rag_embedding_cache_bytes 0' in text
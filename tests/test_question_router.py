@@ -0,0 +1,64 @@
+import pytest
+from rag.question_router import QuestionRouter, STORY_CUE_BOOST
+
+
+@pytest.fixture(scope='module')
+def router():
+    return QuestionRouter()
+
+
+def test_exact_metadata_questions(router):
+    assert router.classify('کہانی کا عنوان کیا ہے؟') == ('title', 1.0)
+    assert router.classify('کہانی کا خلاصہ بتائیں') == ('summary', 1.0)
+
+
+def test_content_questions(router):
+    assert router.classify('علی باغ میں کیوں گیا؟') == ('content', 0.0)
+
+
+def test_patterns_match_whole_words_only(router):
+    # 'نام' inside 'انعام' or 'نامہ' is not the keyword 'نام'
+    assert router.classify('علی کو انعام کیوں ملا؟') == ('content', 0.0)
+    assert router.classify('خط نامہ کس نے لکھا؟') == ('content', 0.0)
+    assert router.classify('اس کا نام کیا ہے؟')[0] == 'title'
+
+
+def test_match_inside_longer_match_is_ignored(router):
+    # 'مشکل' alone means difficulty; inside 'مشکل الفاظ' it does not
+    assert router.classify('مشکل الفاظ بتائیں') == ('difficult_words', 0.9)
+
+
+def test_story_cue_boosts_confidence(router):
+    question_type, confidence = router.classify('سبق کیا ہے؟')
+    boosted_type, boosted = router.classify('اس کہانی میں سبق کیا ہے؟')
+    assert question_type == boosted_type == 'lesson'
+    assert boosted == pytest.approx(confidence + STORY_CUE_BOOST)
+
+
+def test_ties_go_to_the_earlier_type_at_half_confidence():
+    router = QuestionRouter({'first': [('الف', 0.8)], 'second': [('بے', 0.8)]})
+    assert router.classify('الف اور بے') == ('first', pytest.approx(0.4))
+    assert router.classify('بے اور الف') == ('first', pytest.approx(0.4))
+    # A stronger match is not a tie
+    router = QuestionRouter({'first': [('الف', 0.5)], 'second': [('بے', 0.8)]})
+    assert router.classify('الف اور بے') == ('second', 0.8)
+
+
+ROUTING_THRESHOLD = 0.8
+
+
+def test_content_questions_with_bare_keywords_are_not_routed(router):
+    for question in ['علی کا کردار کیسا تھا؟', 'کہانی میں علی کا کردار کیسا تھا؟',
+                     'علی کا مقصد کیا تھا؟', 'اس کہانی میں بادشاہ کا مقصد کیا تھا؟']:
+        assert router.classify(question)[1] < ROUTING_THRESHOLD, question
+
+
+def test_only_phrases_reach_the_routing_threshold(router):
+    from rag.question_router import QUESTION_PATTERNS
+    for question_type, entries in QUESTION_PATTERNS.items():
+        for pattern, _ in entries:
+            if ' ' not in pattern:
+                # Even next to the story cue
+                assert router.classify(f'کہانی میں {pattern} بتائیں')[1] < ROUTING_THRESHOLD, pattern
+    assert router.classify('کہانی کے کردار کون ہیں؟') == ('characters', 1.0)
+    assert router.classify('کہانی کا مقصد کیا ہے؟') == ('moral', 1.0)
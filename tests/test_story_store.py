@@ -0,0 +1,70 @@
+import json
+import os
+import time
+from story_store import StoryStore
+
+
+def write_story(directory, name, title):
+    with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'title': title, 'content': 'ایک دن۔'}, f, ensure_ascii=False)
+
+
+def test_listeners_see_changes(tmp_path):
+    write_story(tmp_path, 'a', 'الف')
+    store = StoryStore(str(tmp_path), poll_interval=0)
+    events = []
+    store.add_listener(lambda changed, removed: events.append((sorted(changed), sorted(removed))))
+    store.refresh(force=True)
+    os.remove(os.path.join(tmp_path, 'a.json'))
+    write_story(tmp_path, 'b', 'بے')
+    store.refresh(force=True)
+    assert events == [(['a'], []), (['b'], ['a'])]
+
+
+def test_ids_listing_and_subdirectories(tmp_path):
+    write_story(tmp_path, 'a', 'الف')
+    os.mkdir(tmp_path / 'extra')
+    write_story(tmp_path / 'extra', 'b', 'بے')
+    store = StoryStore(str(tmp_path), poll_interval=0)
+    assert store.story_ids() == ['a', 'extra/b']
+    assert store.get('root/a')['title'] == 'الف'
+    assert store.get('extra/b')['title'] == 'بے'
+    assert [entry['id'] for entry in store.list_stories()] == ['root/a']
+    assert [entry['id'] for entry in store.list_stories(include_subdirectories=True)] == ['root/a', 'extra/b']
+
+
+def test_unparsable_edit_keeps_previous_version(tmp_path):
+    write_story(tmp_path, 'a', 'الف')
+    store = StoryStore(str(tmp_path), poll_interval=0)
+    content_hash = store.content_hash('a')
+    with open(os.path.join(tmp_path, 'a.json'), 'w', encoding='utf-8') as f:
+        f.write('{"title": ')
+    assert not store.refresh(force=True)
+    assert store.get('a')['title'] == 'الف'
+    assert store.content_hash('a') == content_hash
+
+
+def test_poll_interval_limits_rescans(tmp_path):
+    write_story(tmp_path, 'a', 'الف')
+    store = StoryStore(str(tmp_path), poll_interval=3600)
+    store.refresh(force=True)
+    write_story(tmp_path, 'b', 'بے')
+    assert store.story_ids() == ['a']
+    assert store.refresh(force=True)
+    assert store.story_ids() == ['a', 'b']
+
+
+def test_changed_at_moves_on_removal(tmp_path):
+    write_story(tmp_path, 'a', 'الف')
+    write_story(tmp_path, 'b', 'بے')
+    store = StoryStore(str(tmp_path), poll_interval=0)
+    store.refresh(force=True)
+    first = store.changed_at
+    assert first is not None
+
+    # Directory mtimes have a coarse resolution on some filesystems
+    time.sleep(0.05)
+    os.remove(os.path.join(tmp_path, 'a.json'))
+    assert store.refresh(force=True)
+    assert store.story_ids() == ['b']
+    assert store.changed_at > first
@@ -0,0 +1,94 @@
+import numpy as np
+from rag.vector_store import NumpyVectorStore
+
+
+def story(story_id, vectors):
+    ids = [f"{story_id}_{i}" for i in range(len(vectors))]
+    documents = [f"{story_id} sentence {i}" for i in range(len(vectors))]
+    metadatas = [{'story_id': story_id, 'sentence_idx': i} for i in range(len(vectors))]
+    return ids, np.asarray(vectors, dtype=np.float32), documents, metadatas
+
+
+def make_store(stories, dtype='float32'):
+    store = NumpyVectorStore(dtype=dtype)
+    store.replace_stories({story_id: story(story_id, vectors) for story_id, vectors in stories.items()})
+    return store
+
+
+def test_whole_corpus_query_is_ranked_by_cosine_similarity():
+    store = make_store({'a': [[1, 0], [0, 1]], 'b': [[1, 1], [-1, 0]]})
+    results = store.query(np.array([1.0, 0.2]), n_results=3)
+    assert results['ids'] == ['a_0', 'b_0', 'a_1']
+    assert results['scores'] == sorted(results['scores'], reverse=True)
+    assert results['scores'][0] > 0.98
+
+
+def test_query_returns_every_row_when_asking_for_more():
+    store = make_store({'a': [[1, 0], [0, 1]], 'b': [[-1, 0]]})
+    assert store.query(np.array([1.0, 0.0]), n_results=10)['ids'] == ['a_0', 'a_1', 'b_0']
+
+
+def test_per_story_query_searches_only_that_story():
+    store = make_store({'a': [[0, 1], [1, 1]], 'b': [[1, 0]], 'c': [[1, 0.1], [-1, 0]]})
+    results = store.query(np.array([1.0, 0.0]), n_results=5, story_id='c')
+    assert results['ids'] == ['c_0', 'c_1']
+    assert all(metadata['story_id'] == 'c' for metadata in results['metadatas'])
+    assert store.query(np.array([1.0, 0.0]), n_results=1, story_id='a')['ids'] == ['a_1']
+    assert store.query(np.array([1.0, 0.0]), n_results=1, story_id='missing')['ids'] == []
+
+
+def test_replace_stories_drops_stale_rows():
+    store = make_store({'a': [[1, 0], [0, 1], [1, 1]], 'b': [[-1, 0]]})
+    store.replace_stories({'a': story('a', [[0, 1]])})
+    assert store.count() == 2
+    assert store.query(np.array([1.0, 0.0]), n_results=5, story_id='a')['ids'] == ['a_0']
+    assert store.query(np.array([0.0, 1.0]), n_results=1)['documents'] == ['a sentence 0']
+
+    store.replace_stories({'a': ([], [], [], [])}, removed=['b'])
+    assert store.count() == 0
+    assert store.query(np.array([1.0, 0.0]), n_results=5)['ids'] == []
+
+
+def test_arrays_round_trip():
+    store = make_store({'a': [[1, 0], [0, 1]], 'b': [[1, 1]]}, dtype='int8')
+    arrays = store.arrays()
+    copy = NumpyVectorStore.from_arrays(dtype='int8', **arrays)
+    assert copy.story_ids() == ['a', 'b']
+    assert copy.count() == 3
+    query = np.array([0.3, 1.0])
+    expected, actual = store.query(query, n_results=3), copy.query(query, n_results=3)
+    assert actual['ids'] == expected['ids']
+    assert actual['scores'] == expected['scores']
+    assert np.array_equal(actual['embeddings'], expected['embeddings'])
+
+    # Replacing a story in the copy leaves the arrays it was created from alone
+    copy.replace_stories({'b': story('b', [[-1, 0]])})
+    assert copy.query(np.array([-1.0, 0.0]), n_results=1)['ids'] == ['b_0']
+    assert len(arrays['ids']) == 3
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16))
+    store = make_store({'a': vectors[:300], 'b': vectors[300:]})
+    query = rng.normal(size=16)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+    results = store.query(query, n_results=10)
+    assert results['ids'] == [f"a_{i}" if i < 300 else f"b_{i - 300}" for i in expected]
+
+
+def test_quantized_ranking_matches_float32():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(200, 32))
+    queries = rng.normal(size=(20, 32))
+    exact = make_store({'a': vectors[:120], 'b': vectors[120:]})
+    for dtype in ('float16', 'int8'):
+        store = make_store({'a': vectors[:120], 'b': vectors[120:]}, dtype=dtype)
+        assert store.nbytes() < exact.nbytes()
+        for query in queries:
+            expected = exact.query(query, n_results=5)
+            results = store.query(query, n_results=5)
+            assert results['ids'][0] == expected['ids'][0]
+            assert len(set(results['ids']) & set(expected['ids'])) >= 4
+            assert abs(results['scores'][0] - expected['scores'][0]) < 0.02